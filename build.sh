@@ -1,18 +1,19 @@
 #!/bin/bash
+set -e
 
 # Script de build para Railway
+# Corre uma vez por deploy: tudo o que é caro fica aqui e não no arranque
 echo "🚀 Iniciando build do projeto..."
 
 # Criar diretório staticfiles se não existir
 echo "📁 Criando diretório staticfiles..."
 mkdir -p staticfiles
 
-# Coletar arquivos estáticos
+# Coletar arquivos estáticos (sem --clear: só copia o que mudou; o manifesto
+# staticfiles.json e as versões .gz/.br são gerados aqui)
 echo "📦 Coletando arquivos estáticos..."
-python manage.py collectstatic --noinput --clear
+python manage.py collectstatic --noinput
 
-# Executar migrações
-echo "🗄️ Executando migrações..."
-python manage.py migrate
-
-echo "✅ Build concluído com sucesso!" 
\ No newline at end of file
+# As migrações correm no passo de release (release.sh),
+# uma vez por deploy, e não em cada arranque do container
+echo "✅ Build concluído com sucesso!"
@@ -1,116 +1,300 @@
 """
 Backend personalizado para lidar com certificados SSL
 """
+import os
 import ssl
 import smtplib
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
 from django.core.mail.backends.smtp import EmailBackend
 from django.core.mail import EmailMessage
+from django.core.mail.utils import DNS_NAME
+
+
+class ConexaoSMTP:
+    """Ligação SMTP autenticada com a contabilidade usada pelo pool"""
+
+    def __init__(self, smtp):
+        self.smtp = smtp
+        self.criada_em = time.monotonic()
+        self.ultimo_uso = self.criada_em
+        self.mensagens = 0
+
+    def fechar(self):
+        try:
+            self.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            try:
+                self.smtp.close()
+            except OSError:
+                pass
+
+
+class PoolConexoesSMTP:
+    """
+    Pool de ligações SMTP reutilizáveis, partilhado entre threads
+
+    Guarda até ``tamanho`` ligações ociosas por servidor/credenciais. Uma
+    ligação é descartada ao atingir ``max_mensagens`` ou ``idade_maxima``
+    segundos; se ficou ociosa mais de ``noop_apos`` segundos, é verificada com
+    NOOP antes de ser reutilizada.
+    """
+
+    def __init__(self, tamanho, max_mensagens, idade_maxima, noop_apos):
+        self.tamanho = tamanho
+        self.max_mensagens = max_mensagens
+        self.idade_maxima = idade_maxima
+        self.noop_apos = noop_apos
+        self._ociosas = {}
+        self._lock = threading.Lock()
+
+    def _expirou(self, conexao, agora):
+        return (
+            conexao.mensagens >= self.max_mensagens
+            or agora - conexao.criada_em >= self.idade_maxima
+        )
+
+    def _saudavel(self, conexao, agora):
+        if agora - conexao.ultimo_uso < self.noop_apos:
+            return True
+        try:
+            codigo, _ = conexao.smtp.noop()
+        except (smtplib.SMTPException, OSError):
+            return False
+        return codigo == 250
+
+    def obter(self, chave):
+        """Retorna uma ligação ociosa saudável para ``chave`` ou None"""
+        while True:
+            with self._lock:
+                ociosas = self._ociosas.get(chave)
+                conexao = ociosas.pop() if ociosas else None
+            if conexao is None:
+                return None
+            agora = time.monotonic()
+            if not self._expirou(conexao, agora) and self._saudavel(conexao, agora):
+                return conexao
+            conexao.fechar()
+
+    def devolver(self, chave, conexao):
+        """Devolve a ligação ao pool, ou fecha-a se expirou ou o pool está cheio"""
+        agora = time.monotonic()
+        conexao.ultimo_uso = agora
+        if not self._expirou(conexao, agora):
+            with self._lock:
+                ociosas = self._ociosas.setdefault(chave, deque())
+                if len(ociosas) < self.tamanho:
+                    ociosas.append(conexao)
+                    return
+        conexao.fechar()
+
+    def esvaziar(self):
+        with self._lock:
+            todas = [conexao for ociosas in self._ociosas.values() for conexao in ociosas]
+            self._ociosas.clear()
+        for conexao in todas:
+            conexao.fechar()
+
+
+_contexto_ssl = None
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def obter_pool():
+    """
+    Pool do processo atual, ou None se SMTP_POOL_TAMANHO for 0
+
+    Recriado após fork: sockets herdados do processo pai (ex.: gunicorn com
+    preload) não podem ser partilhados entre workers.
+    """
+    global _pool, _pool_pid
+    tamanho = getattr(settings, 'SMTP_POOL_TAMANHO', 4)
+    if not tamanho:
+        return None
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = PoolConexoesSMTP(
+                    tamanho=tamanho,
+                    max_mensagens=getattr(settings, 'SMTP_POOL_MAX_MENSAGENS', 100),
+                    idade_maxima=getattr(settings, 'SMTP_POOL_IDADE_MAXIMA', 300),
+                    noop_apos=getattr(settings, 'SMTP_POOL_NOOP_APOS', 5),
+                )
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def contexto_ssl_sem_verificacao():
+    """Contexto SSL sem verificação de certificado, criado uma vez por processo"""
+    global _contexto_ssl
+    if _contexto_ssl is None:
+        contexto = ssl.create_default_context()
+        contexto.check_hostname = False
+        contexto.verify_mode = ssl.CERT_NONE
+        _contexto_ssl = contexto
+    return _contexto_ssl
 
 
 class UnsafeTLSBackend(EmailBackend):
     """
     Backend de email que desabilita a verificação de certificados SSL
     para resolver problemas com certificados auto-assinados
+
+    As ligações autenticadas são reutilizadas entre chamadas (e threads)
+    através de um pool por processo.
     """
-    
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.connection = None
-    
+        self._conexao = None
+
+    @property
+    def _chave_pool(self):
+        return (self.host, self.port, self.username, self.use_ssl, self.use_tls)
+
+    def _conectar(self):
+        """
+        Abre uma ligação SMTP nova com SSL desabilitado
+        """
+        # Contexto SSL sem verificação de certificado (carregar as CAs é caro)
+        ssl_context = contexto_ssl_sem_verificacao()
+
+        if self.use_ssl:
+            # Conexão SSL
+            smtp = smtplib.SMTP_SSL(
+                self.host,
+                self.port,
+                local_hostname=DNS_NAME.get_fqdn(),
+                timeout=self.timeout,
+                context=ssl_context
+            )
+        else:
+            # Conexão normal com TLS
+            smtp = smtplib.SMTP(
+                self.host,
+                self.port,
+                local_hostname=DNS_NAME.get_fqdn(),
+                timeout=self.timeout
+            )
+            if self.use_tls:
+                smtp.starttls(context=ssl_context)
+
+        # Autenticar se credenciais fornecidas
+        if self.username and self.password:
+            smtp.login(self.username, self.password)
+
+        return ConexaoSMTP(smtp)
+
     def open(self):
         """
-        Abre conexão SMTP com SSL desabilitado
+        Obtém uma ligação do pool ou abre uma nova.
+        Retorna True se a ligação foi obtida por esta chamada.
         """
         if self.connection:
             return False
-        
+
         try:
-            # Criar contexto SSL sem verificação de certificado
-            ssl_context = ssl.create_default_context()
-            ssl_context.check_hostname = False
-            ssl_context.verify_mode = ssl.CERT_NONE
-            
-            if self.use_ssl:
-                # Conexão SSL
-                self.connection = smtplib.SMTP_SSL(
-                    self.host, 
-                    self.port, 
-                    timeout=self.timeout,
-                    context=ssl_context
-                )
-            else:
-                # Conexão normal com TLS
-                self.connection = smtplib.SMTP(
-                    self.host, 
-                    self.port, 
-                    timeout=self.timeout
-                )
-                if self.use_tls:
-                    self.connection.starttls(context=ssl_context)
-            
-            # Autenticar se credenciais fornecidas
-            if self.username and self.password:
-                self.connection.login(self.username, self.password)
-            
+            pool = obter_pool()
+            conexao = pool.obter(self._chave_pool) if pool else None
+            if conexao is None:
+                conexao = self._conectar()
+            self._conexao = conexao
+            self.connection = conexao.smtp
             return True
-            
+
         except Exception as e:
             if not self.fail_silently:
                 raise e
             return False
-    
+
     def close(self):
         """
-        Fecha a conexão SMTP
+        Devolve a ligação ao pool (ou fecha-a se o pool estiver desativado)
         """
         if self.connection is None:
             return
-        
-        try:
-            self.connection.quit()
-        except smtplib.SMTPServerDisconnected:
-            pass
-        finally:
-            self.connection = None
-    
+
+        conexao = self._conexao
+        self.connection = None
+        self._conexao = None
+
+        pool = obter_pool()
+        if pool is not None and conexao is not None:
+            pool.devolver(self._chave_pool, conexao)
+        elif conexao is not None:
+            conexao.fechar()
+
+    def _descartar(self):
+        """Fecha a ligação atual sem a devolver ao pool"""
+        if self._conexao is not None:
+            self._conexao.fechar()
+        self.connection = None
+        self._conexao = None
+
     def send_messages(self, email_messages):
         """
         Envia mensagens de email
         """
         if not email_messages:
             return 0
-        
-        if not self.open():
-            return 0
-        
-        num_sent = 0
-        
-        for message in email_messages:
-            sent = self._send(message)
-            if sent:
-                num_sent += 1
-        
-        return num_sent
-    
+
+        with self._lock:
+            nova_conexao = self.open()
+            if not self.connection:
+                return 0
+
+            num_sent = 0
+            try:
+                for message in email_messages:
+                    sent = self._send(message)
+                    if sent:
+                        num_sent += 1
+            finally:
+                if nova_conexao:
+                    self.close()
+
+            return num_sent
+
+    def _renovar_se_necessario(self):
+        """Troca a ligação quando atingiu o limite de mensagens do pool"""
+        pool = obter_pool()
+        if pool is not None and self._conexao.mensagens >= pool.max_mensagens:
+            self._descartar()
+            self._conexao = self._conectar()
+            self.connection = self._conexao.smtp
+
     def _send(self, email_message):
         """
-        Envia uma mensagem de email
+        Envia uma mensagem de email, reconectando uma vez se o servidor
+        tiver fechado a ligação
         """
         if not email_message.recipients():
             return False
-        
+
         encoding = email_message.encoding or 'utf-8'
         from_email = email_message.from_email or self.username
         recipients = email_message.recipients()
-        
+        mensagem = email_message.message().as_bytes()
+
         try:
-            self.connection.sendmail(
-                from_email,
-                recipients,
-                email_message.message().as_bytes()
-            )
+            self._renovar_se_necessario()
+            try:
+                self.connection.sendmail(from_email, recipients, mensagem)
+            except smtplib.SMTPServerDisconnected:
+                # Ligação reutilizada que o servidor fechou entretanto
+                self._descartar()
+                self._conexao = self._conectar()
+                self.connection = self._conexao.smtp
+                self.connection.sendmail(from_email, recipients, mensagem)
+            self._conexao.mensagens += 1
             return True
         except Exception as e:
             if not self.fail_silently:
                 raise e
-            return False 
\ No newline at end of file
+            return False
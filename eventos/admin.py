@@ -1,10 +1,92 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.utils import get_fields_from_path
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import PermissionDenied
+from django.db.models import Case, Count, F, When
+from django.db.models.functions import Greatest
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils import timezone
 from django.utils.html import format_html
-from .models import Categoria, Evento, Inscricao, PerfilUsuario, Certificado, Avaliacao, CodigoVerificacao, Noticia
+from django.utils.translation import gettext_lazy as _
+from .checkin import token_leitor
+from .exportacao import resposta_exportacao
+from .forms import ImportacaoParticipantesForm
+from .importacao import ErroImportacao, importar
+from .models import Categoria, Evento, Inscricao, PerfilUsuario, Certificado, Avaliacao, CodigoVerificacao, Noticia, EmailOutbox
+from .paginacao import PaginadorEstimado
+
+
+class _SelectFiltro(AutocompleteSelect):
+    """AutocompleteSelect com o título do filtro no lugar vazio, como os filtros do Jazzmin"""
+
+    def __init__(self, field, admin_site, titulo):
+        super().__init__(field, admin_site)
+        self.titulo = titulo
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs['data-placeholder'] = self.titulo
+        return attrs
+
+
+class FiltroAutocomplete(admin.FieldListFilter):
+    """
+    Filtro por FK que não lista a tabela relacionada: as opções vêm por
+    pesquisa, com o autocomplete do admin (select2 por AJAX)
+    """
+    template = 'admin/eventos/filtro_autocomplete.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.parametro = f'{field_path}__{field.target_field.name}__exact'
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.campo = field.formfield(
+            widget=_SelectFiltro(field, model_admin.admin_site, self.title), required=False
+        )
+
+    def expected_parameters(self):
+        return [self.parametro]
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        valores = self.used_parameters.get(self.parametro) or []
+        yield {
+            'selected': not valores,
+            'query_string': changelist.get_query_string(remove=[self.parametro]),
+            'display': _('All'),
+            # O valor escolhido é lido só pela chave primária: uma consulta
+            'select': self.campo.widget.render(
+                self.parametro, valores[-1] if valores else None, attrs={'style': 'width: 100%'}
+            ),
+        }
+
+
+class AdminEscalavel(admin.ModelAdmin):
+    """
+    Base do admin para tabelas grandes: a paginação não conta a tabela
+    inteira (contagem estimada acima de LIMITE_CONTAGEM_EXATA) e os filtros
+    por FK declarados com FiltroAutocomplete carregam as opções por pesquisa
+    """
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+
+    @property
+    def media(self):
+        media = super().media
+        for filtro in self.list_filter:
+            if isinstance(filtro, tuple) and filtro[1] is FiltroAutocomplete:
+                campo = get_fields_from_path(self.model, filtro[0])[-1]
+                return media + AutocompleteSelect(campo, self.admin_site).media
+        return media
 
 
 @admin.register(Categoria)
-class CategoriaAdmin(admin.ModelAdmin):
+class CategoriaAdmin(AdminEscalavel):
     list_display = ['nome', 'cor_display', 'eventos_count']
     search_fields = ['nome']
     list_filter = ['nome']
@@ -16,16 +98,22 @@ class CategoriaAdmin(admin.ModelAdmin):
         )
     cor_display.short_description = 'Cor'
     
+    def get_queryset(self, request):
+        # Contagem na própria consulta da lista, em vez de um COUNT por linha
+        return super().get_queryset(request).annotate(_eventos_count=Count('eventos'))
+    
     def eventos_count(self, obj):
-        return obj.eventos.count()
+        return obj._eventos_count
     eventos_count.short_description = 'Eventos'
+    eventos_count.admin_order_field = '_eventos_count'
 
 
 @admin.register(Noticia)
-class NoticiaAdmin(admin.ModelAdmin):
+class NoticiaAdmin(AdminEscalavel):
     list_display = ['titulo', 'autor', 'categoria', 'status', 'em_destaque', 'data_publicacao', 'visualizacoes']
-    list_filter = ['status', 'categoria', 'em_destaque', 'data_publicacao', 'autor']
+    list_filter = ['status', 'categoria', 'em_destaque', 'data_publicacao', ('autor', FiltroAutocomplete)]
     search_fields = ['titulo', 'subtitulo', 'conteudo', 'resumo']
+    autocomplete_fields = ['autor']
     prepopulated_fields = {'resumo': ('titulo',)}
     readonly_fields = ['data_criacao', 'data_atualizacao', 'visualizacoes']
     
@@ -53,13 +141,17 @@ class NoticiaAdmin(admin.ModelAdmin):
 
 
 @admin.register(Evento)
-class EventoAdmin(admin.ModelAdmin):
+class EventoAdmin(AdminEscalavel):
     list_display = ['titulo', 'categoria', 'data_inicio', 'data_fim', 'status', 'capacidade_maxima', 'inscricoes_count', 'vagas_disponiveis', 'tem_link_externo', 'em_destaque']
-    list_filter = ['status', 'categoria', 'data_inicio', 'organizador', 'usar_link_externo', 'em_destaque']
+    list_filter = ['status', 'categoria', 'data_inicio', ('organizador', FiltroAutocomplete), 'usar_link_externo', 'em_destaque']
     search_fields = ['titulo', 'descricao', 'local']
+    autocomplete_fields = ['organizador']
     date_hierarchy = 'data_inicio'
-    readonly_fields = ['criado_em', 'atualizado_em', 'inscricoes_count']
+    readonly_fields = ['criado_em', 'atualizado_em', 'inscricoes_count', 'leitor_checkin']
     filter_horizontal = []
+    # Só a categoria aparece na lista; sem isto o Django junta todas as FKs
+    list_select_related = ['categoria']
+    actions = ['renovar_credencial_checkin']
     
     fieldsets = (
         ('Informações Básicas', {
@@ -78,15 +170,48 @@ class EventoAdmin(admin.ModelAdmin):
         ('Mídia', {
             'fields': ('imagem',)
         }),
+        ('Check-in', {
+            'fields': ('leitor_checkin',),
+            'classes': ('collapse',)
+        }),
         ('Informações do Sistema', {
             'fields': ('criado_em', 'atualizado_em'),
             'classes': ('collapse',)
         }),
     )
     
+    def get_queryset(self, request):
+        # As contagens vêm dos contadores do evento (ver Inscricao.save); as
+        # vagas são calculadas na consulta para a coluna poder ser ordenada
+        return super().get_queryset(request).annotate(
+            _vagas=Case(
+                When(capacidade_maxima=0, then=None),
+                default=Greatest(F('capacidade_maxima') - F('lugares_ocupados'), 0),
+            )
+        )
+    
+    def leitor_checkin(self, obj):
+        if obj is None or obj.pk is None:
+            return '-'
+        # Cada visita à página emite uma credencial nova, com validade a contar de agora
+        validade = timezone.localtime() + timedelta(seconds=settings.CHECKIN_LEITOR_VALIDADE)
+        return format_html(
+            '<code>{}</code><br><small>Credencial dos leitores de QR code: POST {} com o cabeçalho '
+            '<code>Authorization: Bearer</code> seguido desta credencial. Válida até {}; a ação '
+            '"Renovar credencial dos leitores" revoga as credenciais já emitidas.</small>',
+            token_leitor(obj), reverse('eventos:api_checkin'), validade.strftime('%d/%m/%Y %H:%M'),
+        )
+    leitor_checkin.short_description = 'Credencial do leitor'
+    
+    def renovar_credencial_checkin(self, request, queryset):
+        total = queryset.renovar_chave_checkin()
+        self.message_user(request, f"Credenciais dos leitores revogadas em {total} eventos; abra o evento para obter a nova.")
+    renovar_credencial_checkin.short_description = "Renovar credencial dos leitores (revoga as emitidas)"
+    
     def inscricoes_count(self, obj):
         return obj.inscricoes_count
     inscricoes_count.short_description = 'Inscrições'
+    inscricoes_count.admin_order_field = 'inscricoes_confirmadas'
     
     def vagas_disponiveis(self, obj):
         vagas = obj.vagas_disponiveis
@@ -94,6 +219,7 @@ class EventoAdmin(admin.ModelAdmin):
             return 'Ilimitado'
         return vagas
     vagas_disponiveis.short_description = 'Vagas Disponíveis'
+    vagas_disponiveis.admin_order_field = '_vagas'
 
     def tem_link_externo(self, obj):
         return bool(obj.tem_link_externo)
@@ -107,16 +233,18 @@ class EventoAdmin(admin.ModelAdmin):
 
 
 @admin.register(Inscricao)
-class InscricaoAdmin(admin.ModelAdmin):
+class InscricaoAdmin(AdminEscalavel):
     list_display = ['participante', 'evento', 'status', 'data_inscricao', 'presente']
-    list_filter = ['status', 'data_inscricao', 'presente', 'evento']
+    list_filter = ['status', 'data_inscricao', 'presente', ('evento', FiltroAutocomplete)]
     search_fields = ['participante__username', 'participante__first_name', 'participante__last_name', 'evento__titulo']
+    # Navegação por datas sem SELECT DISTINCT na tabela (ver templatetags/admin_datas.py)
     date_hierarchy = 'data_inscricao'
     readonly_fields = ['data_inscricao']
+    autocomplete_fields = ['evento', 'participante']
     
     fieldsets = (
         ('Informações da Inscrição', {
-            'fields': ('evento', 'participante', 'status')
+            'fields': ('evento', 'participante', 'status', 'reserva_expira')
         }),
         ('Presença', {
             'fields': ('presente', 'data_presenca')
@@ -130,33 +258,85 @@ class InscricaoAdmin(admin.ModelAdmin):
         }),
     )
     
-    actions = ['confirmar_inscricoes', 'cancelar_inscricoes', 'marcar_presenca']
+    actions = [
+        'confirmar_inscricoes', 'cancelar_inscricoes', 'marcar_presenca',
+        'exportar_csv', 'exportar_csv_gzip', 'exportar_xlsx',
+    ]
+    
+    def get_queryset(self, request):
+        # __str__ usa o participante e o evento, também nos resultados do autocomplete
+        return super().get_queryset(request).select_related('participante', 'evento')
+    
+    def get_urls(self):
+        return [
+            path('importar/', self.admin_site.admin_view(self.importar_view), name='eventos_inscricao_importar'),
+        ] + super().get_urls()
+    
+    def importar_view(self, request):
+        """Importação de participantes por CSV, em lote (ver importacao.py)"""
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        form = ImportacaoParticipantesForm(request.POST or None, request.FILES or None)
+        campo = form.fields['evento']
+        campo.widget = AutocompleteSelect(Inscricao._meta.get_field('evento'), self.admin_site, choices=campo.choices)
+        resultado = None
+        if request.method == 'POST' and form.is_valid():
+            dados = form.cleaned_data
+            try:
+                resultado = importar(dados['ficheiro'].file, dados['evento'], dados['status'], simular=dados['simular'])
+            except ErroImportacao as erro:
+                form.add_error('ficheiro', str(erro))
+        contexto = {
+            **self.admin_site.each_context(request),
+            'title': 'Importar participantes',
+            'opts': self.model._meta,
+            'form': form,
+            'media': self.media + form.media,
+            'resultado': resultado,
+            'simular': resultado is not None and form.cleaned_data['simular'],
+        }
+        return TemplateResponse(request, 'admin/eventos/inscricao/importar.html', contexto)
     
+    # Um UPDATE para toda a seleção (InscricaoQuerySet), com os contadores
+    # dos eventos recontados uma vez
     def confirmar_inscricoes(self, request, queryset):
-        for inscricao in queryset:
-            inscricao.confirmar()
-        self.message_user(request, f"{queryset.count()} inscrições foram confirmadas.")
+        total = queryset.confirmar()
+        self.message_user(request, f"{total} inscrições foram confirmadas.")
     confirmar_inscricoes.short_description = "Confirmar inscrições selecionadas"
     
     def cancelar_inscricoes(self, request, queryset):
-        for inscricao in queryset:
-            inscricao.cancelar()
-        self.message_user(request, f"{queryset.count()} inscrições foram canceladas.")
+        total = queryset.cancelar()
+        self.message_user(request, f"{total} inscrições foram canceladas.")
     cancelar_inscricoes.short_description = "Cancelar inscrições selecionadas"
     
     def marcar_presenca(self, request, queryset):
-        for inscricao in queryset:
-            inscricao.marcar_presenca()
-        self.message_user(request, f"{queryset.count()} presenças foram marcadas.")
+        total = queryset.marcar_presenca()
+        self.message_user(request, f"{total} presenças foram marcadas.")
     marcar_presenca.short_description = "Marcar presença das inscrições selecionadas"
+    
+    # Download em fluxo (ver exportacao.py): com "selecionar todas" exporta
+    # o resultado filtrado inteiro sem o carregar em memória
+    def exportar_csv(self, request, queryset):
+        return resposta_exportacao(queryset, 'csv')
+    exportar_csv.short_description = "Exportar participantes (CSV)"
+    
+    def exportar_csv_gzip(self, request, queryset):
+        return resposta_exportacao(queryset, 'csv', comprimir=True)
+    exportar_csv_gzip.short_description = "Exportar participantes (CSV comprimido)"
+    
+    def exportar_xlsx(self, request, queryset):
+        return resposta_exportacao(queryset, 'xlsx')
+    exportar_xlsx.short_description = "Exportar participantes (Excel)"
 
 
 @admin.register(PerfilUsuario)
-class PerfilUsuarioAdmin(admin.ModelAdmin):
+class PerfilUsuarioAdmin(AdminEscalavel):
     list_display = ['usuario', 'nome_completo', 'telefone', 'cidade', 'concelho', 'newsletter']
     list_filter = ['genero', 'newsletter', 'criado_em', 'distrito']
     search_fields = ['usuario__username', 'usuario__first_name', 'usuario__last_name', 'nif']
     readonly_fields = ['criado_em', 'atualizado_em']
+    list_select_related = ['usuario']
+    autocomplete_fields = ['usuario']
     
     fieldsets = (
         ('Informações Pessoais', {
@@ -181,27 +361,30 @@ class PerfilUsuarioAdmin(admin.ModelAdmin):
 
 
 @admin.register(Certificado)
-class CertificadoAdmin(admin.ModelAdmin):
+class CertificadoAdmin(AdminEscalavel):
     list_display = ['inscricao', 'codigo', 'data_emissao', 'template']
     list_filter = ['data_emissao', 'template']
     search_fields = ['codigo', 'inscricao__participante__username', 'inscricao__evento__titulo']
     readonly_fields = ['data_emissao']
+    list_select_related = ['inscricao__participante', 'inscricao__evento']
+    autocomplete_fields = ['inscricao']
     
     actions = ['gerar_codigos']
     
     def gerar_codigos(self, request, queryset):
-        for certificado in queryset:
-            certificado.gerar_codigo()
-        self.message_user(request, f"{queryset.count()} códigos foram gerados.")
+        total = queryset.gerar_codigos()
+        self.message_user(request, f"{total} códigos foram gerados.")
     gerar_codigos.short_description = "Gerar códigos para certificados selecionados"
 
 
 @admin.register(Avaliacao)
-class AvaliacaoAdmin(admin.ModelAdmin):
+class AvaliacaoAdmin(AdminEscalavel):
     list_display = ['inscricao', 'nota', 'data_avaliacao']
     list_filter = ['nota', 'data_avaliacao']
     search_fields = ['inscricao__participante__username', 'inscricao__evento__titulo']
     readonly_fields = ['data_avaliacao']
+    list_select_related = ['inscricao__participante', 'inscricao__evento']
+    autocomplete_fields = ['inscricao']
     
     def nota_display(self, obj):
         return '⭐' * obj.nota
@@ -209,13 +392,33 @@ class AvaliacaoAdmin(admin.ModelAdmin):
 
 
 @admin.register(CodigoVerificacao)
-class CodigoVerificacaoAdmin(admin.ModelAdmin):
+class CodigoVerificacaoAdmin(AdminEscalavel):
     list_display = ['usuario', 'email', 'codigo', 'usado', 'criado_em', 'expira_em', 'esta_valido']
     list_filter = ['usado', 'criado_em', 'expira_em']
     search_fields = ['usuario__username', 'email', 'codigo']
     readonly_fields = ['criado_em', 'codigo']
+    list_select_related = ['usuario']
+    autocomplete_fields = ['usuario']
     
     def esta_valido(self, obj):
         return obj.esta_valido()
     esta_valido.boolean = True
     esta_valido.short_description = 'Válido'
+
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(AdminEscalavel):
+    list_display = ['assunto', 'destinatarios', 'status', 'tentativas', 'proxima_tentativa', 'criado_em', 'enviado_em']
+    list_filter = ['status', 'criado_em']
+    search_fields = ['assunto', 'ultimo_erro']
+    readonly_fields = ['criado_em', 'enviado_em', 'ultimo_erro', 'tentativas']
+    
+    actions = ['reenviar']
+    
+    def reenviar(self, request, queryset):
+        atualizados = queryset.exclude(status='enviado').update(
+            status='pendente', tentativas=0, proxima_tentativa=timezone.now()
+        )
+        self.message_user(request, f"{atualizados} emails voltaram para a fila.")
+    reenviar.short_description = "Recolocar emails selecionados na fila"
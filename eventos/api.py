@@ -0,0 +1,285 @@
+"""
+API JSON de eventos (v1)
+
+As respostas são transmitidas linha a linha com ``StreamingHttpResponse`` e
+``.iterator()``, paginadas por cursor e condicionais: ``ETag`` e
+``Last-Modified`` derivam de ``max(atualizado_em)``, então clientes que
+consultam periodicamente recebem 304 enquanto nada muda.
+"""
+import hashlib
+import json
+from collections import Counter
+from datetime import datetime, time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_GET, require_POST
+
+from .checkin import evento_do_leitor, registar_leituras
+from .models import Evento
+from .paginacao import PaginadorCursor
+
+
+# Campo público -> caminho no ORM
+CAMPOS_EVENTO = {
+    'id': 'id',
+    'titulo': 'titulo',
+    'descricao': 'descricao',
+    'categoria': 'categoria_id',
+    'categoria_nome': 'categoria__nome',
+    'data_inicio': 'data_inicio',
+    'data_fim': 'data_fim',
+    'local': 'local',
+    'endereco': 'endereco',
+    'preco': 'preco',
+    'capacidade_maxima': 'capacidade_maxima',
+    'link_externo': 'link_externo',
+    'em_destaque': 'em_destaque',
+    'atualizado_em': 'atualizado_em',
+}
+
+# Sem ?fields= a descrição completa fica de fora
+CAMPOS_PADRAO = [
+    'id', 'titulo', 'categoria', 'data_inicio', 'data_fim', 'local', 'preco', 'capacidade_maxima',
+]
+
+CAMPOS_LEGADO = [
+    'id', 'titulo', 'descricao', 'data_inicio', 'data_fim', 'local', 'preco', 'capacidade_maxima',
+]
+
+ORDENACAO_EVENTOS = ['data_inicio', 'id']
+
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 200
+CHUNK_SIZE = 200
+
+# Leituras por pedido de check-in (um leitor sem rede envia-as em lotes)
+LIMITE_LEITURAS = 5000
+
+
+class ParametroInvalido(ValueError):
+    """Parâmetro de consulta inválido; vira uma resposta 400"""
+
+
+def _data(valor, nome, fim_do_dia=False):
+    """Aceita data (AAAA-MM-DD) ou data e hora ISO 8601"""
+    # parse_date/parse_datetime retornam None para formatos desconhecidos mas
+    # levantam ValueError para datas bem formadas e impossíveis (2024-02-30)
+    try:
+        momento = parse_datetime(valor)
+        dia = parse_date(valor) if momento is None else None
+    except (ValueError, TypeError):
+        raise ParametroInvalido(f'{nome}: data inválida')
+    if momento is None:
+        if dia is None:
+            raise ParametroInvalido(f'{nome}: data inválida')
+        momento = datetime.combine(dia, time.max if fim_do_dia else time.min)
+    if timezone.is_naive(momento):
+        momento = timezone.make_aware(momento)
+    return momento
+
+
+def _filtrar_eventos(parametros):
+    """Eventos publicados filtrados por categoria e intervalo de datas"""
+    eventos = Evento.objects.filter(status='publicado')
+
+    categoria = parametros.get('categoria')
+    if categoria:
+        # isdecimal e não isdigit: '²' é dígito mas int() rejeita-o
+        if not categoria.isdecimal():
+            raise ParametroInvalido('categoria: deve ser um ID numérico')
+        eventos = eventos.filter(categoria_id=int(categoria))
+
+    if parametros.get('inicio_de'):
+        eventos = eventos.filter(data_inicio__gte=_data(parametros['inicio_de'], 'inicio_de'))
+    if parametros.get('inicio_ate'):
+        eventos = eventos.filter(data_inicio__lte=_data(parametros['inicio_ate'], 'inicio_ate', fim_do_dia=True))
+
+    return eventos
+
+
+def _campos(parametros):
+    pedidos = parametros.get('fields')
+    if not pedidos:
+        return CAMPOS_PADRAO
+    campos = [campo.strip() for campo in pedidos.split(',') if campo.strip()]
+    desconhecidos = [campo for campo in campos if campo not in CAMPOS_EVENTO]
+    if desconhecidos:
+        raise ParametroInvalido(f'fields: campos desconhecidos: {", ".join(desconhecidos)}')
+    return campos
+
+
+def _limite(parametros):
+    valor = parametros.get('limite')
+    if not valor:
+        return LIMITE_PADRAO
+    if not valor.isdecimal() or int(valor) < 1:
+        raise ParametroInvalido('limite: deve ser um inteiro positivo')
+    return min(int(valor), LIMITE_MAXIMO)
+
+
+def _estado_eventos(request):
+    """
+    Última alteração e número de eventos publicados, numa só consulta e
+    memorizados no request (usados pelo ETag e pelo Last-Modified)
+    """
+    if not hasattr(request, '_estado_api_eventos'):
+        try:
+            eventos = _filtrar_eventos(request.GET)
+        except ParametroInvalido:
+            request._estado_api_eventos = None
+        else:
+            request._estado_api_eventos = eventos.aggregate(
+                ultima_alteracao=Max('atualizado_em'), total=Count('id'),
+            )
+    return request._estado_api_eventos
+
+
+def _last_modified(request, *args, **kwargs):
+    estado = _estado_eventos(request)
+    return estado['ultima_alteracao'] if estado else None
+
+
+def _etag(request, *args, **kwargs):
+    estado = _estado_eventos(request)
+    if not estado:
+        return None
+    # O total entra no ETag para que despublicar ou remover eventos também o mude
+    base = f'{estado["ultima_alteracao"]}:{estado["total"]}:{request.get_full_path()}'
+    return hashlib.sha1(base.encode()).hexdigest()
+
+
+def _json(valor):
+    return json.dumps(valor, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def _transmitir(linhas, campos, chave='eventos', rodape=None):
+    """Gera o documento JSON aos pedaços, uma linha de cada vez"""
+    yield '{' + _json(chave) + ': ['
+    for posicao, linha in enumerate(linhas):
+        item = {campo: linha[CAMPOS_EVENTO[campo]] for campo in campos}
+        yield (',' if posicao else '') + _json(item)
+    yield ']'
+    for nome, valor in (rodape() if rodape else {}).items():
+        yield ', ' + _json(nome) + ': ' + _json(valor)
+    yield '}'
+
+
+async def _atransmitir(linhas, campos, chave='eventos'):
+    """Versão assíncrona de ``_transmitir`` para o servidor ASGI"""
+    yield '{' + _json(chave) + ': ['
+    posicao = 0
+    async for linha in linhas:
+        item = {campo: linha[CAMPOS_EVENTO[campo]] for campo in campos}
+        yield (',' if posicao else '') + _json(item)
+        posicao += 1
+    yield ']}'
+
+
+def _erro(mensagem):
+    return JsonResponse({'erro': mensagem}, status=400)
+
+
+@require_GET
+@condition(etag_func=_etag, last_modified_func=_last_modified)
+def api_v1_eventos(request):
+    """
+    Lista de eventos publicados
+
+    Parâmetros: ``fields`` (campos separados por vírgula), ``categoria``,
+    ``inicio_de``/``inicio_ate`` (data ISO), ``limite`` e ``cursor``.
+    """
+    try:
+        eventos = _filtrar_eventos(request.GET)
+        campos = _campos(request.GET)
+        limite = _limite(request.GET)
+    except ParametroInvalido as erro:
+        return _erro(str(erro))
+
+    # As colunas da ordenação entram sempre, pois o cursor é montado a partir delas
+    colunas = {CAMPOS_EVENTO[campo] for campo in campos} | set(ORDENACAO_EVENTOS)
+    paginador = PaginadorCursor(eventos.values(*colunas), ORDENACAO_EVENTOS, limite)
+    fluxo = paginador.fluxo(request.GET.get('cursor'), chunk_size=CHUNK_SIZE)
+
+    def rodape():
+        return {
+            'proximo_cursor': fluxo.cursor_seguinte,
+            'cursor_anterior': fluxo.cursor_anterior,
+            'limite': limite,
+        }
+
+    return StreamingHttpResponse(
+        _transmitir(fluxo, campos, rodape=rodape),
+        content_type='application/json',
+    )
+
+
+@require_GET
+def api_eventos(request):
+    """API para listar eventos (JSON) - formato original, sem paginação"""
+    eventos = Evento.objects.filter(status='publicado').values(*CAMPOS_LEGADO)
+    return StreamingHttpResponse(
+        _transmitir(eventos.iterator(chunk_size=CHUNK_SIZE), CAMPOS_LEGADO),
+        content_type='application/json',
+    )
+
+
+@require_GET
+async def api_eventos_async(request):
+    """API para listar eventos (JSON) - formato original, servida em ASGI"""
+    eventos = Evento.objects.filter(status='publicado').values(*CAMPOS_LEGADO)
+    return StreamingHttpResponse(
+        _atransmitir(eventos.aiterator(chunk_size=CHUNK_SIZE), CAMPOS_LEGADO),
+        content_type='application/json',
+    )
+
+
+def _leituras(corpo):
+    """[(token, momento)] do corpo do check-in"""
+    try:
+        leituras = json.loads(corpo)['leituras']
+        if not isinstance(leituras, list):
+            raise TypeError
+        return [
+            (leitura['token'], _data(leitura['momento'], 'momento') if leitura.get('momento') else None)
+            for leitura in leituras
+        ]
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise ParametroInvalido('corpo inválido: esperado {"leituras": [{"token": ..., "momento": ...}]}')
+
+
+@csrf_exempt
+@require_POST
+def api_checkin(request):
+    """
+    Check-in por QR code (ver checkin.py)
+
+    O leitor autentica-se com ``Authorization: Bearer <token do leitor>`` e
+    envia ``{"leituras": [{"token": ..., "momento": ...}]}``: uma leitura com
+    rede ou as acumuladas sem rede (``momento`` ISO 8601, opcional). Reenviar
+    um lote é seguro; cada leitura volta com o seu resultado.
+    """
+    tipo, _, credencial = request.headers.get('Authorization', '').partition(' ')
+    evento_id = evento_do_leitor(credencial.strip()) if tipo == 'Bearer' else None
+    if evento_id is None:
+        return JsonResponse({'erro': 'credencial do leitor inválida'}, status=401)
+
+    try:
+        leituras = _leituras(request.body)
+        if len(leituras) > LIMITE_LEITURAS:
+            raise ParametroInvalido(f'no máximo {LIMITE_LEITURAS} leituras por pedido')
+    except ParametroInvalido as erro:
+        return _erro(str(erro))
+
+    resultados = registar_leituras(evento_id, leituras)
+    return JsonResponse({
+        'evento': evento_id,
+        'resultados': [
+            {'token': token, 'resultado': resultado} for (token, _), resultado in zip(leituras, resultados)
+        ],
+        'totais': Counter(resultados),
+    })
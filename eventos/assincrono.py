@@ -0,0 +1,29 @@
+"""
+Utilitários para as views assíncronas (servidor ASGI)
+
+O ORM assíncrono do Django executa todas as consultas de um pedido numa única
+thread, uma de cada vez. ``em_paralelo`` corre consultas independentes em
+threads próprias, cada uma com a sua ligação à base de dados, e espera por
+todas; o event loop continua livre para outros clientes.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+
+def _isolada(funcao):
+    def executar():
+        try:
+            return funcao()
+        finally:
+            # A thread não é a do pedido: fecha a ligação se expirou (CONN_MAX_AGE)
+            close_old_connections()
+    return executar
+
+
+async def em_paralelo(*funcoes):
+    """Executa funções síncronas sem argumentos em simultâneo e retorna os resultados por ordem"""
+    return await asyncio.gather(*(
+        sync_to_async(_isolada(funcao), thread_sensitive=False)() for funcao in funcoes
+    ))
@@ -0,0 +1,37 @@
+"""
+Carregamento do utilizador autenticado sem consultas em cada pedido
+
+``BackendUsuarioCache`` carrega o ``User`` já com o ``perfil`` (uma consulta
+com select_related) e guarda-o no cache partilhado. Os sinais de ``User`` e
+``PerfilUsuario`` apagam a entrada depois do commit, então alterações
+(incluindo is_active e a palavra-passe, que invalida sessões) valem no pedido
+seguinte em qualquer processo.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+
+from shalom_project.cache import partilhado
+
+
+CHAVE_USUARIO = 'auth:usuario:{id}'
+
+
+def invalidar_usuario(usuario_id):
+    """Descarta o utilizador guardado em cache"""
+    partilhado().delete(CHAVE_USUARIO.format(id=usuario_id))
+
+
+class BackendUsuarioCache(ModelBackend):
+    """ModelBackend cujo get_user vem do cache, com o perfil já carregado"""
+
+    def get_user(self, user_id):
+        cache = partilhado()
+        chave = CHAVE_USUARIO.format(id=user_id)
+        usuario = cache.get(chave)
+        if usuario is None:
+            usuario = User._default_manager.select_related('perfil').filter(pk=user_id).first()
+            if usuario is None:
+                return None
+            cache.set(chave, usuario, settings.AUTH_USUARIO_CACHE_TIMEOUT)
+        return usuario if self.user_can_authenticate(usuario) else None
@@ -0,0 +1,192 @@
+"""
+Cache da página inicial (dados do feed e fragmentos renderizados)
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from shalom_project.cache import aobter_ou_calcular, invalidar_namespace, obter_ou_calcular, versao_namespace
+
+from .assincrono import em_paralelo
+from .models import Evento, Noticia, Categoria
+
+
+NAMESPACE_HOME = 'eventos:home'
+CHAVE_FEED_HOME = 'eventos:home:feed:{geracao}'
+
+
+def geracao_home():
+    """Retorna a geração atual do cache da página inicial"""
+    return versao_namespace(NAMESPACE_HOME)
+
+
+def invalidar_home():
+    """Invalida dados e fragmentos da página inicial avançando a geração"""
+    invalidar_namespace(NAMESPACE_HOME)
+
+
+def _tempo_ate_expirar(eventos):
+    """
+    Tempo de vida das entradas: o TTL configurado, encurtado até o início
+    do próximo evento listado para que ele saia de "próximos eventos" a tempo
+    """
+    timeout = settings.HOME_CACHE_TIMEOUT
+    agora = timezone.now()
+    for evento in eventos:
+        segundos = int((evento.data_inicio - agora).total_seconds()) + 1
+        timeout = min(timeout, max(segundos, 1))
+    return timeout
+
+
+def _proximos_eventos(agora):
+    return list(Evento.objects.filter(
+        status='publicado',
+        data_inicio__gte=agora
+    ).select_related('categoria').order_by('data_inicio')[:5])
+
+
+def _consultas_feed(agora):
+    """
+    Consultas independentes da página inicial, como funções sem argumentos
+    (a versão assíncrona executa-as em simultâneo)
+    """
+    return {
+        # Eventos em destaque (marcados como em_destaque)
+        'eventos_destaque': lambda: list(Evento.objects.filter(
+            status='publicado',
+            em_destaque=True,
+            data_inicio__gte=agora
+        ).select_related('categoria').order_by('data_inicio')[:5]),
+        # Eventos recentes
+        'eventos_recentes': lambda: list(Evento.objects.filter(
+            status='publicado'
+        ).select_related('categoria').order_by('-criado_em')[:6]),
+        # Notícias em destaque
+        'noticias_destaque': lambda: list(Noticia.objects.filter(
+            status='publicado',
+            em_destaque=True
+        ).select_related('categoria', 'autor').order_by('-data_publicacao')[:3]),
+        # Notícias recentes
+        'noticias_recentes': lambda: list(Noticia.objects.filter(
+            status='publicado'
+        ).select_related('categoria', 'autor').order_by('-data_publicacao')[:6]),
+        # Categorias populares
+        'categorias': lambda: list(Categoria.objects.all()[:6]),
+    }
+
+
+def _montar_feed():
+    """Executa as consultas da página inicial e monta o carrossel"""
+    agora = timezone.now()
+    resultados = {nome: consulta() for nome, consulta in _consultas_feed(agora).items()}
+
+    # Se não houver eventos em destaque, buscar os próximos eventos
+    if not resultados['eventos_destaque']:
+        resultados['eventos_destaque'] = _proximos_eventos(agora)
+    return _contexto_feed(**resultados)
+
+
+async def _amontar_feed():
+    """Versão assíncrona de ``_montar_feed``: as consultas correm em simultâneo"""
+    agora = timezone.now()
+    consultas = _consultas_feed(agora)
+    resultados = dict(zip(consultas, await em_paralelo(*consultas.values())))
+
+    if not resultados['eventos_destaque']:
+        resultados['eventos_destaque'] = await sync_to_async(_proximos_eventos)(agora)
+    return _contexto_feed(**resultados)
+
+
+def _contexto_feed(eventos_destaque, eventos_recentes, noticias_destaque, noticias_recentes, categorias):
+    """Monta o carrossel e o contexto do feed a partir dos resultados das consultas"""
+    # Combinar eventos e notícias em destaque para o carrossel
+    carousel_items = []
+
+    # Adicionar eventos em destaque
+    for evento in eventos_destaque:
+        carousel_items.append({
+            'id': evento.id,
+            'titulo': evento.titulo,
+            'imagem': evento.imagem,
+            'imagem_derivados': evento.imagem_derivados,
+            'categoria': evento.categoria,
+            'data_inicio': evento.data_inicio,
+            'local': evento.local,
+            'preco': evento.preco,
+            'tipo': 'evento'
+        })
+
+    # Adicionar notícias em destaque
+    for noticia in noticias_destaque:
+        carousel_items.append({
+            'id': noticia.id,
+            'titulo': noticia.titulo,
+            'imagem': noticia.imagem,
+            'imagem_derivados': noticia.imagem_derivados,
+            'categoria': noticia.categoria,
+            'data_publicacao': noticia.data_publicacao,
+            'autor': noticia.autor,
+            'visualizacoes': noticia.visualizacoes,
+            'tipo': 'noticia'
+        })
+
+    # Ordenar por data (mais recentes primeiro)
+    carousel_items.sort(key=lambda x: x.get('data_publicacao', x.get('data_inicio')), reverse=True)
+
+    # Limitar a 5 itens no carrossel
+    carousel_items = carousel_items[:5]
+
+    return {
+        'eventos_destaque': eventos_destaque,
+        'eventos_recentes': eventos_recentes,
+        'noticias_destaque': noticias_destaque,
+        'noticias_recentes': noticias_recentes,
+        'carousel_items': carousel_items,
+        'categorias': categorias,
+    }
+
+
+def _entrada_feed(feed):
+    return {
+        'feed': feed,
+        'expira_em': timezone.now().timestamp() + _tempo_ate_expirar(feed['eventos_destaque']),
+    }
+
+
+def _timeout_entrada(entrada):
+    return max(1, int(entrada['expira_em'] - timezone.now().timestamp()))
+
+
+def _contexto_home(entrada, geracao):
+    contexto = dict(entrada['feed'])
+    contexto['home_geracao'] = geracao
+    # Fragmentos renderizados vivem no máximo até os dados que os geraram
+    contexto['home_cache_timeout'] = _timeout_entrada(entrada)
+    return contexto
+
+
+def obter_feed_home():
+    """
+    Retorna o contexto da página inicial a partir do cache, recalculando-o
+    quando a geração muda ou o TTL expira
+    """
+    geracao = geracao_home()
+    entrada = obter_ou_calcular(
+        CHAVE_FEED_HOME.format(geracao=geracao),
+        lambda: _entrada_feed(_montar_feed()),
+        timeout=_timeout_entrada,
+    )
+    return _contexto_home(entrada, geracao)
+
+
+async def aobter_feed_home():
+    """Versão assíncrona de ``obter_feed_home``"""
+    geracao = await sync_to_async(geracao_home)()
+
+    async def calcular():
+        return _entrada_feed(await _amontar_feed())
+
+    entrada = await aobter_ou_calcular(
+        CHAVE_FEED_HOME.format(geracao=geracao), calcular, timeout=_timeout_entrada
+    )
+    return _contexto_home(entrada, geracao)
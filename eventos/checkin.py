@@ -0,0 +1,147 @@
+"""
+Check-in à porta por QR code
+
+O QR code de cada inscrição leva um token assinado (HMAC-SHA256 de
+``django.core.signing``, com a SECRET_KEY) com o id da inscrição e do evento:
+a assinatura e o evento verificam-se sem consultar a base de dados. Os
+leitores autenticam-se com outro token assinado, o do evento
+(``token_leitor``), mostrado no admin do evento. Este expira ao fim de
+CHECKIN_LEITOR_VALIDADE segundos e é assinado com a ``chave_checkin`` do
+evento: renová-la (ação do admin) revoga as credenciais já emitidas.
+
+``registar_leituras`` aplica um lote de leituras (uma de cada vez com rede,
+ou as acumuladas pelo leitor sem rede) com uma consulta de estado e um único
+UPDATE ... WHERE id IN (...) para as presenças novas. Reenviar o mesmo lote
+não muda nada: quem já está presente volta como REPETIDA.
+"""
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.db.models import Case, F, QuerySet, Value, When
+from django.utils import timezone
+
+from .models import Evento, Inscricao
+from .signals import inscricoes_alteradas
+
+
+REGISTADA = 'registada'
+REPETIDA = 'repetida'
+# Cancelada, expirada, em lista de espera ou removida
+SEM_LUGAR = 'sem_lugar'
+OUTRO_EVENTO = 'outro_evento'
+INVALIDA = 'invalida'
+
+# Estados em que a leitura marca presença
+STATUS_CHECKIN = ('pendente', 'confirmada')
+
+_assinatura_inscricao = signing.Signer(salt='eventos.checkin', algorithm='sha256')
+
+
+def token_inscricao(inscricao):
+    """Conteúdo do QR code da inscrição"""
+    return _assinatura_inscricao.sign(f'{inscricao.pk}.{inscricao.evento_id}')
+
+
+def ler_token(token):
+    """(inscricao_id, evento_id) do token, ou None se a assinatura não confere"""
+    if not isinstance(token, str):
+        return None
+    try:
+        inscricao_id, evento_id = _assinatura_inscricao.unsign(token).split('.')
+        return int(inscricao_id), int(evento_id)
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def _assinatura_leitor(chave):
+    return signing.TimestampSigner(salt=f'eventos.checkin.leitor.{chave}', algorithm='sha256')
+
+
+def token_leitor(evento):
+    """Credencial dos leitores do evento (Authorization: Bearer ...)"""
+    return _assinatura_leitor(evento.chave_checkin).sign(str(evento.pk))
+
+
+def evento_do_leitor(token):
+    """Id do evento da credencial do leitor, ou None se inválida, expirada ou revogada"""
+    evento_id = token.partition(':')[0]
+    if not evento_id.isdecimal():
+        return None
+    chave = Evento.objects.filter(pk=int(evento_id)).values_list('chave_checkin', flat=True).first()
+    if chave is None:
+        return None
+    try:
+        _assinatura_leitor(chave).unsign(token, max_age=settings.CHECKIN_LEITOR_VALIDADE)
+    except signing.BadSignature:
+        return None
+    return int(evento_id)
+
+
+def registar_leituras(evento_id, leituras):
+    """
+    Aplica as leituras [(token, momento ou None)] de um leitor de ``evento_id``
+
+    Retorna o resultado de cada leitura, pela mesma ordem. ``data_presenca``
+    fica com o momento da leitura (limitado ao presente), não o do envio.
+    """
+    agora = timezone.now()
+    resultados = []
+    momentos = {}  # inscricao_id -> momento da primeira leitura no lote
+    for token, momento in leituras:
+        lido = ler_token(token)
+        if lido is None:
+            resultados.append(INVALIDA)
+        elif lido[1] != evento_id:
+            resultados.append(OUTRO_EVENTO)
+        elif lido[0] in momentos:
+            resultados.append(REPETIDA)
+        else:
+            momentos[lido[0]] = min(momento or agora, agora)
+            resultados.append(lido[0])
+    if not momentos:
+        return resultados
+
+    with transaction.atomic():
+        # Bloqueia as linhas: dois leitores com a mesma pessoa não a registam duas vezes
+        estados = dict(
+            Inscricao.objects.select_for_update()
+            .filter(pk__in=momentos, evento_id=evento_id)
+            .values_list('pk', 'status')
+        )
+        novas = [pk for pk in momentos if estados.get(pk) in STATUS_CHECKIN]
+        if novas:
+            _marcar_presentes(evento_id, novas, estados, momentos, agora)
+
+    novas = set(novas)
+    for posicao, resultado in enumerate(resultados):
+        if isinstance(resultado, int):
+            if resultado in novas:
+                resultados[posicao] = REGISTADA
+            elif estados.get(resultado) == 'presente':
+                resultados[posicao] = REPETIDA
+            else:
+                resultados[posicao] = SEM_LUGAR
+    return resultados
+
+
+def _marcar_presentes(evento_id, novas, estados, momentos, agora):
+    """
+    Um UPDATE para as inscrições ``novas`` (já bloqueadas) e o ajuste do contador
+
+    Pendente e confirmada já ocupam lugar, tal como presente: nenhum lugar é
+    libertado e só inscricoes_confirmadas muda. O contador é ajustado pela
+    diferença, conhecida pelos estados bloqueados, em vez da recontagem do
+    evento inteiro de InscricaoQuerySet.update, cujo custo cresce com o evento.
+    """
+    QuerySet.update(
+        Inscricao.objects.filter(pk__in=novas),
+        status='presente', presente=True, reserva_expira=None,
+        data_presenca=Case(*(When(pk=pk, then=Value(momentos[pk])) for pk in novas), default=Value(agora)),
+    )
+    confirmadas = sum(1 for pk in novas if estados[pk] == 'confirmada')
+    if confirmadas:
+        Evento.objects.filter(pk=evento_id).update(inscricoes_confirmadas=F('inscricoes_confirmadas') - confirmadas)
+    inscricoes_alteradas.send(
+        sender=Inscricao, eventos_ids={evento_id},
+        campos={'status', 'presente', 'reserva_expira', 'data_presenca'}, using=Inscricao.objects.db,
+    )
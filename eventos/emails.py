@@ -0,0 +1,108 @@
+"""
+Envio assíncrono de emails transacionais (padrão outbox)
+
+``enfileirar_email`` apenas insere uma linha em ``EmailOutbox`` na transação
+corrente: se a transação for desfeita, o email nunca sai; se for confirmada,
+o worker (``run_mail_worker``) envia-o. Assim, o tempo de resposta dos
+pedidos deixa de incluir a conversa com o servidor SMTP.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import EmailOutbox
+
+
+logger = logging.getLogger(__name__)
+
+
+def enfileirar_email(assunto, corpo, destinatarios, corpo_html='', remetente=None):
+    """Coloca um email na fila; fica visível ao worker quando a transação confirmar"""
+    return EmailOutbox.objects.create(
+        assunto=assunto,
+        corpo=corpo,
+        corpo_html=corpo_html,
+        remetente=remetente or settings.DEFAULT_FROM_EMAIL or '',
+        destinatarios=list(destinatarios),
+    )
+
+
+def _mensagem(item, conexao):
+    mensagem = EmailMultiAlternatives(
+        subject=item.assunto,
+        body=item.corpo,
+        from_email=item.remetente or None,
+        to=item.destinatarios,
+        connection=conexao,
+    )
+    if item.corpo_html:
+        mensagem.attach_alternative(item.corpo_html, 'text/html')
+    return mensagem
+
+
+def _atraso(tentativas):
+    """Backoff exponencial: base, 2x base, 4x base... limitado a EMAIL_OUTBOX_BACKOFF_MAXIMO"""
+    segundos = settings.EMAIL_OUTBOX_BACKOFF * (2 ** max(tentativas - 1, 0))
+    return timedelta(seconds=min(segundos, settings.EMAIL_OUTBOX_BACKOFF_MAXIMO))
+
+
+def _registrar_falha(item, erro, agora):
+    item.tentativas += 1
+    item.ultimo_erro = f'{type(erro).__name__}: {erro}'
+    if item.tentativas >= settings.EMAIL_OUTBOX_MAX_TENTATIVAS:
+        # Dead letter: fica em 'falhou' para análise no admin
+        item.status = 'falhou'
+        logger.error('Email %s descartado após %s tentativas: %s', item.pk, item.tentativas, item.ultimo_erro)
+    else:
+        item.proxima_tentativa = agora + _atraso(item.tentativas)
+
+
+def processar_fila(lote=None):
+    """
+    Envia um lote de emails pendentes numa única ligação SMTP
+
+    As linhas são bloqueadas com ``SKIP LOCKED``, pelo que vários workers
+    podem correr em paralelo sem enviar o mesmo email duas vezes. Retorna o
+    número de emails processados (enviados ou não).
+    """
+    lote = lote or settings.EMAIL_OUTBOX_LOTE
+    agora = timezone.now()
+
+    with transaction.atomic():
+        itens = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status='pendente', proxima_tentativa__lte=agora)
+            .order_by('proxima_tentativa', 'id')[:lote]
+        )
+        if not itens:
+            return 0
+
+        conexao = get_connection(fail_silently=False)
+        try:
+            conexao.open()
+        except Exception as erro:
+            logger.warning('Não foi possível abrir a ligação SMTP: %s', erro)
+            for item in itens:
+                _registrar_falha(item, erro, agora)
+        else:
+            try:
+                for item in itens:
+                    try:
+                        _mensagem(item, conexao).send()
+                    except Exception as erro:
+                        _registrar_falha(item, erro, agora)
+                    else:
+                        item.status = 'enviado'
+                        item.enviado_em = timezone.now()
+                        item.ultimo_erro = ''
+            finally:
+                conexao.close()
+
+        EmailOutbox.objects.bulk_update(
+            itens, ['status', 'tentativas', 'proxima_tentativa', 'ultimo_erro', 'enviado_em']
+        )
+    return len(itens)
@@ -0,0 +1,242 @@
+"""
+Exportação das inscrições (participantes) em CSV ou XLSX, em fluxo
+
+As linhas saem de um cursor do lado do servidor (``values_list`` +
+``.iterator(chunk_size=...)``) e são convertidas em blocos de bytes à medida
+que chegam: a memória não cresce com o número de inscrições e o download
+começa logo. O XLSX é escrito diretamente num zip em fluxo (uma folha com
+texto inline), sem bibliotecas externas; o CSV pode ir comprimido em gzip.
+
+Células de texto começadas por ``=``, ``+``, ``-`` ou ``@`` (ou tab/CR) levam
+um apóstrofo à frente: o Excel e o LibreOffice tomá-las-iam por fórmulas
+(injeção de fórmulas a partir de nomes e perfis preenchidos pelos utilizadores).
+
+Com ASGI, a resposta recebe um iterador assíncrono: a um iterador síncrono o
+Django só o consome inteiro numa thread, juntando o ficheiro todo em memória
+antes do primeiro byte. Cada bloco é então gerado com sync_to_async na thread
+partilhada, a mesma do cursor do lado do servidor.
+"""
+import csv
+import re
+import zipfile
+import zlib
+from datetime import datetime
+from itertools import chain
+from xml.sax.saxutils import escape
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Inscricao
+
+
+COLUNAS = [
+    ('Evento', 'evento__titulo'),
+    ('Utilizador', 'participante__username'),
+    ('Nome', 'participante__first_name'),
+    ('Apelido', 'participante__last_name'),
+    ('Email', 'participante__email'),
+    ('Telefone', 'participante__perfil__telefone'),
+    ('NIF', 'participante__perfil__nif'),
+    ('Concelho', 'participante__perfil__concelho'),
+    ('Estado', 'status'),
+    ('Data de inscrição', 'data_inscricao'),
+    ('Presente', 'presente'),
+]
+
+FORMATOS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+
+CHUNK_SIZE = 2000
+# Inícios de célula que as folhas de cálculo interpretam como fórmula
+_INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+# Bytes acumulados antes de entregar um bloco ao cliente
+TAMANHO_BLOCO = 64 * 1024
+
+
+def linhas_inscricoes(queryset, chunk_size=CHUNK_SIZE):
+    """Linhas (tuplas de texto) das inscrições, lidas em fluxo do cursor"""
+    estados = dict(Inscricao.STATUS_CHOICES)
+    campos = [campo for _, campo in COLUNAS]
+    posicao_estado = campos.index('status')
+    valores = queryset.order_by(
+        'evento_id', 'participante__first_name', 'participante__last_name', 'participante__username'
+    ).values_list(*campos)
+    for linha in valores.iterator(chunk_size=chunk_size):
+        linha = [_texto(valor) for valor in linha]
+        linha[posicao_estado] = estados.get(linha[posicao_estado], linha[posicao_estado])
+        yield linha
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, bool):
+        return 'Sim' if valor else 'Não'
+    if isinstance(valor, datetime):
+        return timezone.localtime(valor).strftime('%d/%m/%Y %H:%M')
+    texto = str(valor)
+    if texto.startswith(_INICIO_FORMULA):
+        return "'" + texto
+    return texto
+
+
+def cabecalho():
+    return [titulo for titulo, _ in COLUNAS]
+
+
+class _Eco:
+    """Destino do csv.writer que devolve a linha formatada em vez de a escrever"""
+
+    def write(self, valor):
+        return valor
+
+
+def csv_em_blocos(linhas):
+    # BOM: o Excel só reconhece CSV em UTF-8 com ele
+    escritor = csv.writer(_Eco())
+    bloco, tamanho = ['\ufeff' + escritor.writerow(cabecalho())], 0
+    for linha in linhas:
+        texto = escritor.writerow(linha)
+        bloco.append(texto)
+        tamanho += len(texto)
+        if tamanho >= TAMANHO_BLOCO:
+            yield ''.join(bloco).encode()
+            bloco, tamanho = [], 0
+    yield ''.join(bloco).encode()
+
+
+def gzip_em_blocos(blocos):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31: cabeçalho gzip
+    for bloco in blocos:
+        comprimido = compressor.compress(bloco)
+        if comprimido:
+            yield comprimido
+    yield compressor.flush()
+
+
+class _SaidaZip:
+    """Ficheiro só de escrita e sem seek: o zipfile escreve em modo fluxo"""
+
+    def __init__(self):
+        self.partes = []
+        self.tamanho = 0
+
+    def write(self, dados):
+        self.partes.append(bytes(dados))
+        self.tamanho += len(dados)
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def esvaziar(self):
+        if self.partes:
+            yield b''.join(self.partes)
+            self.partes, self.tamanho = [], 0
+
+
+_XLSX_FIXOS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Inscrições" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+# Caracteres de controlo que o XML não admite
+_INVALIDOS_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _linha_xlsx(linha):
+    celulas = ''.join(
+        f'<c t="inlineStr"><is><t xml:space="preserve">{escape(_INVALIDOS_XML.sub("", valor))}</t></is></c>'
+        for valor in linha
+    )
+    return f'<row>{celulas}</row>'.encode()
+
+
+def xlsx_em_blocos(linhas):
+    saida = _SaidaZip()
+    with zipfile.ZipFile(saida, 'w', zipfile.ZIP_DEFLATED) as arquivo:
+        for nome, conteudo in _XLSX_FIXOS.items():
+            arquivo.writestr(nome, conteudo)
+        with arquivo.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as folha:
+            folha.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            for linha in chain([cabecalho()], linhas):
+                folha.write(_linha_xlsx(linha))
+                if saida.tamanho >= TAMANHO_BLOCO:
+                    yield from saida.esvaziar()
+            folha.write(b'</sheetData></worksheet>')
+    yield from saida.esvaziar()
+
+
+def exportar(queryset, formato='csv', comprimir=False, chunk_size=CHUNK_SIZE):
+    """
+    Blocos de bytes do ficheiro exportado
+
+    ``comprimir`` aplica-se só ao CSV; o XLSX já é um zip.
+    """
+    linhas = linhas_inscricoes(queryset, chunk_size)
+    if formato == 'xlsx':
+        return xlsx_em_blocos(linhas)
+    blocos = csv_em_blocos(linhas)
+    return gzip_em_blocos(blocos) if comprimir else blocos
+
+
+async def _blocos_assincronos(blocos):
+    """Os mesmos blocos para o servidor ASGI, um a um, sem juntar o ficheiro"""
+    proximo = sync_to_async(next, thread_sensitive=True)
+    try:
+        while (bloco := await proximo(blocos, None)) is not None:
+            yield bloco
+    finally:
+        # Cliente desligado a meio: fecha o cursor na thread que o abriu
+        await sync_to_async(blocos.close, thread_sensitive=True)()
+
+
+def resposta_exportacao(queryset, formato='csv', comprimir=False, nome='inscricoes'):
+    """StreamingHttpResponse com o download da exportação"""
+    tipo, extensao = FORMATOS[formato]
+    comprimir = comprimir and formato == 'csv'
+    if comprimir:
+        tipo, extensao = 'application/gzip', f'{extensao}.gz'
+    blocos = exportar(queryset, formato, comprimir)
+    if settings.ASGI:
+        blocos = _blocos_assincronos(blocos)
+    resposta = StreamingHttpResponse(blocos, content_type=tipo)
+    resposta['Content-Disposition'] = f'attachment; filename="{nome}-{timezone.localdate():%Y%m%d}.{extensao}"'
+    return resposta
@@ -3,6 +3,9 @@ from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 
+from .importacao import ESTADOS
+from .models import Evento, Inscricao
+
 
 class RegistroUsuarioForm(UserCreationForm):
     """Formulário personalizado para registro de usuário"""
@@ -66,4 +69,26 @@ class RegistroUsuarioForm(UserCreationForm):
         if password1 and password2 and password1 != password2:
             raise ValidationError('As senhas não coincidem.')
         
-        return cleaned_data 
\ No newline at end of file
+        return cleaned_data
+
+
+class ImportacaoParticipantesForm(forms.Form):
+    """Envio do CSV de participantes no admin (ver importacao.py)"""
+    ficheiro = forms.FileField(
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control-file', 'accept': '.csv'}),
+        help_text='CSV em UTF-8 com as colunas Utilizador e Email e, opcionalmente, '
+                  'Nome, Apelido, Telefone, NIF, Concelho e Distrito'
+    )
+    evento = forms.ModelChoiceField(
+        queryset=Evento.objects.all(), required=False,
+        help_text='Inscrever os participantes importados neste evento'
+    )
+    status = forms.ChoiceField(
+        choices=[(codigo, nome) for codigo, nome in Inscricao.STATUS_CHOICES if codigo in ESTADOS],
+        initial='confirmada', label='Estado das inscrições',
+        widget=forms.Select(attrs={'class': 'form-control'}),
+        help_text='Sem lugares livres, as inscrições entram na lista de espera'
+    )
+    simular = forms.BooleanField(
+        required=False, help_text='Validar e mostrar o relatório sem gravar nada'
+    )
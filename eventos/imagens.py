@@ -0,0 +1,192 @@
+"""
+Derivados responsivos das imagens de eventos e notícias
+
+Ao gravar uma imagem nova, são geradas cópias redimensionadas em WebP e JPEG
+nas larguras de IMAGENS_LARGURAS, guardadas em ``derivados/`` no storage de
+media. O processamento corre numa thread em segundo plano depois do commit,
+fora do tempo de resposta do admin; ``gerar_derivados_imagens`` cobre a media
+já existente. O resultado fica em ``imagem_derivados`` e é usado pela tag
+``imagem_responsiva``.
+"""
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from PIL import Image, ImageOps
+
+from .cache import invalidar_home
+from .models import Evento, Noticia
+
+
+logger = logging.getLogger(__name__)
+
+PASTA_DERIVADOS = 'derivados'
+
+# Formato -> (formato Pillow, extensão, opções de gravação)
+FORMATOS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_executor = None
+_lock_executor = threading.Lock()
+
+
+def _larguras(largura_original):
+    """Larguras configuradas menores que o original, mais o original se couber no máximo"""
+    larguras = [largura for largura in settings.IMAGENS_LARGURAS if largura < largura_original]
+    if largura_original <= max(settings.IMAGENS_LARGURAS):
+        larguras.append(largura_original)
+    return larguras
+
+
+def _para_jpeg(imagem):
+    """JPEG não tem transparência: compõe sobre fundo branco"""
+    if imagem.mode in ('RGBA', 'LA') or (imagem.mode == 'P' and 'transparency' in imagem.info):
+        imagem = imagem.convert('RGBA')
+        fundo = Image.new('RGB', imagem.size, (255, 255, 255))
+        fundo.paste(imagem, mask=imagem.getchannel('A'))
+        return fundo
+    return imagem.convert('RGB')
+
+
+def gerar_derivados(arquivo):
+    """
+    Gera as cópias redimensionadas de ``arquivo`` (um FieldFile) e retorna o
+    dicionário guardado em ``imagem_derivados``
+    """
+    with arquivo.open('rb'):
+        original = Image.open(arquivo)
+        # Fotos de telemóvel trazem a rotação no EXIF
+        original = ImageOps.exif_transpose(original)
+        original.load()
+
+    largura, altura = original.size
+    base = posixpath.splitext(arquivo.name)[0]
+    derivados = {'origem': arquivo.name, 'largura': largura, 'altura': altura}
+    for formato in FORMATOS:
+        derivados[formato] = {}
+
+    for largura_derivado in _larguras(largura):
+        altura_derivado = max(1, round(altura * largura_derivado / largura))
+        copia = original.resize((largura_derivado, altura_derivado), Image.LANCZOS)
+        for formato, (formato_pil, extensao, opcoes) in FORMATOS.items():
+            imagem = _para_jpeg(copia) if formato_pil == 'JPEG' else copia
+            if formato_pil == 'WEBP' and imagem.mode not in ('RGB', 'RGBA'):
+                imagem = imagem.convert('RGBA' if 'A' in imagem.getbands() else 'RGB')
+            buffer = BytesIO()
+            imagem.save(buffer, formato_pil, **opcoes)
+            nome = default_storage.save(
+                f'{PASTA_DERIVADOS}/{base}-{largura_derivado}w.{extensao}',
+                ContentFile(buffer.getvalue()),
+            )
+            derivados[formato][str(largura_derivado)] = nome
+
+    return derivados
+
+
+def _arquivos(derivados):
+    return {
+        nome
+        for formato in FORMATOS
+        for nome in (derivados or {}).get(formato, {}).values()
+    }
+
+
+def _apagar(nomes):
+    for nome in nomes:
+        try:
+            default_storage.delete(nome)
+        except OSError:
+            logger.warning('Não foi possível apagar o derivado %s', nome)
+
+
+def _origem_em_uso(origem):
+    """Se algum evento ou notícia usa o original ``origem`` ou os seus derivados"""
+    return any(
+        modelo.objects.filter(Q(imagem=origem) | Q(imagem_derivados__origem=origem)).exists()
+        for modelo in (Evento, Noticia)
+    )
+
+
+def remover_derivados(derivados, manter=()):
+    """
+    Apaga do storage os ficheiros de um dicionário de derivados, exceto ``manter``
+
+    O ArmazenamentoMediaHash grava uma só vez imagens idênticas, e os nomes
+    dos derivados derivam do nome do original: objetos com a mesma imagem
+    partilham os ficheiros. Se o original ainda estiver em uso, nada é apagado.
+    """
+    origem = (derivados or {}).get('origem')
+    if origem and _origem_em_uso(origem):
+        return
+    _apagar(_arquivos(derivados) - set(manter))
+
+
+def processar_imagem(modelo, pk):
+    """Gera os derivados da imagem atual de um objeto e grava-os com UPDATE"""
+    objeto = modelo.objects.filter(pk=pk).only('imagem', 'imagem_derivados').first()
+    if objeto is None or not objeto.imagem:
+        return None
+
+    anteriores = objeto.imagem_derivados or {}
+    derivados = gerar_derivados(objeto.imagem)
+
+    # Só grava se a imagem não mudou entretanto; senão, outro processamento tratará dela
+    atualizados = modelo.objects.filter(pk=pk, imagem=derivados['origem']).update(imagem_derivados=derivados)
+    if atualizados:
+        remover_derivados(anteriores, manter=_arquivos(derivados))
+        invalidar_home()
+    else:
+        remover_derivados(derivados)
+    return derivados
+
+
+def _processar_em_segundo_plano(rotulo_modelo, pk):
+    try:
+        processar_imagem(apps.get_model(rotulo_modelo), pk)
+    except Exception:
+        logger.exception('Falha ao gerar derivados de %s %s', rotulo_modelo, pk)
+    finally:
+        close_old_connections()
+
+
+def _obter_executor():
+    """Executor criado no primeiro uso (já depois do fork do gunicorn)"""
+    global _executor
+    if _executor is None:
+        with _lock_executor:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.IMAGENS_THREADS, thread_name_prefix='derivados-imagem'
+                )
+    return _executor
+
+
+def agendar_derivados(instancia):
+    """Agenda a geração de derivados se a imagem do objeto mudou"""
+    modelo = type(instancia)
+    if not instancia.imagem:
+        # A instância pode estar desatualizada; o que conta é o que está gravado
+        anteriores = modelo.objects.filter(pk=instancia.pk).values_list('imagem_derivados', flat=True).first()
+        if anteriores:
+            modelo.objects.filter(pk=instancia.pk).update(imagem_derivados={})
+            transaction.on_commit(lambda: remover_derivados(anteriores))
+        return
+
+    if instancia.imagem.name == (instancia.imagem_derivados or {}).get('origem'):
+        return
+
+    rotulo = modelo._meta.label
+    if settings.IMAGENS_DERIVADOS_ASSINCRONO:
+        transaction.on_commit(lambda: _obter_executor().submit(_processar_em_segundo_plano, rotulo, instancia.pk))
+    else:
+        transaction.on_commit(lambda: _processar_em_segundo_plano(rotulo, instancia.pk))
@@ -0,0 +1,250 @@
+"""
+Importação em lote de participantes (User, PerfilUsuario e Inscricao) a partir de CSV
+
+O ficheiro é lido e validado em fluxo, em lotes de ``LOTE`` linhas. Cada
+lote verifica os utilizadores, emails e NIF já existentes com uma consulta
+por coluna (``__in``) e grava com ``bulk_create``, sem save() nem sinais por
+linha; tudo numa transação. As linhas inválidas ou repetidas não são
+importadas e ficam no relatório (``ResultadoImportacao.erros``).
+
+Os utilizadores importados ficam sem senha utilizável: calcular o hash de
+milhares de senhas levaria horas e o ficheiro não as traz.
+
+Com um evento indicado, cada pessoa é inscrita com o estado pedido enquanto
+houver lugares (o evento fica bloqueado durante a importação) e as
+restantes entram na lista de espera, pela ordem do ficheiro.
+"""
+import csv
+import io
+import secrets
+
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.contrib.auth.models import User
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from .models import Evento, Inscricao, PerfilUsuario, prazo_reserva
+
+
+# Cabeçalho (sem maiúsculas) → campo; os nomes da exportação também servem
+COLUNAS = {
+    'utilizador': 'username',
+    'username': 'username',
+    'email': 'email',
+    'nome': 'first_name',
+    'apelido': 'last_name',
+    'telefone': 'telefone',
+    'nif': 'nif',
+    'concelho': 'concelho',
+    'distrito': 'distrito',
+}
+# Nome de cada campo nas mensagens de erro
+ROTULOS = {
+    'username': 'Utilizador', 'email': 'Email', 'first_name': 'Nome', 'last_name': 'Apelido',
+    'telefone': 'Telefone', 'nif': 'NIF', 'concelho': 'Concelho', 'distrito': 'Distrito',
+}
+OBRIGATORIAS = ('username', 'email')
+CAMPOS_USUARIO = ('username', 'email', 'first_name', 'last_name')
+CAMPOS_PERFIL = ('telefone', 'concelho', 'distrito')
+ESTADOS = ('confirmada', 'pendente')
+
+LOTE = 1000
+
+_validar_username = UnicodeUsernameValidator()
+
+
+class ErroImportacao(Exception):
+    """O ficheiro não pode ser importado (ex.: falta uma coluna obrigatória)"""
+
+
+class ResultadoImportacao:
+    def __init__(self):
+        self.linhas = 0
+        self.usuarios = 0
+        self.inscricoes = 0
+        self.em_espera = 0
+        self.erros = []  # (número da linha, mensagem)
+
+    def erro(self, numero, mensagem):
+        self.erros.append((numero, mensagem))
+
+
+def ler_csv(ficheiro):
+    """
+    (número da linha, dados) de cada linha não vazia de um ficheiro binário
+
+    Aceita UTF-8 com ou sem BOM e separador ',' ou ';' (Excel em português).
+    Levanta ErroImportacao para outras codificações (ex.: o "CSV" do Excel,
+    em Windows-1252) em vez de importar nomes com caracteres trocados.
+    """
+    texto = io.TextIOWrapper(ficheiro, encoding='utf-8-sig', newline='')
+    try:
+        # O texto é descodificado por blocos: o erro pode surgir em qualquer linha
+        yield from _linhas_csv(texto)
+    except UnicodeDecodeError:
+        raise ErroImportacao(
+            'O ficheiro não está em UTF-8. No Excel, guarde-o como "CSV UTF-8 (delimitado por vírgulas)".'
+        )
+    except csv.Error as erro:
+        raise ErroImportacao(f'O ficheiro não é um CSV válido: {erro}.')
+
+
+def _linhas_csv(texto):
+    primeira = texto.readline()
+    separador = ';' if primeira.count(';') > primeira.count(',') else ','
+    campos = [COLUNAS.get(nome.strip().lower()) for nome in next(csv.reader([primeira], delimiter=separador), [])]
+    faltam = [ROTULOS[campo] for campo in OBRIGATORIAS if campo not in campos]
+    if faltam:
+        raise ErroImportacao(f'Colunas obrigatórias em falta: {", ".join(faltam)}.')
+
+    leitor = csv.reader(texto, delimiter=separador)
+    for valores in leitor:
+        if any(valor.strip() for valor in valores):
+            # line_num + 1: a primeira linha foi lida fora do leitor
+            yield leitor.line_num + 1, {
+                campo: valor.strip() for campo, valor in zip(campos, valores) if campo
+            }
+
+
+def _validar(dados):
+    """Mensagem de erro da linha, ou None; normaliza email e NIF em ``dados``"""
+    if not dados.get('username'):
+        return 'utilizador em falta'
+    try:
+        _validar_username(dados['username'])
+    except ValidationError:
+        return f'utilizador inválido: {dados["username"]}'
+
+    dados['email'] = User.objects.normalize_email(dados.get('email', ''))
+    if not dados['email']:
+        return 'email em falta'
+    try:
+        validate_email(dados['email'])
+    except ValidationError:
+        return f'email inválido: {dados["email"]}'
+
+    dados['nif'] = dados.get('nif') or None
+    if dados['nif'] and not (len(dados['nif']) == 9 and dados['nif'].isdigit()):
+        return f'NIF deve ter 9 dígitos: {dados["nif"]}'
+
+    for modelo, campos in ((User, CAMPOS_USUARIO), (PerfilUsuario, CAMPOS_PERFIL)):
+        for campo in campos:
+            limite = modelo._meta.get_field(campo).max_length
+            if len(dados.get(campo, '')) > limite:
+                return f'{ROTULOS[campo]} com mais de {limite} caracteres'
+    return None
+
+
+def importar(ficheiro, evento=None, status='confirmada', simular=False, lote=LOTE):
+    """
+    Importa os participantes de ``ficheiro`` (binário) e retorna o ResultadoImportacao
+
+    Com ``simular``, tudo é validado e gravado mas a transação é desfeita.
+    Levanta ErroImportacao se o cabeçalho ou a codificação não servirem;
+    nesse caso nada é gravado.
+    """
+    if status not in ESTADOS:
+        raise ErroImportacao(f'Estado inválido: {status}.')
+
+    resultado = ResultadoImportacao()
+    # Chaves já usadas por linhas anteriores do próprio ficheiro
+    vistos = {'username': set(), 'email': set(), 'nif': set()}
+    with transaction.atomic():
+        livres = None
+        if evento is not None:
+            # Bloqueia o evento: as inscrições pelo site esperam pelo fim da importação
+            evento = Evento.objects.select_for_update().get(pk=evento.pk)
+            if evento.capacidade_maxima:
+                livres = max(evento.capacidade_maxima - evento.lugares_ocupados, 0)
+
+        pendentes = []
+        for numero, dados in ler_csv(ficheiro):
+            resultado.linhas += 1
+            erro = _validar(dados)
+            if erro:
+                resultado.erro(numero, erro)
+                continue
+            pendentes.append((numero, dados))
+            if len(pendentes) >= lote:
+                livres = _gravar_lote(pendentes, vistos, evento, status, livres, resultado)
+                pendentes = []
+        if pendentes:
+            _gravar_lote(pendentes, vistos, evento, status, livres, resultado)
+
+        if simular:
+            transaction.set_rollback(True)
+    resultado.erros.sort()
+    return resultado
+
+
+def _gravar_lote(linhas, vistos, evento, status, livres, resultado):
+    """Grava as linhas válidas de um lote e retorna os lugares que sobram"""
+    usernames = {dados['username'] for _, dados in linhas}
+    emails = {dados['email'].lower() for _, dados in linhas}
+    nifs = {dados['nif'] for _, dados in linhas if dados['nif']}
+    existentes = {
+        'username': set(User.objects.filter(username__in=usernames).values_list('username', flat=True)),
+        'email': set(
+            User.objects.annotate(email_normalizado=Lower('email'))
+            .filter(email_normalizado__in=emails)
+            .values_list('email_normalizado', flat=True)
+        ),
+        'nif': set(PerfilUsuario.objects.filter(nif__in=nifs).values_list('nif', flat=True)),
+    }
+
+    novos = []
+    for numero, dados in linhas:
+        chaves = {'username': dados['username'], 'email': dados['email'].lower(), 'nif': dados['nif']}
+        conflito = next(
+            (campo for campo, valor in chaves.items() if valor and (valor in existentes[campo] or valor in vistos[campo])),
+            None,
+        )
+        if conflito:
+            origem = 'repetido no ficheiro' if chaves[conflito] in vistos[conflito] else 'já existe'
+            resultado.erro(numero, f'{ROTULOS[conflito]} {origem}: {chaves[conflito]}')
+            continue
+        for campo, valor in chaves.items():
+            if valor:
+                vistos[campo].add(valor)
+        novos.append(dados)
+    if not novos:
+        return livres
+
+    # Senha não utilizável, como make_password(None), mas com o sufixo
+    # aleatório do módulo secrets (get_random_string é lento em milhares de linhas)
+    usuarios = User.objects.bulk_create(
+        User(password=UNUSABLE_PASSWORD_PREFIX + secrets.token_hex(20), **{campo: dados.get(campo, '') for campo in CAMPOS_USUARIO})
+        for dados in novos
+    )
+    PerfilUsuario.objects.bulk_create(
+        PerfilUsuario(usuario=usuario, nif=dados['nif'], **{campo: dados.get(campo, '') for campo in CAMPOS_PERFIL})
+        for usuario, dados in zip(usuarios, novos)
+    )
+    resultado.usuarios += len(usuarios)
+    if evento is None:
+        return livres
+
+    agora = timezone.now()
+    inscricoes = []
+    for usuario in usuarios:
+        if livres is None or livres > 0:
+            inscricoes.append(Inscricao(
+                evento=evento, participante=usuario, status=status,
+                data_confirmacao=agora if status == 'confirmada' else None,
+                reserva_expira=prazo_reserva() if status == 'pendente' else None,
+            ))
+            if livres is not None:
+                livres -= 1
+        else:
+            # Mesmo instante para todo o lote: a ordem da fila desempata pelo id
+            inscricoes.append(Inscricao(evento=evento, participante=usuario, status='espera', entrada_espera=agora))
+    # InscricaoQuerySet.bulk_create reconta os contadores do evento
+    Inscricao.objects.bulk_create(inscricoes)
+    em_espera = sum(1 for inscricao in inscricoes if inscricao.status == 'espera')
+    resultado.em_espera += em_espera
+    resultado.inscricoes += len(inscricoes) - em_espera
+    return livres
@@ -0,0 +1,165 @@
+"""
+Reserva de lugares em eventos e lista de espera
+
+``reservar_lugar`` é seguro com pedidos simultâneos: o lugar é ocupado por um
+UPDATE condicional no contador ``Evento.lugares_ocupados`` (ver
+``Inscricao.save``) na mesma transação que grava a inscrição, então a
+capacidade nunca é ultrapassada e um duplo envio não gera erro 500.
+
+Uma inscrição pendente reserva o lugar até ``reserva_expira``
+(INSCRICAO_RESERVA_HORAS). ``libertar_reservas_expiradas`` passa as reservas
+vencidas a 'expirada' num único UPDATE; corre no comando libertar_reservas e
+antes de recusar um pedido num evento lotado, então a capacidade conta as
+confirmadas e as reservas ainda válidas.
+
+Com o evento lotado, a inscrição entra na lista de espera. Cada lugar
+libertado (cancelamento, remoção, reserva expirada, aumento de capacidade) é
+passado à próxima pessoa por ``promover_lista_espera``, na mesma transação que
+o libertou, com o email de aviso colocado na fila (EmailOutbox).
+"""
+from django.db import IntegrityError, router, transaction
+from django.db.models import F, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from .emails import enfileirar_email
+from .models import STATUS_SEM_LUGAR, Evento, EventoLotado, Inscricao
+
+
+RESERVADA = 'reservada'
+LOTADO = 'lotado'
+JA_INSCRITO = 'ja_inscrito'
+EM_ESPERA = 'em_espera'
+
+
+def reservar_lugar(evento, usuario, lista_espera=True):
+    """
+    Inscreve ``usuario`` em ``evento`` como pendente, se houver lugar
+
+    Retorna (resultado, inscricao), com resultado RESERVADA, JA_INSCRITO,
+    EM_ESPERA ou, sem ``lista_espera``, LOTADO. Uma inscrição cancelada ou
+    expirada é reaproveitada.
+    """
+    existente = Inscricao.objects.filter(evento=evento, participante=usuario).first()
+    if existente is not None and existente.status not in STATUS_SEM_LUGAR:
+        return _resultado_existente(existente)
+
+    libertou = False
+    while True:
+        try:
+            inscricao = _ocupar_lugar(evento, usuario, existente)
+        except EventoLotado:
+            # Lotado talvez só por reservas vencidas que o comando ainda não libertou
+            if not libertou and libertar_reservas_expiradas(evento_id=evento.pk):
+                libertou = True
+                continue
+            if not lista_espera:
+                return LOTADO, None
+            return _entrar_lista_espera(evento, usuario, existente)
+        except IntegrityError:
+            # Outro pedido do mesmo utilizador gravou primeiro (unique_together)
+            return _resultado_existente(Inscricao.objects.get(evento=evento, participante=usuario))
+        return RESERVADA, inscricao
+
+
+def _ocupar_lugar(evento, usuario, existente):
+    # Instância nova a cada tentativa: uma gravação desfeita deixa-lhe um pk que não existe
+    inscricao = existente or Inscricao(evento=evento, participante=usuario)
+    inscricao.status = 'pendente'
+    with transaction.atomic():
+        inscricao.save(verificar_capacidade=True)
+    return inscricao
+
+
+def _resultado_existente(inscricao):
+    if inscricao.status == 'espera':
+        return EM_ESPERA, inscricao
+    return JA_INSCRITO, inscricao
+
+
+def _entrar_lista_espera(evento, usuario, existente):
+    # Instância nova: a gravação desfeita deixou-lhe um pk que não existe
+    inscricao = existente or Inscricao(evento=evento, participante=usuario)
+    # Inscricao.save marca a entrada na lista (entrada_espera)
+    inscricao.status = 'espera'
+    try:
+        with transaction.atomic():
+            inscricao.save()
+            # Um lugar pode ter vagado entre a tentativa e a entrada na fila
+            promover_lista_espera(evento.pk)
+    except IntegrityError:
+        return _resultado_existente(Inscricao.objects.get(evento=evento, participante=usuario))
+
+    inscricao.refresh_from_db(fields=['status'])
+    if inscricao.status == 'pendente':
+        return RESERVADA, inscricao
+    return EM_ESPERA, inscricao
+
+
+def libertar_reservas_expiradas(evento_id=None, agora=None):
+    """
+    Passa a 'expirada' as inscrições pendentes cujo prazo já acabou
+
+    Um único UPDATE pelo índice parcial das reservas; InscricaoQuerySet.update
+    reconta os eventos afetados e promove a lista de espera. Retorna o número
+    de reservas libertadas.
+    """
+    vencidas = Inscricao.objects.filter(
+        status='pendente', reserva_expira__lte=agora or timezone.now()
+    )
+    if evento_id is not None:
+        vencidas = vencidas.filter(evento_id=evento_id)
+    return vencidas.update(status='expirada')
+
+
+def promover_lista_espera(evento_id, using=None):
+    """
+    Passa a pendente a próxima inscrição em espera enquanto houver lugares
+
+    Cada promoção é uma leitura pelo índice parcial da lista de espera
+    (LIMIT 1, SKIP LOCKED) e um UPDATE condicional do contador. Retorna as
+    inscrições promovidas.
+    """
+    using = using or router.db_for_write(Inscricao)
+    livres = Evento.objects.using(using).filter(pk=evento_id).filter(
+        Q(capacidade_maxima=0) | Q(lugares_ocupados__lt=F('capacidade_maxima'))
+    )
+    promovidas = []
+    with transaction.atomic(using=using):
+        while livres.exists():
+            proxima = (
+                Inscricao.objects.using(using)
+                .select_for_update(skip_locked=True, of=('self',))
+                .select_related('participante', 'evento')
+                .filter(evento_id=evento_id, status='espera')
+                .order_by('entrada_espera', 'id')
+                .first()
+            )
+            if proxima is None:
+                break
+            proxima.status = 'pendente'
+            try:
+                proxima.save(using=using, verificar_capacidade=True)
+            except EventoLotado:
+                break
+            _avisar_promocao(proxima)
+            promovidas.append(proxima)
+    return promovidas
+
+
+def _avisar_promocao(inscricao):
+    """Coloca na fila o email para quem saiu da lista de espera"""
+    if not inscricao.participante.email:
+        return
+    html = render_to_string('eventos/email_lista_espera.html', {
+        'user': inscricao.participante,
+        'evento': inscricao.evento,
+        'site_name': 'Comunidade Shalom Portugal',
+    })
+    enfileirar_email(
+        assunto=f'Tem lugar em {inscricao.evento.titulo}',
+        corpo=strip_tags(html),
+        destinatarios=[inscricao.participante.email],
+        corpo_html=html,
+    )
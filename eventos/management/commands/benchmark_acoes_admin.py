@@ -0,0 +1,84 @@
+import time
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from eventos.models import Categoria, Certificado, Evento, Inscricao, novo_codigo_certificado
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede as ações em lote do admin (confirmar, cancelar, marcar presença, gerar códigos) '
+        'contra o antigo save() por linha, num evento temporário'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--linhas', type=int, default=10000,
+                            help='Inscrições (e certificados) do evento temporário')
+        parser.add_argument('--amostra', type=int, default=500,
+                            help='Linhas medidas com save() por linha; o tempo é extrapolado para --linhas')
+
+    def handle(self, *args, **options):
+        marca = uuid.uuid4().hex[:8]
+        linhas = options['linhas']
+        evento, categoria = self._preparar(marca, linhas)
+        try:
+            inscricoes = Inscricao.objects.filter(evento=evento)
+            certificados = Certificado.objects.filter(inscricao__evento=evento)
+            amostra = min(options['amostra'], linhas)
+            ids_amostra = list(inscricoes.values_list('pk', flat=True)[:amostra])
+
+            self.stdout.write(f'{linhas} inscrições; save() por linha medido em {amostra} e extrapolado')
+            self._medir('confirmar (por linha)', linhas / amostra,
+                        lambda: [inscricao.confirmar() for inscricao in inscricoes.filter(pk__in=ids_amostra)])
+            self._medir('confirmar (lote)', 1, inscricoes.confirmar)
+            self._medir('cancelar (lote)', 1, inscricoes.cancelar)
+            self._medir('marcar presença (lote)', 1, inscricoes.marcar_presenca)
+            self._medir('gerar códigos (por linha)', linhas / amostra,
+                        lambda: [certificado.gerar_codigo() for certificado in certificados.filter(inscricao__in=ids_amostra)])
+            self._medir('gerar códigos (lote)', 1, certificados.gerar_codigos)
+
+            evento.refresh_from_db()
+            self.stdout.write(f'Contadores no fim: lugares_ocupados {evento.lugares_ocupados} (esperado {linhas})')
+        finally:
+            evento.delete()
+            User.objects.filter(username__startswith=f'bench_{marca}_').delete()
+            if not categoria.eventos.exists():
+                categoria.delete()
+
+        self.stdout.write(self.style.SUCCESS('Benchmark concluído.'))
+
+    def _preparar(self, marca, linhas):
+        categoria, _ = Categoria.objects.get_or_create(nome='Teste de carga')
+        organizador = User.objects.create(username=f'bench_{marca}_organizador')
+        agora = timezone.now()
+        evento = Evento.objects.create(
+            titulo=f'Benchmark admin {marca}', descricao='Evento temporário', categoria=categoria,
+            data_inicio=agora + timedelta(days=30), data_fim=agora + timedelta(days=31),
+            local='-', endereco='-', capacidade_maxima=0, status='publicado', organizador=organizador,
+        )
+        usuarios = User.objects.bulk_create(
+            (User(username=f'bench_{marca}_{numero}') for numero in range(linhas)), batch_size=1000
+        )
+        inscricoes = Inscricao.objects.bulk_create(
+            (Inscricao(evento=evento, participante=usuario) for usuario in usuarios), batch_size=1000
+        )
+        Certificado.objects.bulk_create(
+            (Certificado(inscricao=inscricao, codigo=novo_codigo_certificado()) for inscricao in inscricoes),
+            batch_size=1000,
+        )
+        return evento, categoria
+
+    def _medir(self, nome, fator, funcao):
+        with CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            funcao()
+            duracao = time.perf_counter() - inicio
+        self.stdout.write(
+            f'  {nome:<28} {duracao * fator:8.2f} s  {round(len(consultas) * fator):>7} consultas'
+        )
@@ -0,0 +1,146 @@
+import json
+import statistics
+import time
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from eventos.api import api_checkin
+from eventos.checkin import REGISTADA, REPETIDA, ler_token, token_inscricao, token_leitor
+from eventos.models import Categoria, Evento, Inscricao
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede o check-in por QR code num evento temporário: verificação dos tokens, latência '
+        'leitura-confirmação de leituras isoladas, lotes sincronizados sem rede e reenvio do mesmo lote'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--inscricoes', type=int, default=3000, help='Inscrições confirmadas do evento')
+        parser.add_argument('--online', type=int, default=300, help='Leituras enviadas uma a uma')
+        parser.add_argument('--lote', type=int, default=500, help='Leituras por lote sincronizado')
+        parser.add_argument('--amostra', type=int, default=100,
+                            help='Presenças marcadas com save() por linha, para comparação')
+
+    def handle(self, *args, **options):
+        marca = uuid.uuid4().hex[:8]
+        total = options['inscricoes']
+        evento, categoria = self._preparar(marca, total)
+        try:
+            inscricoes = list(Inscricao.objects.filter(evento=evento).order_by('pk'))
+            tokens = [token_inscricao(inscricao) for inscricao in inscricoes]
+            amostra = min(options['amostra'], total)
+            online = min(options['online'], total - amostra)
+
+            inicio = time.perf_counter()
+            for token in tokens:
+                ler_token(token)
+            self.stdout.write(
+                f'Verificação HMAC: {(time.perf_counter() - inicio) / total * 1e6:.1f} µs por token, sem consultas'
+            )
+
+            # Como antes: Inscricao.marcar_presenca() com save() por pessoa
+            inicio = time.perf_counter()
+            with CaptureQueriesContext(connection) as consultas:
+                for inscricao in inscricoes[:amostra]:
+                    inscricao.marcar_presenca()
+            duracao = time.perf_counter() - inicio
+            self.stdout.write(
+                f'save() por pessoa:  {duracao / amostra * 1000:7.2f} ms e {len(consultas) / amostra:.0f} consultas por leitura'
+            )
+
+            leitor = token_leitor(evento)
+            latencias = []
+            for token in tokens[amostra:amostra + online]:
+                inicio = time.perf_counter()
+                resultado = self._enviar(leitor, [token])
+                latencias.append((time.perf_counter() - inicio) * 1000)
+                self._esperar(resultado, {REGISTADA: 1})
+            if latencias:
+                percentis = statistics.quantiles(latencias, n=100)
+                self.stdout.write(
+                    f'Leitura isolada:    p50 {percentis[49]:.2f} ms  p95 {percentis[94]:.2f} ms  '
+                    f'p99 {percentis[98]:.2f} ms  ({online} pedidos)'
+                )
+
+            restantes = tokens[amostra + online:]
+            lotes = [restantes[posicao:posicao + options['lote']] for posicao in range(0, len(restantes), options['lote'])]
+            duracoes, consultas_lote = [], []
+            for lote in lotes:
+                inicio = time.perf_counter()
+                with CaptureQueriesContext(connection) as consultas:
+                    resultado = self._enviar(leitor, lote)
+                duracoes.append(time.perf_counter() - inicio)
+                consultas_lote.append(len(consultas))
+                self._esperar(resultado, {REGISTADA: len(lote)})
+            if lotes:
+                self.stdout.write(
+                    f'Lotes sem rede:     {len(lotes)} de até {options["lote"]}: {statistics.mean(duracoes) * 1000:.1f} ms '
+                    f'por lote, {sum(duracoes) / len(restantes) * 1000:.3f} ms por leitura, '
+                    f'{max(consultas_lote)} consultas por lote'
+                )
+
+                # O leitor não recebeu a resposta e reenvia: nada muda
+                inicio = time.perf_counter()
+                resultado = self._enviar(leitor, lotes[0] + lotes[0][:10])
+                self._esperar(resultado, {REPETIDA: len(lotes[0]) + min(10, len(lotes[0]))})
+                self.stdout.write(f'Reenvio do lote:    {(time.perf_counter() - inicio) * 1000:.1f} ms, todas repetidas')
+
+            evento.refresh_from_db()
+            presentes = Inscricao.objects.filter(evento=evento, status='presente', presente=True).count()
+            self.stdout.write(
+                f'Presentes {presentes}/{total}; lugares_ocupados {evento.lugares_ocupados}; '
+                f'inscricoes_confirmadas {evento.inscricoes_confirmadas}'
+            )
+            if presentes != total or evento.lugares_ocupados != total or evento.inscricoes_confirmadas != 0:
+                raise CommandError('Presenças ou contadores do evento incorretos.')
+        finally:
+            evento.delete()
+            User.objects.filter(username__startswith=f'bench_{marca}_').delete()
+            if not categoria.eventos.exists():
+                categoria.delete()
+
+        self.stdout.write(self.style.SUCCESS('Benchmark concluído.'))
+
+    def _preparar(self, marca, total):
+        categoria, _ = Categoria.objects.get_or_create(nome='Teste de carga')
+        organizador = User.objects.create(username=f'bench_{marca}_organizador')
+        agora = timezone.now()
+        evento = Evento.objects.create(
+            titulo=f'Benchmark check-in {marca}', descricao='Evento temporário', categoria=categoria,
+            data_inicio=agora, data_fim=agora + timedelta(hours=4),
+            local='-', endereco='-', capacidade_maxima=total, status='publicado', organizador=organizador,
+        )
+        usuarios = User.objects.bulk_create(
+            (User(username=f'bench_{marca}_{numero}') for numero in range(total)), batch_size=1000
+        )
+        Inscricao.objects.bulk_create(
+            (Inscricao(evento=evento, participante=usuario, status='confirmada') for usuario in usuarios),
+            batch_size=1000,
+        )
+        return evento, categoria
+
+    def _enviar(self, leitor, tokens):
+        momento = timezone.now().isoformat()
+        request = RequestFactory().post(
+            '/api/v1/checkin/',
+            data=json.dumps({'leituras': [{'token': token, 'momento': momento} for token in tokens]}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=f'Bearer {leitor}',
+        )
+        resposta = api_checkin(request)
+        if resposta.status_code != 200:
+            raise CommandError(f'Check-in respondeu {resposta.status_code}: {resposta.content.decode()}')
+        return json.loads(resposta.content)
+
+    def _esperar(self, resposta, totais):
+        if Counter(resposta['totais']) != Counter(totais):
+            raise CommandError(f'Resultados inesperados: {resposta["totais"]} (esperado {totais})')
@@ -0,0 +1,90 @@
+import http.client
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Gera carga HTTP contra um servidor em execução e mostra pedidos/s e latências por URL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base', default='http://127.0.0.1:8000',
+                            help='Endereço do servidor (gunicorn, uvicorn...)')
+        parser.add_argument('--url', action='append', dest='urls',
+                            help='Caminho a pedir (pode repetir-se); por omissão, a página inicial')
+        parser.add_argument('--concorrencia', type=int, default=16,
+                            help='Clientes simultâneos, cada um com a sua ligação keep-alive')
+        parser.add_argument('--duracao', type=float, default=15,
+                            help='Segundos de carga por URL')
+        parser.add_argument('--host', default=None,
+                            help='Cabeçalho Host a enviar (tem de estar em ALLOWED_HOSTS)')
+
+    def handle(self, *args, **options):
+        base = urlsplit(options['base'])
+        if base.scheme not in ('http', 'https') or not base.hostname:
+            raise CommandError('--base deve ser um URL http(s)://host:porta')
+
+        for caminho in options['urls'] or ['/']:
+            latencias, erros, duracao = self._carga(base, caminho, options)
+            if not latencias:
+                self.stderr.write(f'{caminho}: nenhum pedido concluído ({erros} erro(s))')
+                continue
+            percentis = statistics.quantiles(latencias if len(latencias) > 1 else latencias * 2, n=100)
+            self.stdout.write(
+                f'{caminho}: {len(latencias) / duracao:.1f} pedidos/s, '
+                f'p50 {percentis[49] * 1000:.1f} ms, p95 {percentis[94] * 1000:.1f} ms, '
+                f'p99 {percentis[98] * 1000:.1f} ms, {erros} erro(s)'
+            )
+
+        self.stdout.write(self.style.SUCCESS('Carga concluída.'))
+
+    def _carga(self, base, caminho, options):
+        classe = http.client.HTTPSConnection if base.scheme == 'https' else http.client.HTTPConnection
+        cabecalhos = {'Host': options['host']} if options['host'] else {}
+        latencias = []
+        erros = [0]
+        lock = threading.Lock()
+        fim = time.monotonic() + options['duracao']
+
+        def cliente():
+            conexao = classe(base.hostname, base.port, timeout=30)
+            proprias = []
+            while time.monotonic() < fim:
+                inicio = time.perf_counter()
+                try:
+                    conexao.request('GET', caminho, headers=cabecalhos)
+                    resposta = conexao.getresponse()
+                    resposta.read()
+                except http.client.RemoteDisconnected:
+                    # O servidor fechou a ligação keep-alive (workers sync não a mantêm)
+                    conexao.close()
+                    conexao = classe(base.hostname, base.port, timeout=30)
+                    continue
+                except (OSError, http.client.HTTPException):
+                    with lock:
+                        erros[0] += 1
+                    conexao.close()
+                    conexao = classe(base.hostname, base.port, timeout=30)
+                    continue
+                if resposta.will_close:
+                    conexao.close()
+                    conexao = classe(base.hostname, base.port, timeout=30)
+                if resposta.status >= 300:
+                    with lock:
+                        erros[0] += 1
+                    continue
+                proprias.append(time.perf_counter() - inicio)
+            conexao.close()
+            with lock:
+                latencias.extend(proprias)
+
+        inicio = time.monotonic()
+        clientes = [threading.Thread(target=cliente) for _ in range(options['concorrencia'])]
+        for thread in clientes:
+            thread.start()
+        for thread in clientes:
+            thread.join()
+        return latencias, erros[0], time.monotonic() - inicio
@@ -0,0 +1,126 @@
+import socketserver
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.mail import EmailMessage
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+import configAUX
+from configAUX import UnsafeTLSBackend
+
+
+class _SessaoSMTP(socketserver.StreamRequestHandler):
+    """Servidor SMTP mínimo: aceita tudo e descarta as mensagens"""
+
+    def _responder(self, linha):
+        self.wfile.write(linha.encode() + b'\r\n')
+
+    def handle(self):
+        servidor = self.server
+        # Simula o custo de estabelecer a ligação (TCP + TLS + login) num servidor real
+        time.sleep(servidor.latencia_conexao)
+        self._responder('220 localhost ESMTP stand-in')
+        mensagens = 0
+        while True:
+            linha = self.rfile.readline()
+            if not linha:
+                return
+            comando = linha.decode(errors='replace').strip().upper()
+            if comando.startswith(('EHLO', 'HELO')):
+                self._responder('250 localhost')
+            elif comando == 'DATA':
+                self._responder('354 fim com <CRLF>.<CRLF>')
+                while self.rfile.readline() not in (b'.\r\n', b'.\n', b''):
+                    pass
+                mensagens += 1
+                with servidor.lock:
+                    servidor.mensagens += 1
+                self._responder('250 OK')
+                if servidor.desligar_apos and mensagens >= servidor.desligar_apos:
+                    # Simula um servidor que fecha ligações longas
+                    return
+            elif comando == 'QUIT':
+                self._responder('221 adeus')
+                return
+            else:
+                # MAIL, RCPT, RSET, NOOP
+                self._responder('250 OK')
+
+
+class ServidorSMTPLocal(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latencia_conexao=0.0, desligar_apos=0):
+        super().__init__(('127.0.0.1', 0), _SessaoSMTP)
+        self.latencia_conexao = latencia_conexao
+        self.desligar_apos = desligar_apos
+        self.mensagens = 0
+        self.lock = threading.Lock()
+
+    @property
+    def porta(self):
+        return self.server_address[1]
+
+
+class Command(BaseCommand):
+    help = 'Mede mensagens/segundo do UnsafeTLSBackend com e sem pool, contra um servidor SMTP local'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mensagens', type=int, default=200,
+                            help='Mensagens enviadas em cada cenário')
+        parser.add_argument('--threads', type=int, default=4,
+                            help='Threads a enviar em paralelo (como um worker gthread)')
+        parser.add_argument('--latencia', type=float, default=50,
+                            help='Milissegundos para estabelecer cada ligação (handshake simulado)')
+        parser.add_argument('--desligar-apos', type=int, default=0,
+                            help='O servidor fecha a ligação após N mensagens (testa a reconexão)')
+
+    def handle(self, *args, **options):
+        servidor = ServidorSMTPLocal(options['latencia'] / 1000, options['desligar_apos'])
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        try:
+            for nome, tamanho_pool in (('sem pool', 0), ('com pool', options['threads'])):
+                resultado = self._cenario(servidor, tamanho_pool, options)
+                self.stdout.write(f'{nome}: {resultado:.1f} mensagens/s')
+        finally:
+            servidor.shutdown()
+            servidor.server_close()
+
+        self.stdout.write(self.style.SUCCESS(f'{servidor.mensagens} mensagem(ns) recebida(s) pelo servidor local.'))
+
+    def _cenario(self, servidor, tamanho_pool, options):
+        definicoes = {
+            'SMTP_POOL_TAMANHO': tamanho_pool,
+            'SMTP_POOL_NOOP_APOS': 5,
+        }
+        with override_settings(**definicoes):
+            configAUX._pool = None
+
+            def enviar(indice):
+                # Um backend por envio, como send_mail() faz em cada pedido
+                backend = UnsafeTLSBackend(
+                    host='127.0.0.1', port=servidor.porta, username='', password='',
+                    use_tls=False, use_ssl=False, fail_silently=False,
+                )
+                mensagem = EmailMessage(
+                    f'Benchmark {indice}', 'Corpo', 'bench@localhost', ['destino@localhost'],
+                    connection=backend,
+                )
+                return mensagem.send()
+
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+                enviados = sum(executor.map(enviar, range(options['mensagens'])))
+            duracao = time.perf_counter() - inicio
+
+            pool = configAUX.obter_pool()
+            if pool is not None:
+                pool.esvaziar()
+            configAUX._pool = None
+
+        if enviados != options['mensagens']:
+            self.stderr.write(f'Apenas {enviados} de {options["mensagens"]} mensagens enviadas.')
+        return enviados / duracao
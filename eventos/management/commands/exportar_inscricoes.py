@@ -0,0 +1,49 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from eventos.exportacao import exportar
+from eventos.models import Inscricao
+
+
+class Command(BaseCommand):
+    help = (
+        'Exporta os participantes (inscrições com perfil e estado) em CSV ou XLSX, em fluxo: '
+        'a memória não cresce com o número de inscrições'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--evento', type=int, action='append', dest='eventos', metavar='ID',
+                            help='Só as inscrições deste evento (pode repetir)')
+        parser.add_argument('--status', action='append', dest='estados',
+                            choices=[codigo for codigo, _ in Inscricao.STATUS_CHOICES],
+                            help='Só as inscrições com este estado (pode repetir)')
+        parser.add_argument('--formato', choices=['csv', 'xlsx'], default='csv')
+        parser.add_argument('--gzip', action='store_true', help='Comprimir o CSV em gzip')
+        parser.add_argument('--saida', help='Ficheiro de destino (por omissão, a saída padrão)')
+
+    def handle(self, *args, **options):
+        if options['gzip'] and options['formato'] != 'csv':
+            raise CommandError('--gzip só se aplica ao CSV; o XLSX já é comprimido.')
+        if options['saida'] is None and sys.stdout.isatty() and (options['gzip'] or options['formato'] == 'xlsx'):
+            raise CommandError('Saída binária: indique --saida ou redirecione a saída padrão.')
+
+        inscricoes = Inscricao.objects.all()
+        if options['eventos']:
+            inscricoes = inscricoes.filter(evento_id__in=options['eventos'])
+        if options['estados']:
+            inscricoes = inscricoes.filter(status__in=options['estados'])
+
+        blocos = exportar(inscricoes, options['formato'], options['gzip'])
+        if options['saida'] is None:
+            for bloco in blocos:
+                sys.stdout.buffer.write(bloco)
+            sys.stdout.buffer.flush()
+            return
+
+        tamanho = 0
+        with open(options['saida'], 'wb') as destino:
+            for bloco in blocos:
+                destino.write(bloco)
+                tamanho += len(bloco)
+        self.stdout.write(self.style.SUCCESS(f'Exportação gravada em {options["saida"]} ({tamanho} bytes).'))
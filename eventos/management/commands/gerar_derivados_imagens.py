@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from eventos.imagens import processar_imagem
+from eventos.models import Evento, Noticia
+
+
+class Command(BaseCommand):
+    help = 'Gera os derivados responsivos (WebP/JPEG) das imagens de eventos e notícias já existentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--todos', action='store_true',
+                            help='Regenera também as imagens que já têm derivados')
+
+    def handle(self, *args, **options):
+        total = falhas = 0
+        for modelo in (Evento, Noticia):
+            objetos = modelo.objects.exclude(imagem='').exclude(imagem__isnull=True)
+            for pk, imagem, derivados in objetos.values_list('pk', 'imagem', 'imagem_derivados').iterator():
+                if not options['todos'] and (derivados or {}).get('origem') == imagem:
+                    continue
+                try:
+                    processar_imagem(modelo, pk)
+                except Exception as erro:
+                    falhas += 1
+                    self.stderr.write(f'{modelo._meta.verbose_name} {pk} ({imagem}): {erro}')
+                else:
+                    total += 1
+
+        self.stdout.write(self.style.SUCCESS(f'{total} imagem(ns) processada(s), {falhas} falha(s).'))
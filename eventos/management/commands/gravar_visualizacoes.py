@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from eventos.visualizacoes import gravar_visualizacoes
+
+
+class Command(BaseCommand):
+    help = 'Grava na base de dados as visualizações de notícias acumuladas no cache'
+
+    def handle(self, *args, **options):
+        total = gravar_visualizacoes(todas=True)
+        self.stdout.write(self.style.SUCCESS(f'{total} visualização(ões) gravada(s).'))
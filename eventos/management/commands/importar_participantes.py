@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from eventos.importacao import ESTADOS, LOTE, ErroImportacao, importar
+from eventos.models import Evento
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa participantes de um CSV (Utilizador, Email, Nome, Apelido, Telefone, NIF, Concelho, '
+        'Distrito) com bulk_create em lotes, opcionalmente inscrevendo-os num evento'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('ficheiro', help='CSV em UTF-8, separado por vírgulas ou ponto e vírgula')
+        parser.add_argument('--evento', type=int, metavar='ID', help='Inscrever os participantes neste evento')
+        parser.add_argument('--status', choices=ESTADOS, default='confirmada',
+                            help='Estado das inscrições com lugar (as restantes ficam em espera)')
+        parser.add_argument('--lote', type=int, default=LOTE, help='Linhas por consulta e por bulk_create')
+        parser.add_argument('--simular', action='store_true',
+                            help='Validar e mostrar o relatório sem gravar nada')
+
+    def handle(self, *args, **options):
+        evento = None
+        if options['evento'] is not None:
+            evento = Evento.objects.filter(pk=options['evento']).first()
+            if evento is None:
+                raise CommandError(f'Evento {options["evento"]} não existe.')
+
+        inicio = time.perf_counter()
+        try:
+            with open(options['ficheiro'], 'rb') as ficheiro:
+                resultado = importar(
+                    ficheiro, evento, options['status'], simular=options['simular'], lote=options['lote']
+                )
+        except (OSError, ErroImportacao) as erro:
+            raise CommandError(str(erro))
+        duracao = time.perf_counter() - inicio
+
+        for numero, mensagem in resultado.erros:
+            self.stdout.write(self.style.WARNING(f'Linha {numero}: {mensagem}'))
+        resumo = (
+            f'{resultado.linhas} linhas em {duracao:.2f} s: {resultado.usuarios} utilizadores criados, '
+            f'{resultado.inscricoes} inscrições, {resultado.em_espera} em espera, {len(resultado.erros)} com erro'
+        )
+        if options['simular']:
+            resumo += ' (simulação: nada foi gravado)'
+        self.stdout.write(self.style.SUCCESS(resumo + '.'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from eventos.inscricoes import libertar_reservas_expiradas
+
+
+class Command(BaseCommand):
+    help = (
+        'Liberta os lugares das inscrições pendentes cuja reserva expirou '
+        '(agendar, por exemplo, a cada 5 minutos)'
+    )
+
+    def handle(self, *args, **options):
+        total = libertar_reservas_expiradas()
+        self.stdout.write(self.style.SUCCESS(f'{total} reserva(s) expirada(s) libertada(s).'))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from eventos.models import Evento
+
+
+class Command(BaseCommand):
+    help = 'Recalcula Evento.inscricoes_confirmadas e Evento.lugares_ocupados a partir das inscrições'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--evento', type=int, action='append', dest='eventos',
+                            help='ID do evento a recontar (pode repetir); por omissão, todos')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Apenas lista os eventos com contador divergente')
+
+    def handle(self, *args, **options):
+        eventos = Evento.objects.all()
+        if options['eventos']:
+            eventos = eventos.filter(pk__in=options['eventos'])
+
+        with transaction.atomic():
+            divergentes = list(
+                eventos.com_contagem_divergente().values_list(
+                    'pk', 'titulo', 'inscricoes_confirmadas', '_confirmadas_real', 'lugares_ocupados', '_lugares_real'
+                )
+            )
+            for pk, titulo, armazenado, real, lugares, lugares_real in divergentes:
+                self.stdout.write(
+                    f'Evento {pk} ({titulo}): confirmadas {armazenado} -> {real}, lugares {lugares} -> {lugares_real}'
+                )
+
+            if options['dry_run'] or not divergentes:
+                self.stdout.write(self.style.SUCCESS(f'{len(divergentes)} evento(s) com contador divergente.'))
+                return
+
+            Evento.objects.filter(pk__in=[linha[0] for linha in divergentes]).recontar_inscricoes()
+
+        self.stdout.write(self.style.SUCCESS(f'{len(divergentes)} evento(s) corrigido(s).'))
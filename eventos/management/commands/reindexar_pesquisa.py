@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from eventos.models import Evento, Noticia
+from eventos.pesquisa import atualizar_vetores
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os vetores de pesquisa de texto completo de eventos e notícias'
+
+    def handle(self, *args, **options):
+        eventos = atualizar_vetores(Evento.objects.all())
+        noticias = atualizar_vetores(Noticia.objects.all())
+        self.stdout.write(self.style.SUCCESS(
+            f'{eventos} evento(s) e {noticias} notícia(s) reindexados.'
+        ))
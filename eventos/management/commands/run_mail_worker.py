@@ -0,0 +1,42 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from eventos.emails import processar_fila
+
+
+class Command(BaseCommand):
+    help = 'Envia os emails da fila (EmailOutbox) em lotes, com novas tentativas e backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=None,
+                            help='Emails por lote (por omissão, EMAIL_OUTBOX_LOTE)')
+        parser.add_argument('--intervalo', type=float, default=5,
+                            help='Segundos de espera quando a fila está vazia')
+        parser.add_argument('--once', action='store_true',
+                            help='Esvazia a fila uma vez e termina')
+
+    def handle(self, *args, **options):
+        self.parar = False
+        signal.signal(signal.SIGTERM, self._sinal_parar)
+        signal.signal(signal.SIGINT, self._sinal_parar)
+
+        total = 0
+        while not self.parar:
+            close_old_connections()
+            processados = processar_fila(options['lote'])
+            total += processados
+            if processados:
+                self.stdout.write(f'{processados} email(s) processado(s).')
+                continue
+            if options['once']:
+                break
+            time.sleep(options['intervalo'])
+
+        self.stdout.write(self.style.SUCCESS(f'Worker terminado: {total} email(s) processado(s).'))
+
+    def _sinal_parar(self, signum, frame):
+        # Termina o lote corrente antes de sair
+        self.parar = True
@@ -0,0 +1,103 @@
+from datetime import timedelta
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from eventos.models import (
+    Avaliacao, Categoria, Certificado, CodigoVerificacao, EmailOutbox, Evento, Inscricao,
+    Noticia, PerfilUsuario, novo_codigo_certificado,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Conta as consultas de cada lista (changelist) do admin da app eventos com dois tamanhos '
+        'de página e falha se o número depender do tamanho da página (consultas por linha)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--paginas', type=int, nargs=2, default=[10, 50], metavar=('MENOR', 'MAIOR'),
+                            help='Tamanhos de página comparados')
+        parser.add_argument('--dados', action='store_true',
+                            help='Cria registos temporários (desfeitos no fim) para encher as páginas')
+
+    def handle(self, *args, **options):
+        menor, maior = options['paginas']
+        with transaction.atomic():
+            if options['dados']:
+                self._criar_dados(maior * 2)
+            divergentes = self._verificar(menor, maior)
+            transaction.set_rollback(True)
+
+        if divergentes:
+            raise CommandError('Consultas por linha em: ' + ', '.join(divergentes))
+        self.stdout.write(self.style.SUCCESS('Número de consultas independente do tamanho da página.'))
+
+    def _verificar(self, menor, maior):
+        divergentes = []
+        for modelo, model_admin in admin.site._registry.items():
+            if modelo._meta.app_label != 'eventos':
+                continue
+            contagens = [self._consultas(model_admin, tamanho) for tamanho in (menor, maior)]
+            nome = modelo._meta.model_name
+            self.stdout.write(f'{nome:<20} {contagens[0]:>4} consultas ({menor}/página)  {contagens[1]:>4} ({maior}/página)')
+            if contagens[0] != contagens[1]:
+                divergentes.append(nome)
+        return divergentes
+
+    def _consultas(self, model_admin, tamanho):
+        opts = model_admin.model._meta
+        request = RequestFactory().get(f'/admin/{opts.app_label}/{opts.model_name}/')
+        # Utilizador novo em cada medição: as permissões ficam em cache na instância
+        request.user = User(username='verificar_consultas', is_staff=True, is_superuser=True, is_active=True)
+        model_admin.list_per_page = tamanho
+        try:
+            with CaptureQueriesContext(connection) as consultas:
+                model_admin.changelist_view(request).render()
+        finally:
+            del model_admin.list_per_page
+        return len(consultas)
+
+    def _criar_dados(self, quantidade):
+        agora = timezone.now()
+        usuarios = User.objects.bulk_create(
+            User(username=f'verificar_consultas_{numero}', email=f'verificar{numero}@example.com')
+            for numero in range(quantidade)
+        )
+        PerfilUsuario.objects.bulk_create(PerfilUsuario(usuario=usuario) for usuario in usuarios)
+        categorias = Categoria.objects.bulk_create(
+            Categoria(nome=f'Verificar consultas {numero}') for numero in range(quantidade)
+        )
+        eventos = Evento.objects.bulk_create(
+            Evento(
+                titulo=f'Evento {numero}', descricao='-', categoria=categorias[numero], local='-', endereco='-',
+                data_inicio=agora + timedelta(days=numero), data_fim=agora + timedelta(days=numero + 1),
+                organizador=usuarios[numero],
+            )
+            for numero in range(quantidade)
+        )
+        Noticia.objects.bulk_create(
+            Noticia(titulo=f'Notícia {numero}', conteudo='-', autor=usuarios[numero], categoria=categorias[numero])
+            for numero in range(quantidade)
+        )
+        inscricoes = Inscricao.objects.bulk_create(
+            Inscricao(evento=eventos[numero], participante=usuarios[numero], status='confirmada')
+            for numero in range(quantidade)
+        )
+        Certificado.objects.bulk_create(
+            Certificado(inscricao=inscricao, codigo=novo_codigo_certificado()) for inscricao in inscricoes
+        )
+        Avaliacao.objects.bulk_create(Avaliacao(inscricao=inscricao, nota=5) for inscricao in inscricoes)
+        CodigoVerificacao.objects.bulk_create(
+            CodigoVerificacao(usuario=usuario, email=usuario.email, codigo=f'{numero:06d}', expira_em=agora)
+            for numero, usuario in enumerate(usuarios)
+        )
+        EmailOutbox.objects.bulk_create(
+            EmailOutbox(assunto=f'Email {numero}', corpo='-', destinatarios=[usuario.email])
+            for numero, usuario in enumerate(usuarios)
+        )
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:39
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def preencher_contador(apps, schema_editor):
+    Evento = apps.get_model('eventos', 'Evento')
+    Inscricao = apps.get_model('eventos', 'Inscricao')
+    confirmadas = Inscricao.objects.filter(
+        evento=OuterRef('pk'), status='confirmada'
+    ).order_by().values('evento').annotate(total=Count('pk')).values('total')
+    Evento.objects.update(
+        inscricoes_confirmadas=Coalesce(Subquery(confirmadas, output_field=IntegerField()), Value(0))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0007_remove_perfilusuario_cep_remove_perfilusuario_cpf_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evento',
+            name='inscricoes_confirmadas',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Mantido pelas inscrições; use recount_inscricoes para corrigir'),
+        ),
+        migrations.RunPython(preencher_contador, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:40
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.operations import TrigramExtension, UnaccentExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+
+CRIAR_CONFIGURACAO = """
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'portuguese_unaccent') THEN
+        CREATE TEXT SEARCH CONFIGURATION portuguese_unaccent (COPY = portuguese);
+        ALTER TEXT SEARCH CONFIGURATION portuguese_unaccent
+            ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+    END IF;
+END
+$$;
+"""
+
+REMOVER_CONFIGURACAO = "DROP TEXT SEARCH CONFIGURATION IF EXISTS portuguese_unaccent;"
+
+
+def criar_configuracao(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CRIAR_CONFIGURACAO)
+
+
+def remover_configuracao(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(REMOVER_CONFIGURACAO)
+
+
+def preencher_vetores(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    config = 'portuguese_unaccent'
+    Evento = apps.get_model('eventos', 'Evento')
+    Noticia = apps.get_model('eventos', 'Noticia')
+    Evento.objects.update(vetor_pesquisa=(
+        SearchVector('titulo', weight='A', config=config)
+        + SearchVector('local', weight='B', config=config)
+        + SearchVector('descricao', weight='C', config=config)
+    ))
+    Noticia.objects.update(vetor_pesquisa=(
+        SearchVector('titulo', weight='A', config=config)
+        + SearchVector('subtitulo', 'tags', weight='B', config=config)
+        + SearchVector('resumo', weight='C', config=config)
+        + SearchVector('conteudo', weight='D', config=config)
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0008_evento_inscricoes_confirmadas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        UnaccentExtension(),
+        migrations.RunPython(criar_configuracao, remover_configuracao),
+        migrations.AddField(
+            model_name='evento',
+            name='vetor_pesquisa',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='noticia',
+            name='vetor_pesquisa',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='evento',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['vetor_pesquisa'], name='evento_pesquisa_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='evento',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['titulo'], name='evento_titulo_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='noticia',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['vetor_pesquisa'], name='noticia_pesquisa_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='noticia',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['titulo'], name='noticia_titulo_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunPython(preencher_vetores, migrations.RunPython.noop),
+    ]
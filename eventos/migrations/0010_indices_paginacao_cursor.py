@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0009_pesquisa_texto_completo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(fields=['status', '-data_inicio', '-id'], name='evento_status_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='noticia',
+            index=models.Index(fields=['status', '-data_publicacao', '-id'], name='noticia_status_data_idx'),
+        ),
+    ]
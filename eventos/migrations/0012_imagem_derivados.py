@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0011_emailoutbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evento',
+            name='imagem_derivados',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Cópias redimensionadas da imagem (WebP/JPEG)'),
+        ),
+        migrations.AddField(
+            model_name='noticia',
+            name='imagem_derivados',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Cópias redimensionadas da imagem (WebP/JPEG)'),
+        ),
+    ]
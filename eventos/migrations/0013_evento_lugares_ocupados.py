@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-17 05:30
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def preencher_lugares(apps, schema_editor):
+    Evento = apps.get_model('eventos', 'Evento')
+    Inscricao = apps.get_model('eventos', 'Inscricao')
+    ocupados = Inscricao.objects.filter(
+        evento=OuterRef('pk'), status__in=('pendente', 'confirmada', 'presente')
+    ).order_by().values('evento').annotate(total=Count('pk')).values('total')
+    Evento.objects.update(
+        lugares_ocupados=Coalesce(Subquery(ocupados, output_field=IntegerField()), Value(0))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0012_imagem_derivados'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evento',
+            name='lugares_ocupados',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Inscrições pendentes, confirmadas e presentes; mantido como inscricoes_confirmadas'),
+        ),
+        migrations.RunPython(preencher_lugares, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-17 04:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0013_evento_lugares_ocupados'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inscricao',
+            name='entrada_espera',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Ordem na lista de espera', null=True),
+        ),
+        migrations.AlterField(
+            model_name='inscricao',
+            name='status',
+            field=models.CharField(choices=[('pendente', 'Pendente'), ('confirmada', 'Confirmada'), ('cancelada', 'Cancelada'), ('presente', 'Presente'), ('ausente', 'Ausente'), ('espera', 'Lista de espera')], default='pendente', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='inscricao',
+            index=models.Index(condition=models.Q(('status', 'espera')), fields=['evento', 'entrada_espera', 'id'], name='inscricao_espera_idx'),
+        ),
+    ]
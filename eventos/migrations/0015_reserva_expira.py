@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-17 04:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0014_lista_espera'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inscricao',
+            name='reserva_expira',
+            field=models.DateTimeField(blank=True, help_text='Fim da reserva do lugar enquanto pendente; vazio = sem prazo', null=True),
+        ),
+        migrations.AlterField(
+            model_name='inscricao',
+            name='status',
+            field=models.CharField(choices=[('pendente', 'Pendente'), ('confirmada', 'Confirmada'), ('cancelada', 'Cancelada'), ('presente', 'Presente'), ('ausente', 'Ausente'), ('espera', 'Lista de espera'), ('expirada', 'Reserva expirada')], default='pendente', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='inscricao',
+            index=models.Index(condition=models.Q(('reserva_expira__isnull', False), ('status', 'pendente')), fields=['reserva_expira'], name='inscricao_reserva_idx'),
+        ),
+    ]
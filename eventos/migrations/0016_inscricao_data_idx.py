@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-17 04:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0015_reserva_expira'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inscricao',
+            index=models.Index(fields=['data_inscricao', 'id'], name='inscricao_data_idx'),
+        ),
+    ]
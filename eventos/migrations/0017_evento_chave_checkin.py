@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-17 05:09
+
+import django.contrib.postgres.functions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0016_inscricao_data_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evento',
+            name='chave_checkin',
+            field=models.UUIDField(db_default=django.contrib.postgres.functions.RandomUUID(), editable=False, help_text='Entra na assinatura das credenciais dos leitores de QR code; renová-la revoga-as'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-17 14:10
+
+from django.db import migrations
+from django.db.models import F
+
+
+def preencher_entrada_espera(apps, schema_editor):
+    # Inscrições passadas a espera pelo admin antes de Inscricao.save marcar a entrada
+    Inscricao = apps.get_model('eventos', 'Inscricao')
+    Inscricao.objects.filter(status='espera', entrada_espera__isnull=True).update(entrada_espera=F('data_inscricao'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0017_evento_chave_checkin'),
+    ]
+
+    operations = [
+        migrations.RunPython(preencher_entrada_espera, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,14 @@
-from django.db import models
+from django.conf import settings
+from django.db import connections, models, router, transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Cast, Coalesce, Left, Replace, Upper
 from django.contrib.auth.models import User
+from django.contrib.postgres.functions import RandomUUID
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
+from datetime import timedelta
 import uuid
 
 
@@ -32,6 +39,7 @@ class Noticia(models.Model):
     conteudo = models.TextField()
     resumo = models.TextField(max_length=500, blank=True, help_text='Resumo da notícia para exibição')
     imagem = models.ImageField(upload_to='noticias/', blank=True, null=True)
+    imagem_derivados = models.JSONField(default=dict, blank=True, editable=False, help_text='Cópias redimensionadas da imagem (WebP/JPEG)')
     autor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='noticias_criadas')
     categoria = models.ForeignKey(Categoria, on_delete=models.CASCADE, related_name='noticias')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='rascunho')
@@ -41,15 +49,33 @@ class Noticia(models.Model):
     data_atualizacao = models.DateTimeField(auto_now=True)
     visualizacoes = models.PositiveIntegerField(default=0)
     tags = models.CharField(max_length=500, blank=True, help_text='Tags separadas por vírgula')
+    vetor_pesquisa = SearchVectorField(null=True, editable=False)
 
     class Meta:
         verbose_name = 'Notícia'
         verbose_name_plural = 'Notícias'
         ordering = ['-data_publicacao']
+        indexes = [
+            GinIndex(fields=['vetor_pesquisa'], name='noticia_pesquisa_gin'),
+            GinIndex(fields=['titulo'], name='noticia_titulo_trgm', opclasses=['gin_trgm_ops']),
+            # Paginação por cursor de (data_publicacao, id) dentro das publicadas
+            models.Index(fields=['status', '-data_publicacao', '-id'], name='noticia_status_data_idx'),
+        ]
 
     def __str__(self):
         return self.titulo
 
+    def save(self, *args, **kwargs):
+        # Como em Evento.save: visualizações, vetor de pesquisa e derivados da
+        # imagem são mantidos por UPDATEs próprios; nunca regravá-los a partir
+        # de uma instância antiga
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name not in ('visualizacoes', 'vetor_pesquisa', 'imagem_derivados')
+            ]
+        super().save(*args, **kwargs)
+
     @property
     def tempo_publicacao(self):
         """Retorna o tempo desde a publicação"""
@@ -74,10 +100,65 @@ class Noticia(models.Model):
             return [tag.strip() for tag in self.tags.split(',')]
         return []
 
-    def incrementar_visualizacao(self):
-        """Incrementa o contador de visualizações"""
-        self.visualizacoes += 1
-        self.save(update_fields=['visualizacoes'])
+    def incrementar_visualizacao(self, quantidade=1):
+        """
+        Incrementa o contador de visualizações diretamente na base de dados.
+        As páginas usam eventos.visualizacoes, que acumula e grava em lote.
+        """
+        Noticia.objects.filter(pk=self.pk).update(visualizacoes=F('visualizacoes') + quantidade)
+        self.visualizacoes += quantidade
+
+
+# Inscrições que ocupam um lugar na capacidade do evento
+STATUS_OCUPAM_LUGAR = ('pendente', 'confirmada', 'presente')
+# Estados de quem já não tem lugar e pode voltar a inscrever-se
+STATUS_SEM_LUGAR = ('cancelada', 'expirada')
+
+
+class EventoLotado(Exception):
+    """Não há lugar livre para a inscrição"""
+
+
+def prazo_reserva():
+    """Fim da reserva de lugar de uma nova inscrição pendente (None = sem prazo)"""
+    if not settings.INSCRICAO_RESERVA_HORAS:
+        return None
+    return timezone.now() + timedelta(hours=settings.INSCRICAO_RESERVA_HORAS)
+
+
+def _contagem_inscricoes(**filtros):
+    inscricoes = Inscricao.objects.filter(
+        evento=OuterRef('pk'), **filtros
+    ).order_by().values('evento').annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(inscricoes, output_field=IntegerField()), Value(0))
+
+
+class EventoQuerySet(models.QuerySet):
+    def recontar_inscricoes(self):
+        """Recalcula os contadores de confirmadas e de lugares ocupados a partir das inscrições"""
+        with transaction.atomic(using=self.db):
+            # Trancar os eventos antes de contar. Em READ COMMITTED, um UPDATE
+            # que espera pela tranca de uma inscrição concorrente (que já somou
+            # o seu +1 ao contador) relê a linha do evento mas não as
+            # subconsultas, e gravaria uma contagem sem essa inscrição. Depois
+            # da tranca, o UPDATE seguinte começa com um snapshot novo; quem
+            # ainda não trancou soma o seu +1 sobre a contagem gravada aqui.
+            eventos_ids = list(self.select_for_update().order_by('pk').values_list('pk', flat=True))
+            return self.model.objects.using(self.db).filter(pk__in=eventos_ids).update(
+                inscricoes_confirmadas=_contagem_inscricoes(status='confirmada'),
+                lugares_ocupados=_contagem_inscricoes(status__in=STATUS_OCUPAM_LUGAR),
+            )
+
+    def com_contagem_divergente(self):
+        """Eventos cujos contadores armazenados diferem da contagem real"""
+        return self.annotate(
+            _confirmadas_real=Count('inscricoes', filter=Q(inscricoes__status='confirmada')),
+            _lugares_real=Count('inscricoes', filter=Q(inscricoes__status__in=STATUS_OCUPAM_LUGAR)),
+        ).exclude(inscricoes_confirmadas=F('_confirmadas_real'), lugares_ocupados=F('_lugares_real'))
+
+    def renovar_chave_checkin(self):
+        """Nova chave para cada evento: as credenciais dos leitores já emitidas deixam de valer"""
+        return self.update(chave_checkin=RandomUUID())
 
 
 class Evento(models.Model):
@@ -99,31 +180,57 @@ class Evento(models.Model):
     capacidade_maxima = models.PositiveIntegerField(default=0)
     preco = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     imagem = models.ImageField(upload_to='eventos/', blank=True, null=True)
+    imagem_derivados = models.JSONField(default=dict, blank=True, editable=False, help_text='Cópias redimensionadas da imagem (WebP/JPEG)')
     link_externo = models.URLField(blank=True, null=True, help_text="Link para inscrição em site externo")
     usar_link_externo = models.BooleanField(default=False, help_text="Usar link externo em vez do sistema interno")
     em_destaque = models.BooleanField(default=False, help_text="Evento em destaque na página inicial")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='rascunho')
+    inscricoes_confirmadas = models.PositiveIntegerField(default=0, editable=False, help_text="Mantido pelas inscrições; use recount_inscricoes para corrigir")
+    lugares_ocupados = models.PositiveIntegerField(default=0, editable=False, help_text="Inscrições pendentes, confirmadas e presentes; mantido como inscricoes_confirmadas")
     criado_em = models.DateTimeField(auto_now_add=True)
     atualizado_em = models.DateTimeField(auto_now=True)
     organizador = models.ForeignKey(User, on_delete=models.CASCADE, related_name='eventos_criados')
+    vetor_pesquisa = SearchVectorField(null=True, editable=False)
+    chave_checkin = models.UUIDField(db_default=RandomUUID(), editable=False, help_text='Entra na assinatura das credenciais dos leitores de QR code; renová-la revoga-as')
+
+    objects = EventoQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Evento'
         verbose_name_plural = 'Eventos'
         ordering = ['-data_inicio']
+        indexes = [
+            GinIndex(fields=['vetor_pesquisa'], name='evento_pesquisa_gin'),
+            GinIndex(fields=['titulo'], name='evento_titulo_trgm', opclasses=['gin_trgm_ops']),
+            # Paginação por cursor de (data_inicio, id) dentro dos publicados
+            models.Index(fields=['status', '-data_inicio', '-id'], name='evento_status_data_idx'),
+        ]
 
     def __str__(self):
         return self.titulo
 
+    def save(self, *args, **kwargs):
+        # Contador, vetor de pesquisa, derivados da imagem e chave do check-in
+        # são mantidos por UPDATEs próprios; nunca regravá-los a partir de uma
+        # instância antiga
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name not in (
+                    'inscricoes_confirmadas', 'lugares_ocupados', 'vetor_pesquisa', 'imagem_derivados', 'chave_checkin',
+                )
+            ]
+        super().save(*args, **kwargs)
+
     @property
     def inscricoes_count(self):
-        return self.inscricoes.filter(status='confirmada').count()
+        return self.inscricoes_confirmadas
 
     @property
     def vagas_disponiveis(self):
         if self.capacidade_maxima == 0:
             return float('inf')
-        return max(0, self.capacidade_maxima - self.inscricoes_count)
+        return max(0, self.capacidade_maxima - self.lugares_ocupados)
 
     @property
     def esta_cheio(self):
@@ -140,6 +247,103 @@ class Evento(models.Model):
         return bool(self.usar_link_externo and self.link_externo)
 
 
+class InscricaoQuerySet(models.QuerySet):
+    """
+    Mantém os contadores de Evento exatos em operações em lote,
+    recontando apenas os eventos afetados
+
+    Cada UPDATE em lote que muda o status envia um único sinal
+    ``inscricoes_alteradas`` (eventos/signals.py) com os eventos afetados,
+    em vez de um post_save por inscrição. Também ``delete()`` reconta uma vez
+    por evento, em vez de um post_delete por linha.
+    """
+
+    def eventos_com_lugar(self):
+        """Ids dos eventos em que estas inscrições ocupam lugar"""
+        return set(
+            self.filter(status__in=STATUS_OCUPAM_LUGAR).order_by().values_list('evento_id', flat=True).distinct()
+        )
+
+    def update(self, **kwargs):
+        if 'status' not in kwargs and 'evento' not in kwargs and 'evento_id' not in kwargs:
+            return super().update(**kwargs)
+
+        if kwargs.get('status') == 'espera' and 'entrada_espera' not in kwargs:
+            # Quem passa a espera entra no fim da lista; quem já esperava mantém o lugar
+            kwargs['entrada_espera'] = Case(When(status='espera', then=F('entrada_espera')), default=Value(timezone.now()))
+
+        with transaction.atomic(using=self.db):
+            eventos_ids = set(self.order_by().values_list('evento_id', flat=True).distinct())
+            linhas = super().update(**kwargs)
+            novo_evento = kwargs.get('evento_id', kwargs.get('evento'))
+            if novo_evento is not None:
+                eventos_ids.add(getattr(novo_evento, 'pk', novo_evento))
+            if eventos_ids:
+                Evento.objects.using(self.db).filter(pk__in=eventos_ids).recontar_inscricoes()
+                # Cancelamentos em lote libertam lugares para a lista de espera
+                from .inscricoes import promover_lista_espera
+                for evento_id in eventos_ids:
+                    promover_lista_espera(evento_id, using=self.db)
+            if linhas:
+                from .signals import inscricoes_alteradas
+                inscricoes_alteradas.send(
+                    sender=self.model, eventos_ids=eventos_ids, campos=set(kwargs), using=self.db
+                )
+        return linhas
+
+    update.alters_data = True
+
+    # Versões em lote de Inscricao.confirmar/cancelar/marcar_presenca: um
+    # UPDATE para todas as linhas; retornam o número de inscrições alteradas
+
+    def confirmar(self):
+        return self.update(status='confirmada', data_confirmacao=timezone.now(), reserva_expira=None)
+
+    confirmar.alters_data = True
+
+    def cancelar(self):
+        return self.update(status='cancelada', reserva_expira=None)
+
+    cancelar.alters_data = True
+
+    def marcar_presenca(self):
+        return self.update(status='presente', presente=True, data_presenca=timezone.now(), reserva_expira=None)
+
+    marcar_presenca.alters_data = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            eventos_ids = {obj.evento_id for obj in objs if obj.status in STATUS_OCUPAM_LUGAR}
+            if eventos_ids:
+                Evento.objects.using(self.db).filter(pk__in=eventos_ids).recontar_inscricoes()
+        return objs
+
+    bulk_create.alters_data = True
+
+    def delete(self):
+        # Só os eventos com lugares libertados precisam de recontagem e
+        # promoção. A remoção em cascata de um evento não passa por aqui
+        with transaction.atomic(using=self.db):
+            eventos_ids = self.eventos_com_lugar()
+            removidas = super().delete()
+            libertar_lugares(eventos_ids, using=self.db)
+        return removidas
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+def libertar_lugares(eventos_ids, using=None):
+    """Reconta os eventos e passa os lugares libertados à lista de espera"""
+    if not eventos_ids:
+        return
+    Evento.objects.using(using).filter(pk__in=eventos_ids).recontar_inscricoes()
+    from .inscricoes import promover_lista_espera
+    for evento_id in eventos_ids:
+        promover_lista_espera(evento_id, using=using)
+
+
 class Inscricao(models.Model):
     """Modelo para inscrições em eventos"""
     STATUS_CHOICES = [
@@ -148,6 +352,8 @@ class Inscricao(models.Model):
         ('cancelada', 'Cancelada'),
         ('presente', 'Presente'),
         ('ausente', 'Ausente'),
+        ('espera', 'Lista de espera'),
+        ('expirada', 'Reserva expirada'),
     ]
 
     evento = models.ForeignKey(Evento, on_delete=models.CASCADE, related_name='inscricoes')
@@ -158,16 +364,126 @@ class Inscricao(models.Model):
     observacoes = models.TextField(blank=True)
     presente = models.BooleanField(default=False)
     data_presenca = models.DateTimeField(null=True, blank=True)
+    entrada_espera = models.DateTimeField(null=True, blank=True, editable=False, help_text='Ordem na lista de espera')
+    reserva_expira = models.DateTimeField(null=True, blank=True, help_text='Fim da reserva do lugar enquanto pendente; vazio = sem prazo')
+
+    objects = InscricaoQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Inscrição'
         verbose_name_plural = 'Inscrições'
         unique_together = ['evento', 'participante']
         ordering = ['-data_inscricao']
+        indexes = [
+            # Lista de espera de cada evento já ordenada: a próxima pessoa e a
+            # posição de cada uma saem do índice, que só contém quem espera
+            models.Index(
+                fields=['evento', 'entrada_espera', 'id'],
+                condition=Q(status='espera'),
+                name='inscricao_espera_idx',
+            ),
+            # Reservas a libertar (libertar_reservas): só as pendentes com prazo
+            models.Index(
+                fields=['reserva_expira'],
+                condition=Q(status='pendente', reserva_expira__isnull=False),
+                name='inscricao_reserva_idx',
+            ),
+            # Ordenação padrão (-data_inscricao) e intervalo de datas do admin
+            models.Index(fields=['data_inscricao', 'id'], name='inscricao_data_idx'),
+        ]
 
     def __str__(self):
         return f"{self.participante.username} - {self.evento.titulo}"
 
+    def save(self, *args, verificar_capacidade=False, **kwargs):
+        """
+        Salva a inscrição ajustando os contadores do evento
+
+        Com ``verificar_capacidade``, o lugar é ocupado por um UPDATE
+        condicional na mesma transação; sem lugar livre, a gravação é desfeita
+        e levanta EventoLotado. Ao passar a pendente, a inscrição recebe o
+        prazo da reserva (``prazo_reserva``); ao passar a espera (também pelo
+        admin), entra no fim da lista (``entrada_espera``).
+        """
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not {'status', 'evento', 'evento_id'} & set(update_fields):
+            return super().save(*args, **kwargs)
+        if update_fields is not None and 'status' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'reserva_expira', 'entrada_espera'}
+
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            anterior = None
+            if self.pk is not None:
+                # Lê o estado gravado sob bloqueio: a instância em memória pode estar desatualizada
+                anterior = Inscricao.objects.using(using).select_for_update().filter(
+                    pk=self.pk
+                ).values_list('status', 'evento_id').first()
+            if self.status != 'pendente':
+                self.reserva_expira = None
+            elif anterior is None or anterior[0] != 'pendente':
+                self.reserva_expira = prazo_reserva()
+            if self.status == 'espera' and (anterior is None or anterior[0] != 'espera'):
+                self.entrada_espera = timezone.now()
+            super().save(*args, **kwargs)
+
+            estados = [(self.status, self.evento_id, 1)]
+            if anterior:
+                estados.append((anterior[0], anterior[1], -1))
+            deltas = {}
+            for status, evento_id, sinal in estados:
+                contadores = deltas.setdefault(evento_id, {'inscricoes_confirmadas': 0, 'lugares_ocupados': 0})
+                if status == 'confirmada':
+                    contadores['inscricoes_confirmadas'] += sinal
+                if status in STATUS_OCUPAM_LUGAR:
+                    contadores['lugares_ocupados'] += sinal
+
+            libertados = []
+            for evento_id, contadores in deltas.items():
+                alteracoes = {campo: F(campo) + delta for campo, delta in contadores.items() if delta}
+                if not alteracoes:
+                    continue
+                eventos = Evento.objects.using(using).filter(pk=evento_id)
+                if contadores['lugares_ocupados'] < 0:
+                    libertados.append(evento_id)
+                if verificar_capacidade and contadores['lugares_ocupados'] > 0:
+                    # Capacidade 0 = sem limite. O UPDATE bloqueia a linha do
+                    # evento, então pedidos simultâneos reavaliam a condição
+                    # com o valor já incrementado
+                    eventos = eventos.filter(
+                        Q(capacidade_maxima=0) | Q(lugares_ocupados__lt=F('capacidade_maxima'))
+                    )
+                    if not eventos.update(**alteracoes):
+                        raise EventoLotado(evento_id)
+                else:
+                    eventos.update(**alteracoes)
+
+            # Um lugar libertado passa à próxima pessoa na mesma transação
+            if libertados:
+                from .inscricoes import promover_lista_espera
+                for evento_id in libertados:
+                    promover_lista_espera(evento_id, using=using)
+
+    def delete(self, using=None, keep_parents=False):
+        """Remove a inscrição acertando os contadores do evento, como InscricaoQuerySet.delete"""
+        using = using or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            eventos_ids = Inscricao.objects.using(using).filter(pk=self.pk).eventos_com_lugar()
+            removidas = super().delete(using=using, keep_parents=keep_parents)
+            libertar_lugares(eventos_ids, using=using)
+        return removidas
+
+    def posicao_espera(self):
+        """Posição na lista de espera (1 = a próxima a ser promovida)"""
+        if self.status != 'espera':
+            return None
+        # Mesma ordem de promover_lista_espera: sem entrada_espera, no fim por id
+        if self.entrada_espera is None:
+            antes = Q(entrada_espera__isnull=False) | Q(id__lt=self.id)
+        else:
+            antes = Q(entrada_espera__lt=self.entrada_espera) | Q(entrada_espera=self.entrada_espera, id__lt=self.id)
+        return Inscricao.objects.filter(evento_id=self.evento_id, status='espera').filter(antes).count() + 1
+
     def confirmar(self):
         from django.utils import timezone
         self.status = 'confirmada'
@@ -257,6 +573,33 @@ class CodigoVerificacao(models.Model):
         self.save()
 
 
+def novo_codigo_certificado():
+    return str(uuid.uuid4()).replace('-', '')[:16].upper()
+
+
+class CertificadoQuerySet(models.QuerySet):
+
+    def gerar_codigos(self, lote=1000):
+        """Gera códigos novos para todos os certificados; retorna o total"""
+        if connections[self.db].vendor == 'postgresql':
+            # Um único UPDATE; gen_random_uuid() é avaliado em cada linha
+            uuid_sem_hifens = Replace(Cast(RandomUUID(), models.CharField()), Value('-'), Value(''))
+            return self.update(codigo=Upper(Left(uuid_sem_hifens, 16)))
+
+        # Outras bases: códigos gerados em Python, um UPDATE (bulk_update) por lote
+        total = 0
+        with transaction.atomic(using=self.db):
+            certificados = list(self.select_related(None).only('pk'))
+            for inicio in range(0, len(certificados), lote):
+                parte = certificados[inicio:inicio + lote]
+                for certificado in parte:
+                    certificado.codigo = novo_codigo_certificado()
+                total += self.model.objects.using(self.db).bulk_update(parte, ['codigo'])
+        return total
+
+    gerar_codigos.alters_data = True
+
+
 class Certificado(models.Model):
     """Certificado de participação em eventos"""
     inscricao = models.OneToOneField(Inscricao, on_delete=models.CASCADE, related_name='certificado')
@@ -264,6 +607,8 @@ class Certificado(models.Model):
     data_emissao = models.DateTimeField(auto_now_add=True)
     template = models.CharField(max_length=100, default='padrao')
 
+    objects = CertificadoQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Certificado'
         verbose_name_plural = 'Certificados'
@@ -272,8 +617,7 @@ class Certificado(models.Model):
         return f"Certificado - {self.inscricao.evento.titulo} - {self.inscricao.participante.username}"
 
     def gerar_codigo(self):
-        import uuid
-        self.codigo = str(uuid.uuid4()).replace('-', '')[:16].upper()
+        self.codigo = novo_codigo_certificado()
         self.save()
 
 
@@ -290,3 +634,35 @@ class Avaliacao(models.Model):
 
     def __str__(self):
         return f"Avaliação de {self.inscricao.participante.username} - {self.inscricao.evento.titulo}"
+
+
+class EmailOutbox(models.Model):
+    """Fila de emails transacionais, enviada pelo comando run_mail_worker"""
+    STATUS_CHOICES = [
+        ('pendente', 'Pendente'),
+        ('enviado', 'Enviado'),
+        ('falhou', 'Falhou'),
+    ]
+
+    assunto = models.CharField(max_length=255)
+    corpo = models.TextField()
+    corpo_html = models.TextField(blank=True)
+    remetente = models.CharField(max_length=255, blank=True)
+    destinatarios = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pendente')
+    tentativas = models.PositiveIntegerField(default=0)
+    proxima_tentativa = models.DateTimeField(default=timezone.now)
+    ultimo_erro = models.TextField(blank=True)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    enviado_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Email na Fila'
+        verbose_name_plural = 'Fila de Emails'
+        ordering = ['criado_em']
+        indexes = [
+            models.Index(fields=['status', 'proxima_tentativa'], name='outbox_pendentes_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.assunto} -> {', '.join(self.destinatarios)}"
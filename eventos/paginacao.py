@@ -0,0 +1,279 @@
+"""
+Paginação por cursor (keyset) para listagens de eventos e notícias
+
+Em vez de ``COUNT(*)`` + ``OFFSET n``, cada página filtra a partir dos valores
+de ordenação do último item da página anterior, por isso a página N custa o
+mesmo que a primeira. Os cursores são opacos e assinados; um cursor inválido
+volta simplesmente à primeira página.
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+SALT_CURSOR = 'eventos.paginacao.cursor'
+
+# Até este número de resultados a contagem é exata; acima dele é estimada
+LIMITE_CONTAGEM_EXATA = 1000
+
+
+class CursorInvalido(Exception):
+    """Cursor adulterado, expirado ou incompatível com a ordenação"""
+
+
+def _serializar(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return valor
+
+
+class PaginaCursor:
+    """Uma página de resultados com cursores para a anterior e a seguinte"""
+
+    def __init__(self, paginador, itens, cursor_anterior, cursor_seguinte):
+        self.paginador = paginador
+        self.object_list = itens
+        self.cursor_anterior = cursor_anterior
+        self.cursor_seguinte = cursor_seguinte
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, indice):
+        return self.object_list[indice]
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def paginator(self):
+        # Compatibilidade com templates escritos para django.core.paginator
+        return self.paginador
+
+    def has_next(self):
+        return self.cursor_seguinte is not None
+
+    def has_previous(self):
+        return self.cursor_anterior is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class PaginadorCursor:
+    """
+    Pagina um queryset por cursor segundo ``ordenacao``
+
+    A ordenação deve terminar num campo único (normalmente ``-id``) para que
+    o cursor identifique uma posição sem ambiguidade.
+    """
+
+    def __init__(self, queryset, ordenacao, por_pagina):
+        self.queryset = queryset
+        self.ordenacao = list(ordenacao)
+        self.por_pagina = por_pagina
+        self.campos = [campo.lstrip('-') for campo in self.ordenacao]
+        self._contagem = None
+
+    def _valores(self, objeto):
+        # Aceita instâncias de modelo e linhas de .values()
+        if isinstance(objeto, dict):
+            return [_serializar(objeto[campo]) for campo in self.campos]
+        return [_serializar(getattr(objeto, campo)) for campo in self.campos]
+
+    def _codificar(self, objeto, direcao):
+        return signing.dumps({'v': self._valores(objeto), 'd': direcao}, salt=SALT_CURSOR, compress=True)
+
+    def _decodificar(self, cursor):
+        try:
+            dados = signing.loads(cursor, salt=SALT_CURSOR)
+            valores, direcao = dados['v'], dados['d']
+        except (signing.BadSignature, KeyError, TypeError, ValueError):
+            raise CursorInvalido(cursor)
+        if len(valores) != len(self.campos) or direcao not in ('seguinte', 'anterior'):
+            raise CursorInvalido(cursor)
+
+        convertidos = []
+        for campo, valor in zip(self.campos, valores):
+            try:
+                convertidos.append(self.queryset.model._meta.get_field(campo).to_python(valor))
+            except FieldDoesNotExist:
+                # Anotações (ex.: relevância da pesquisa) guardam o valor tal como veio
+                convertidos.append(valor)
+            except ValidationError:
+                raise CursorInvalido(cursor)
+        return convertidos, direcao
+
+    def _filtro_apos(self, valores, ordenacao):
+        """
+        Condição "vem depois de ``valores``" na ``ordenacao`` dada:
+        (a > x) OR (a = x AND b > y) OR ...
+        """
+        condicao = Q()
+        iguais = {}
+        for campo, valor in zip(ordenacao, valores):
+            nome = campo.lstrip('-')
+            operador = 'lt' if campo.startswith('-') else 'gt'
+            condicao |= Q(**iguais, **{f'{nome}__{operador}': valor})
+            iguais[nome] = valor
+        return condicao
+
+    def _limite_indice(self, valores, ordenacao):
+        """Filtro redundante no primeiro campo, que permite ao índice limitar a varredura"""
+        campo = ordenacao[0]
+        operador = 'lte' if campo.startswith('-') else 'gte'
+        return Q(**{f'{campo.lstrip("-")}__{operador}': valores[0]})
+
+    def _consulta(self, cursor):
+        """Queryset ordenado e filtrado a partir do cursor, com os valores e a direção lidos dele"""
+        valores, direcao = None, 'seguinte'
+        if cursor:
+            try:
+                valores, direcao = self._decodificar(cursor)
+            except CursorInvalido:
+                valores, direcao = None, 'seguinte'
+
+        if direcao == 'anterior':
+            ordenacao = [campo[1:] if campo.startswith('-') else f'-{campo}' for campo in self.ordenacao]
+        else:
+            ordenacao = self.ordenacao
+
+        queryset = self.queryset.order_by(*ordenacao)
+        if valores is not None:
+            queryset = queryset.filter(self._limite_indice(valores, ordenacao)).filter(
+                self._filtro_apos(valores, ordenacao)
+            )
+        return queryset, valores, direcao
+
+    def pagina(self, cursor=None):
+        """Retorna a página identificada por ``cursor`` (ou a primeira)"""
+        queryset, valores, direcao = self._consulta(cursor)
+
+        itens = list(queryset[:self.por_pagina + 1])
+        tem_mais = len(itens) > self.por_pagina
+        itens = itens[:self.por_pagina]
+
+        if direcao == 'anterior':
+            itens.reverse()
+            tem_seguinte = valores is not None
+            tem_anterior = tem_mais
+        else:
+            tem_seguinte = tem_mais
+            tem_anterior = valores is not None
+
+        cursor_seguinte = self._codificar(itens[-1], 'seguinte') if itens and tem_seguinte else None
+        cursor_anterior = self._codificar(itens[0], 'anterior') if itens and tem_anterior else None
+        return PaginaCursor(self, itens, cursor_anterior, cursor_seguinte)
+
+    def fluxo(self, cursor=None, chunk_size=100):
+        """
+        Página como fluxo: itera as linhas com ``.iterator()`` sem materializar
+        a página. Os cursores só ficam disponíveis depois de esgotado o fluxo.
+        """
+        return FluxoCursor(self, cursor, chunk_size)
+
+    def _contar(self):
+        if self._contagem is None:
+            self._contagem = contar(self.queryset)
+        return self._contagem
+
+    @property
+    def count(self):
+        """Contagem exata até LIMITE_CONTAGEM_EXATA; acima disso, estimada"""
+        return self._contar()[0]
+
+    @property
+    def contagem_estimada(self):
+        return self._contar()[1]
+
+
+class FluxoCursor:
+    """Iterador sobre uma página que calcula os cursores à medida que avança"""
+
+    def __init__(self, paginador, cursor, chunk_size):
+        self.paginador = paginador
+        self.cursor = cursor
+        self.chunk_size = chunk_size
+        self.cursor_seguinte = None
+        self.cursor_anterior = None
+
+    def __iter__(self):
+        queryset, valores, direcao = self.paginador._consulta(self.cursor)
+        if direcao == 'anterior':
+            # Voltar atrás exige inverter a página; a página é limitada, então materializa-se
+            pagina = self.paginador.pagina(self.cursor)
+            self.cursor_seguinte = pagina.cursor_seguinte
+            self.cursor_anterior = pagina.cursor_anterior
+            yield from pagina
+            return
+
+        por_pagina = self.paginador.por_pagina
+        primeiro = ultimo = None
+        for posicao, item in enumerate(queryset[:por_pagina + 1].iterator(chunk_size=self.chunk_size)):
+            if posicao == por_pagina:
+                # O item extra só indica que existe uma página seguinte
+                self.cursor_seguinte = self.paginador._codificar(ultimo, 'seguinte')
+                break
+            if primeiro is None:
+                primeiro = item
+            ultimo = item
+            yield item
+
+        if valores is not None and primeiro is not None:
+            self.cursor_anterior = self.paginador._codificar(primeiro, 'anterior')
+
+
+def contar(queryset, limite=LIMITE_CONTAGEM_EXATA):
+    """
+    Conta os resultados de ``queryset`` com custo limitado
+
+    Retorna ``(total, estimado)``. Conta exatamente até ``limite`` linhas
+    (``COUNT`` sobre uma subconsulta com ``LIMIT``); acima disso usa a
+    estimativa do planeador do PostgreSQL.
+    """
+    total = queryset.order_by()[:limite + 1].count()
+    if total <= limite:
+        return total, False
+
+    conexao = connections[queryset.db]
+    if conexao.vendor != 'postgresql':
+        return queryset.count(), False
+
+    sql, parametros = queryset.order_by().query.sql_with_params()
+    with conexao.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', parametros)
+        plano = cursor.fetchone()[0]
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+    return max(limite + 1, int(plano[0]['Plan']['Plan Rows'])), True
+
+
+class PaginadorEstimado(Paginator):
+    """
+    Paginator do admin sem ``COUNT(*)`` da tabela inteira: contagem exata até
+    LIMITE_CONTAGEM_EXATA e estimada pelo PostgreSQL acima disso (``contar``)
+    """
+
+    @cached_property
+    def count(self):
+        return contar(self.object_list)[0]
+
+
+def parametros_sem_cursor(request):
+    """Query string atual sem o cursor, para montar os links de paginação"""
+    parametros = request.GET.copy()
+    parametros.pop('cursor', None)
+    parametros.pop('page', None)
+    return parametros.urlencode()
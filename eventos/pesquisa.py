@@ -0,0 +1,115 @@
+"""
+Pesquisa de texto completo em eventos e notícias (PostgreSQL)
+
+Cada modelo guarda um tsvector pré-calculado (``vetor_pesquisa``, com índice
+GIN) gerado com a configuração ``portuguese_unaccent``: stemming português e
+remoção de acentos. Um índice de trigramas sobre o título tolera erros de
+digitação. Fora do PostgreSQL a pesquisa recua para ``icontains``.
+"""
+from django.contrib.postgres.search import (
+    SearchHeadline, SearchQuery, SearchRank, SearchVector, TrigramSimilarity,
+)
+from django.db import connections
+from django.db.models import FloatField, Q, Value
+from django.db.models.functions import Cast, Greatest
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+
+CONFIG_PESQUISA = 'portuguese_unaccent'
+
+# Marcadores de controlo: o texto é escapado antes de virarem <mark>
+INICIO_DESTAQUE = '\x02'
+FIM_DESTAQUE = '\x03'
+
+OPCOES_DESTAQUE = {
+    'start_sel': INICIO_DESTAQUE,
+    'stop_sel': FIM_DESTAQUE,
+    'max_words': 30,
+    'min_words': 15,
+    'max_fragments': 2,
+}
+
+
+def vetor_evento():
+    """Expressão do tsvector de um evento, ponderada por campo"""
+    return (
+        SearchVector('titulo', weight='A', config=CONFIG_PESQUISA)
+        + SearchVector('local', weight='B', config=CONFIG_PESQUISA)
+        + SearchVector('descricao', weight='C', config=CONFIG_PESQUISA)
+    )
+
+
+def vetor_noticia():
+    """Expressão do tsvector de uma notícia, ponderada por campo"""
+    return (
+        SearchVector('titulo', weight='A', config=CONFIG_PESQUISA)
+        + SearchVector('subtitulo', 'tags', weight='B', config=CONFIG_PESQUISA)
+        + SearchVector('resumo', weight='C', config=CONFIG_PESQUISA)
+        + SearchVector('conteudo', weight='D', config=CONFIG_PESQUISA)
+    )
+
+
+def suporta_pesquisa(queryset):
+    """Indica se a base de dados do queryset suporta a pesquisa de texto completo"""
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def atualizar_vetores(queryset):
+    """Recalcula o vetor de pesquisa das linhas do queryset num único UPDATE"""
+    from .models import Evento
+
+    if not suporta_pesquisa(queryset):
+        return 0
+    vetor = vetor_evento() if queryset.model is Evento else vetor_noticia()
+    return queryset.update(vetor_pesquisa=vetor)
+
+
+def _consulta(termo):
+    return SearchQuery(termo, config=CONFIG_PESQUISA, search_type='websearch')
+
+
+def _pesquisar(queryset, termo, campos_fallback):
+    if not suporta_pesquisa(queryset):
+        filtro = Q()
+        for campo in campos_fallback:
+            filtro |= Q(**{f'{campo}__icontains': termo})
+        return queryset.filter(filtro)
+
+    consulta = _consulta(termo)
+    return queryset.annotate(
+        # double precision: o valor tem de sobreviver intacto num cursor de paginação
+        relevancia=Cast(Greatest(
+            SearchRank('vetor_pesquisa', consulta),
+            TrigramSimilarity('titulo', termo),
+        ), FloatField()),
+    ).filter(
+        Q(vetor_pesquisa=consulta) | Q(titulo__trigram_similar=termo)
+    )
+
+
+def pesquisar_eventos(queryset, termo):
+    """Filtra eventos pelo termo; no PostgreSQL anota ``relevancia``"""
+    return _pesquisar(queryset, termo, ['titulo', 'descricao', 'local'])
+
+
+def pesquisar_noticias(queryset, termo):
+    """Filtra notícias pelo termo; no PostgreSQL anota ``relevancia``"""
+    return _pesquisar(queryset, termo, ['titulo', 'subtitulo', 'resumo', 'conteudo', 'tags'])
+
+
+def com_destaque(queryset, termo, campo):
+    """Anota ``trecho`` com o excerto de ``campo`` onde o termo aparece marcado"""
+    if not suporta_pesquisa(queryset):
+        return queryset.annotate(trecho=Value(''))
+    return queryset.annotate(
+        trecho=SearchHeadline(campo, _consulta(termo), config=CONFIG_PESQUISA, **OPCOES_DESTAQUE)
+    )
+
+
+def trecho_html(trecho):
+    """Converte o excerto de SearchHeadline em HTML seguro com <mark>"""
+    if not trecho:
+        return ''
+    html = escape(trecho).replace(INICIO_DESTAQUE, '<mark>').replace(FIM_DESTAQUE, '</mark>')
+    return mark_safe(html)
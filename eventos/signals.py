@@ -0,0 +1,95 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import Signal, receiver
+
+from .autenticacao import invalidar_usuario
+from .cache import invalidar_home
+from .imagens import agendar_derivados
+from .inscricoes import promover_lista_espera
+from .pesquisa import atualizar_vetores
+from .models import Evento, Noticia, Categoria, Inscricao, PerfilUsuario, libertar_lugares
+
+
+# Enviado uma vez por cada UPDATE em lote de inscrições que muda o status
+# (InscricaoQuerySet.update: ações do admin, libertar_reservas; check-in por
+# QR code), já com os contadores acertados. Argumentos: eventos_ids, campos, using.
+inscricoes_alteradas = Signal()
+
+
+@receiver(post_save, sender=Evento)
+@receiver(post_save, sender=Noticia)
+@receiver(post_save, sender=Categoria)
+def invalidar_home_ao_salvar(sender, instance, update_fields=None, **kwargs):
+    """Invalida o cache da página inicial quando o conteúdo muda"""
+    # O contador de visualizações não justifica descartar o cache; o TTL cobre-o
+    if update_fields and set(update_fields) <= {'visualizacoes'}:
+        return
+    invalidar_home()
+
+
+@receiver(post_save, sender=Evento)
+@receiver(post_save, sender=Noticia)
+def atualizar_vetor_pesquisa(sender, instance, update_fields=None, **kwargs):
+    """Recalcula o tsvector armazenado após alterações de conteúdo"""
+    if update_fields and set(update_fields) <= {'visualizacoes'}:
+        return
+    atualizar_vetores(sender.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Evento)
+@receiver(post_save, sender=Noticia)
+def gerar_derivados_imagem(sender, instance, update_fields=None, **kwargs):
+    """Gera as cópias responsivas quando a imagem muda"""
+    if update_fields and 'imagem' not in update_fields:
+        return
+    agendar_derivados(instance)
+
+
+@receiver(post_delete, sender=Evento)
+@receiver(post_delete, sender=Noticia)
+@receiver(post_delete, sender=Categoria)
+def invalidar_home_ao_remover(sender, instance, **kwargs):
+    """Invalida o cache da página inicial quando conteúdo é removido"""
+    invalidar_home()
+
+
+@receiver(post_save, sender=Evento)
+def promover_ao_alterar_capacidade(sender, instance, update_fields=None, using=None, **kwargs):
+    """Um aumento de capacidade passa os lugares novos à lista de espera"""
+    if update_fields and 'capacidade_maxima' not in update_fields:
+        return
+    promover_lista_espera(instance.pk, using=using)
+
+
+@receiver(pre_delete, sender=User)
+def guardar_eventos_do_usuario(sender, instance, using, **kwargs):
+    """
+    As inscrições de um utilizador removido saem em cascata, sem passar por
+    InscricaoQuerySet.delete: guarda os eventos em que ocupavam lugar
+    """
+    instance._eventos_com_lugar = Inscricao.objects.using(using).filter(participante=instance).eventos_com_lugar()
+
+
+@receiver(post_delete, sender=User)
+def recontar_eventos_do_usuario(sender, instance, using, **kwargs):
+    """Reconta os eventos do utilizador removido, já sem as suas inscrições"""
+    libertar_lugares(getattr(instance, '_eventos_com_lugar', ()), using=using)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidar_usuario_em_cache(sender, instance, using, **kwargs):
+    """Descarta o utilizador guardado pelo BackendUsuarioCache"""
+    # Só depois do commit: antes disso, um pedido concorrente voltaria a pôr
+    # em cache a linha antiga, que ficaria lá até ao fim do TTL
+    usuario_id = instance.pk
+    transaction.on_commit(lambda: invalidar_usuario(usuario_id), using=using)
+
+
+@receiver(post_save, sender=PerfilUsuario)
+@receiver(post_delete, sender=PerfilUsuario)
+def invalidar_usuario_do_perfil(sender, instance, using, **kwargs):
+    """O perfil é guardado em cache junto com o utilizador"""
+    usuario_id = instance.usuario_id
+    transaction.on_commit(lambda: invalidar_usuario(usuario_id), using=using)
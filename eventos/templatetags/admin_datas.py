@@ -0,0 +1,82 @@
+"""
+Navegação por datas (date_hierarchy) do admin para tabelas grandes
+
+O ``date_hierarchy`` do Django lista anos, meses e dias com ``SELECT DISTINCT``
+sobre todas as linhas filtradas. Aqui só o intervalo (Min/Max, as pontas do
+índice da data) vem da base de dados; meses e dias saem do calendário, mesmo
+os que não têm registos.
+"""
+import calendar
+import datetime
+
+from django import template
+from django.db.models import Max, Min
+from django.utils import formats, timezone
+from django.utils.text import capfirst
+from django.utils.translation import gettext as _
+
+register = template.Library()
+
+
+@register.inclusion_tag('admin/date_hierarchy.html')
+def hierarquia_datas(cl):
+    campo = cl.date_hierarchy
+    chave_ano, chave_mes, chave_dia = (f'{campo}__{parte}' for parte in ('year', 'month', 'day'))
+    ano, mes, dia = (cl.params.get(chave) for chave in (chave_ano, chave_mes, chave_dia))
+
+    def link(filtros):
+        return cl.get_query_string(filtros, [f'{campo}__'])
+
+    if ano and mes and dia:
+        data = datetime.date(int(ano), int(mes), int(dia))
+        return {
+            'show': True,
+            'back': {
+                'link': link({chave_ano: ano, chave_mes: mes}),
+                'title': capfirst(formats.date_format(data, 'YEAR_MONTH_FORMAT')),
+            },
+            'choices': [{'title': capfirst(formats.date_format(data, 'MONTH_DAY_FORMAT'))}],
+        }
+
+    if ano and mes:
+        dias = calendar.monthrange(int(ano), int(mes))[1]
+        return {
+            'show': True,
+            'back': {'link': link({chave_ano: ano}), 'title': str(ano)},
+            'choices': [
+                {
+                    'link': link({chave_ano: ano, chave_mes: mes, chave_dia: numero}),
+                    'title': capfirst(formats.date_format(datetime.date(int(ano), int(mes), numero), 'MONTH_DAY_FORMAT')),
+                }
+                for numero in range(1, dias + 1)
+            ],
+        }
+
+    if ano:
+        return {
+            'show': True,
+            'back': {'link': link({}), 'title': _('All dates')},
+            'choices': [
+                {
+                    'link': link({chave_ano: ano, chave_mes: numero}),
+                    'title': capfirst(formats.date_format(datetime.date(int(ano), numero, 1), 'YEAR_MONTH_FORMAT')),
+                }
+                for numero in range(1, 13)
+            ],
+        }
+
+    intervalo = cl.queryset.aggregate(primeiro=Min(campo), ultimo=Max(campo))
+    if not intervalo['primeiro']:
+        return {'show': False}
+    primeiro, ultimo = (
+        timezone.localtime(valor) if timezone.is_aware(valor) else valor
+        for valor in (intervalo['primeiro'], intervalo['ultimo'])
+    )
+    return {
+        'show': True,
+        'back': None,
+        'choices': [
+            {'link': link({chave_ano: str(numero)}), 'title': str(numero)}
+            for numero in range(primeiro.year, ultimo.year + 1)
+        ],
+    }
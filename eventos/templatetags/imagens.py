@@ -0,0 +1,66 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+
+register = template.Library()
+
+LARGURA_SRC = 640
+TAMANHOS_CARTAO = '(min-width: 992px) 33vw, (min-width: 768px) 50vw, 100vw'
+
+
+def _atributo(objeto, nome):
+    """Lê o atributo de um modelo ou a chave de um dicionário (itens do carrossel)"""
+    if isinstance(objeto, dict):
+        return objeto.get(nome)
+    return getattr(objeto, nome, None)
+
+
+def _srcset(arquivos):
+    larguras = sorted(arquivos, key=int)
+    return ', '.join(f'{default_storage.url(arquivos[largura])} {largura}w' for largura in larguras), larguras
+
+
+@register.simple_tag
+def imagem_responsiva(objeto, classe='imagem-responsiva', tamanhos=TAMANHOS_CARTAO, alt='', carregamento='lazy'):
+    """
+    ``<picture>`` com ``srcset`` WebP/JPEG a partir de ``imagem_derivados``;
+    enquanto os derivados não existirem, usa a imagem original
+    """
+    imagem = _atributo(objeto, 'imagem')
+    if not imagem:
+        return ''
+    alt = alt or _atributo(objeto, 'titulo') or ''
+    derivados = _atributo(objeto, 'imagem_derivados') or {}
+
+    if derivados.get('origem') != imagem.name or not derivados.get('jpeg'):
+        return format_html(
+            '<img src="{}" class="{}" alt="{}" loading="{}" decoding="async">',
+            imagem.url, classe, alt, carregamento,
+        )
+
+    srcset_jpeg, larguras = _srcset(derivados['jpeg'])
+    fontes = ''
+    if derivados.get('webp'):
+        srcset_webp, _ = _srcset(derivados['webp'])
+        fontes = format_html('<source type="image/webp" srcset="{}" sizes="{}">', srcset_webp, tamanhos)
+
+    # Browsers sem srcset recebem uma largura intermédia, não a maior
+    largura_src = next((largura for largura in larguras if int(largura) >= LARGURA_SRC), larguras[-1])
+
+    # width/height reservam o espaço da imagem e evitam saltos no layout
+    atributos = [
+        ('src', default_storage.url(derivados['jpeg'][largura_src])),
+        ('srcset', srcset_jpeg),
+        ('sizes', tamanhos),
+        ('width', derivados.get('largura')),
+        ('height', derivados.get('altura')),
+        ('class', classe),
+        ('alt', alt),
+        ('loading', carregamento),
+        ('decoding', 'async'),
+    ]
+    return format_html(
+        '<picture>{}<img {}></picture>',
+        fontes,
+        format_html_join(' ', '{}="{}"', ((nome, valor) for nome, valor in atributos if valor is not None)),
+    )
@@ -1,3 +1,352 @@
-from django.test import TestCase
+import io
+import queue
+import threading
+import zipfile
+from collections import Counter
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from shalom_project.cache import partilhado
+
+from .autenticacao import CHAVE_USUARIO, BackendUsuarioCache
+from .exportacao import exportar, resposta_exportacao
+from .inscricoes import EM_ESPERA, JA_INSCRITO, LOTADO, RESERVADA, reservar_lugar
+from .models import STATUS_OCUPAM_LUGAR, Categoria, Evento, Inscricao, Noticia
+
+
+# Sem o manifesto do collectstatic: os testes não dependem do build
+@override_settings(STORAGES={
+    **settings.STORAGES, 'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class ConsultasChangelistAdminTests(TestCase):
+    """As listas do admin fazem o mesmo número de consultas com 10 ou 50 linhas por página"""
+
+    TAMANHOS = (10, 50)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'senha')
+        quantidade = max(cls.TAMANHOS) + 10
+        agora = timezone.now()
+        usuarios = User.objects.bulk_create(User(username=f'participante{numero}') for numero in range(quantidade))
+        categorias = Categoria.objects.bulk_create(Categoria(nome=f'Categoria {numero}') for numero in range(quantidade))
+        eventos = Evento.objects.bulk_create(
+            Evento(
+                titulo=f'Evento {numero}', descricao='-', categoria=categorias[numero], local='-', endereco='-',
+                data_inicio=agora + timedelta(days=numero), data_fim=agora + timedelta(days=numero + 1),
+                capacidade_maxima=numero % 3 * 10, status='publicado', organizador=usuarios[numero],
+            )
+            for numero in range(quantidade)
+        )
+        Inscricao.objects.bulk_create(
+            Inscricao(evento=evento, participante=usuario, status='confirmada')
+            for evento, usuario in zip(eventos, usuarios)
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def _abrir(self, modelo, tamanho, **parametros):
+        model_admin = admin.site._registry[modelo]
+        url = reverse(f'admin:eventos_{modelo._meta.model_name}_changelist')
+        with mock.patch.object(model_admin, 'list_per_page', tamanho):
+            resposta = self.client.get(url, parametros)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(len(resposta.context['cl'].result_list), tamanho)
+
+    def _verificar(self, modelo, **parametros):
+        menor, maior = self.TAMANHOS
+        # A primeira visita aquece sessão, permissões e caches
+        self._abrir(modelo, menor, **parametros)
+        with CaptureQueriesContext(connection) as consultas:
+            self._abrir(modelo, menor, **parametros)
+        with self.assertNumQueries(len(consultas)):
+            self._abrir(modelo, maior, **parametros)
+
+    def test_eventos(self):
+        self._verificar(Evento)
+
+    def test_eventos_ordenados_por_vagas(self):
+        # Colunas calculadas (inscricoes_count e vagas_disponiveis) ordenadas na consulta
+        colunas = admin.site._registry[Evento].list_display
+        self._verificar(Evento, o=f'{colunas.index("vagas_disponiveis") + 1}.{colunas.index("inscricoes_count") + 1}')
+
+    def test_categorias(self):
+        self._verificar(Categoria)
+
+    def test_categorias_ordenadas_por_eventos(self):
+        self._verificar(Categoria, o=str(admin.site._registry[Categoria].list_display.index('eventos_count') + 1))
+
+
+class GravacaoNoticiaTests(TestCase):
+    """Noticia.save() de uma instância antiga não repõe as colunas mantidas por UPDATEs próprios"""
+
+    def test_save_preserva_colunas_do_sistema(self):
+        autor = User.objects.create(username='autor')
+        noticia = Noticia.objects.create(
+            titulo='Notícia', conteudo='-', imagem='noticias/a.jpg', autor=autor, categoria=Categoria.objects.create(nome='Geral'),
+        )
+        Noticia.objects.filter(pk=noticia.pk).update(visualizacoes=7, imagem_derivados={'origem': 'noticias/a.jpg'})
+
+        noticia.titulo = 'Notícia revista'
+        noticia.save()
+
+        noticia.refresh_from_db()
+        self.assertEqual(noticia.titulo, 'Notícia revista')
+        self.assertEqual(noticia.visualizacoes, 7)
+        self.assertEqual(noticia.imagem_derivados, {'origem': 'noticias/a.jpg'})
+
+
+class UsuarioEmCacheTests(TestCase):
+    """O utilizador guardado pelo BackendUsuarioCache só é descartado quando a alteração fica gravada"""
+
+    def test_invalidado_depois_do_commit(self):
+        usuario = User.objects.create(username='participante')
+        chave = CHAVE_USUARIO.format(id=usuario.pk)
+        self.assertEqual(BackendUsuarioCache().get_user(usuario.pk), usuario)
+        self.assertIsNotNone(partilhado().get(chave))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            usuario.is_active = False
+            usuario.save()
+            self.assertIsNotNone(partilhado().get(chave))
+        self.assertIsNone(partilhado().get(chave))
+        self.assertIsNone(BackendUsuarioCache().get_user(usuario.pk))
+
+    def test_invalidado_ao_remover(self):
+        usuario = User.objects.create(username='participante')
+        BackendUsuarioCache().get_user(usuario.pk)
+        chave = CHAVE_USUARIO.format(id=usuario.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            usuario.delete()
+        self.assertIsNone(partilhado().get(chave))
+
+
+@override_settings(STORAGES={
+    **settings.STORAGES, 'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class ListaEsperaTests(TestCase):
+    """Inscrições passadas a espera fora de reservar_lugar (admin) entram no fim da lista"""
+
+    @classmethod
+    def setUpTestData(cls):
+        agora = timezone.now()
+        cls.evento = Evento.objects.create(
+            titulo='Evento', descricao='-', categoria=Categoria.objects.create(nome='Geral'),
+            data_inicio=agora + timedelta(days=30), data_fim=agora + timedelta(days=31), local='-', endereco='-',
+            capacidade_maxima=1, status='publicado', organizador=User.objects.create(username='organizador'),
+        )
+        cls.usuarios = User.objects.bulk_create(User(username=f'participante{numero}') for numero in range(4))
+
+    def test_status_alterado_para_espera(self):
+        # Evento lotado: a segunda ao passar a espera não promove a primeira
+        Inscricao.objects.create(evento=self.evento, participante=self.usuarios[2], status='confirmada')
+        primeira = Inscricao.objects.create(evento=self.evento, participante=self.usuarios[0], status='espera')
+        segunda = Inscricao.objects.create(evento=self.evento, participante=self.usuarios[1])
+        segunda.status = 'espera'
+        segunda.save(update_fields=['status'])
+
+        segunda.refresh_from_db()
+        self.assertIsNotNone(segunda.entrada_espera)
+        self.assertEqual(primeira.posicao_espera(), 1)
+        self.assertEqual(segunda.posicao_espera(), 2)
+
+    def test_update_em_lote_para_espera(self):
+        primeira = Inscricao.objects.create(evento=self.evento, participante=self.usuarios[0], status='espera')
+        entrada = primeira.entrada_espera
+        Inscricao.objects.create(evento=self.evento, participante=self.usuarios[1], status='cancelada')
+        Inscricao.objects.filter(evento=self.evento).update(status='espera')
+
+        primeira.refresh_from_db()
+        self.assertEqual(primeira.entrada_espera, entrada)
+        self.assertFalse(Inscricao.objects.filter(status='espera', entrada_espera__isnull=True).exists())
+
+    def test_posicao_sem_entrada_espera(self):
+        # Linhas antigas sem entrada_espera ficam no fim, por id, como em promover_lista_espera
+        inscricoes = [
+            Inscricao.objects.create(evento=self.evento, participante=usuario, status='espera')
+            for usuario in self.usuarios[1:]
+        ]
+        Inscricao.objects.filter(pk__in=[inscricao.pk for inscricao in inscricoes[:2]]).update(entrada_espera=None)
+        for inscricao in inscricoes:
+            inscricao.refresh_from_db()
+        self.assertEqual([inscricao.posicao_espera() for inscricao in inscricoes], [2, 3, 1])
+
+        self.client.force_login(self.usuarios[1])
+        resposta = self.client.get(reverse('eventos:detalhe_evento', args=[self.evento.pk]), HTTP_HOST='localhost')
+        self.assertContains(resposta, 'Posição 2 na lista de espera')
+
+
+class ExportacaoTests(TestCase):
+    """Exportação das inscrições: texto que pareça fórmula e entrega em ASGI"""
+
+    @classmethod
+    def setUpTestData(cls):
+        agora = timezone.now()
+        evento = Evento.objects.create(
+            titulo='=1+1', descricao='-', categoria=Categoria.objects.create(nome='Geral'),
+            data_inicio=agora + timedelta(days=30), data_fim=agora + timedelta(days=31), local='-', endereco='-',
+            status='publicado', organizador=User.objects.create(username='organizador'),
+        )
+        participante = User.objects.create(
+            username='participante', first_name='=HYPERLINK("http://exemplo.invalid")', last_name='@SOMA(A1)',
+            email='-participante@example.com',
+        )
+        Inscricao.objects.create(evento=evento, participante=participante, status='confirmada')
+
+    def test_formulas_escapadas_no_csv(self):
+        conteudo = b''.join(exportar(Inscricao.objects.all(), 'csv')).decode()
+        self.assertIn("'=1+1", conteudo)
+        self.assertIn('"\'=HYPERLINK(""http://exemplo.invalid"")"', conteudo)
+        self.assertIn("'@SOMA(A1)", conteudo)
+        self.assertIn("'-participante@example.com", conteudo)
+
+    def test_formulas_escapadas_no_xlsx(self):
+        arquivo = zipfile.ZipFile(io.BytesIO(b''.join(exportar(Inscricao.objects.all(), 'xlsx'))))
+        folha = arquivo.read('xl/worksheets/sheet1.xml').decode()
+        self.assertIn("<t xml:space=\"preserve\">'=1+1</t>", folha)
+        self.assertIn("<t xml:space=\"preserve\">'@SOMA(A1)</t>", folha)
+
+    @override_settings(ASGI=True)
+    def test_iterador_assincrono_em_asgi(self):
+        resposta = resposta_exportacao(Inscricao.objects.all(), 'csv')
+        self.assertTrue(resposta.is_async)
+
+        async def ler():
+            return b''.join([bloco async for bloco in resposta])
+
+        self.assertEqual(async_to_sync(ler)(), b''.join(exportar(Inscricao.objects.all(), 'csv')))
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Concorrência real só com PostgreSQL (o SQLite serializa as escritas)')
+class ReservaConcorrenteTests(TransactionTestCase):
+    """Pedidos simultâneos de inscrição, cada thread com a sua ligação, contra um evento com lotação"""
+
+    CAPACIDADE = 20
+    PEDIDOS = 80
+    CONCORRENCIA = 16
+
+    def setUp(self):
+        organizador = User.objects.create(username='organizador')
+        agora = timezone.now()
+        self.evento = Evento.objects.create(
+            titulo='Evento concorrido', descricao='-', categoria=Categoria.objects.create(nome='Geral'),
+            data_inicio=agora + timedelta(days=30), data_fim=agora + timedelta(days=31), local='-', endereco='-',
+            capacidade_maxima=self.CAPACIDADE, status='publicado', organizador=organizador,
+        )
+        self.usuarios = User.objects.bulk_create(User(username=f'participante{numero}') for numero in range(self.PEDIDOS))
+
+    def _carga(self, usuarios, repeticoes=1, lista_espera=True):
+        """Resultados de reservar_lugar para cada envio, com ``repeticoes`` envios seguidos por utilizador"""
+        pedidos = queue.Queue()
+        for usuario in usuarios:
+            for _ in range(repeticoes):
+                pedidos.put(usuario)
+        resultados = Counter()
+        lock = threading.Lock()
+        partida = threading.Barrier(self.CONCORRENCIA)
+
+        def trabalhador():
+            proprios = Counter()
+            try:
+                # Todas as threads abrem a ligação e começam ao mesmo tempo
+                connection.ensure_connection()
+                partida.wait()
+                while True:
+                    try:
+                        usuario = pedidos.get_nowait()
+                    except queue.Empty:
+                        break
+                    resultado, _ = reservar_lugar(self.evento, usuario, lista_espera=lista_espera)
+                    proprios[resultado] += 1
+            finally:
+                connection.close()
+                with lock:
+                    resultados.update(proprios)
+
+        threads = [threading.Thread(target=trabalhador) for _ in range(self.CONCORRENCIA)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return resultados
+
+    def _verificar_evento(self, ocupadas, em_espera):
+        self.evento.refresh_from_db()
+        inscricoes = Inscricao.objects.filter(evento=self.evento)
+        self.assertEqual(inscricoes.filter(status__in=STATUS_OCUPAM_LUGAR).count(), ocupadas)
+        self.assertEqual(inscricoes.filter(status='espera').count(), em_espera)
+        self.assertEqual(self.evento.lugares_ocupados, ocupadas)
+        self.assertFalse(Evento.objects.com_contagem_divergente().exists())
+
+    def test_sem_sobrelotacao_com_lista_espera(self):
+        resultados = self._carga(self.usuarios)
+        self.assertEqual(resultados[RESERVADA], self.CAPACIDADE)
+        self.assertEqual(resultados[EM_ESPERA], self.PEDIDOS - self.CAPACIDADE)
+        self._verificar_evento(self.CAPACIDADE, self.PEDIDOS - self.CAPACIDADE)
+
+    def test_sem_sobrelotacao_sem_lista_espera(self):
+        resultados = self._carga(self.usuarios, lista_espera=False)
+        self.assertEqual(resultados[RESERVADA], self.CAPACIDADE)
+        self.assertEqual(resultados[LOTADO], self.PEDIDOS - self.CAPACIDADE)
+        self._verificar_evento(self.CAPACIDADE, 0)
+
+    def test_duplo_envio(self):
+        # Cada utilizador envia três vezes seguidas; só o primeiro envio grava
+        resultados = self._carga(self.usuarios, repeticoes=3)
+        self.assertEqual(resultados[RESERVADA], self.CAPACIDADE)
+        self.assertEqual(resultados[JA_INSCRITO], 2 * self.CAPACIDADE)
+        self.assertEqual(resultados[EM_ESPERA], 3 * (self.PEDIDOS - self.CAPACIDADE))
+        self.assertEqual(Inscricao.objects.filter(evento=self.evento).count(), self.PEDIDOS)
+        self._verificar_evento(self.CAPACIDADE, self.PEDIDOS - self.CAPACIDADE)
+
+    def test_reservas_expiradas_libertadas_sob_carga(self):
+        # Evento lotado só por reservas vencidas: os pedidos simultâneos
+        # libertam-nas (e recontam o evento) enquanto outros ocupam lugares
+        vencidas = User.objects.bulk_create(User(username=f'reserva{numero}') for numero in range(self.CAPACIDADE))
+        Inscricao.objects.bulk_create(
+            Inscricao(evento=self.evento, participante=usuario, status='pendente',
+                      reserva_expira=timezone.now() - timedelta(hours=1))
+            for usuario in vencidas
+        )
+        self.evento.refresh_from_db()
+        self.assertEqual(self.evento.lugares_ocupados, self.CAPACIDADE)
+
+        resultados = self._carga(self.usuarios)
+        self.assertEqual(resultados[RESERVADA] + resultados[EM_ESPERA], self.PEDIDOS)
+        self.assertEqual(Inscricao.objects.filter(evento=self.evento, status='expirada').count(), self.CAPACIDADE)
+        self._verificar_evento(self.CAPACIDADE, self.PEDIDOS - self.CAPACIDADE)
+
+    def test_lista_espera_promovida_ao_cancelar(self):
+        self._carga(self.usuarios)
+        primeiros = list(
+            Inscricao.objects.filter(evento=self.evento, status='espera').order_by('entrada_espera', 'id')[:5]
+        )
+        # Cancelamentos simultâneos passam os lugares à lista de espera, pela ordem de chegada
+        canceladas = list(Inscricao.objects.filter(evento=self.evento, status='pendente')[:5])
+        threads = [threading.Thread(target=self._cancelar, args=(inscricao.pk,)) for inscricao in canceladas]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for inscricao in primeiros:
+            inscricao.refresh_from_db()
+            self.assertEqual(inscricao.status, 'pendente')
+        self._verificar_evento(self.CAPACIDADE, self.PEDIDOS - self.CAPACIDADE - 5)
+
+    def _cancelar(self, inscricao_id):
+        try:
+            Inscricao.objects.get(pk=inscricao_id).cancelar()
+        finally:
+            connection.close()
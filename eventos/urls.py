@@ -1,11 +1,15 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, views, views_async
+
+# Em ASGI as páginas de leitura usam as versões assíncronas
+leitura = views_async if settings.ASGI else views
 
 app_name = 'eventos'
 
 urlpatterns = [
     # Página inicial
-    path('', views.home_page, name='home'),
+    path('', leitura.home_page, name='home'),
     
     # Autenticação
     path('registro/', views.registro_usuario, name='registro'),
@@ -16,11 +20,14 @@ urlpatterns = [
     path('logout/', views.logout_usuario, name='logout'),
     
     # Páginas públicas
-    path('eventos/', views.lista_eventos, name='lista_eventos'),
-    path('evento/<int:evento_id>/', views.detalhe_evento, name='detalhe_evento'),
-    path('noticias/', views.lista_noticias, name='lista_noticias'),
-    path('noticia/<int:noticia_id>/', views.detalhe_noticia, name='detalhe_noticia'),
-    path('api/eventos/', views.api_eventos, name='api_eventos'),
+    path('eventos/', leitura.lista_eventos, name='lista_eventos'),
+    path('evento/<int:evento_id>/', leitura.detalhe_evento, name='detalhe_evento'),
+    path('noticias/', leitura.lista_noticias, name='lista_noticias'),
+    path('noticia/<int:noticia_id>/', leitura.detalhe_noticia, name='detalhe_noticia'),
+    path('pesquisa/', views.pesquisa, name='pesquisa'),
+    path('api/eventos/', api.api_eventos_async if settings.ASGI else api.api_eventos, name='api_eventos'),
+    path('api/v1/eventos/', api.api_v1_eventos, name='api_v1_eventos'),
+    path('api/v1/checkin/', api.api_checkin, name='api_checkin'),
     
     # Páginas que requerem login
     path('inscrever/<int:evento_id>/', views.inscrever_evento, name='inscrever_evento'),
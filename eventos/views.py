@@ -1,101 +1,35 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
-from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Count, Q
 from django.utils import timezone
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
-from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.conf import settings
 from .models import Evento, Inscricao, Categoria, PerfilUsuario, Avaliacao, CodigoVerificacao, Noticia
 from .forms import RegistroUsuarioForm
+from .cache import obter_feed_home
+from .checkin import STATUS_CHECKIN, token_inscricao
+from .emails import enfileirar_email
+from .inscricoes import EM_ESPERA, JA_INSCRITO, LOTADO, reservar_lugar
+from .paginacao import PaginadorCursor, parametros_sem_cursor
+from .visualizacoes import registrar_visualizacao, visualizacoes_pendentes
+from .pesquisa import pesquisar_eventos, pesquisar_noticias, com_destaque, trecho_html, suporta_pesquisa
 from datetime import timedelta
 import random
 
 
+RESULTADOS_PESQUISA = 10
+
+
 def home_page(request):
     """Página inicial inspirada no site da Comunidade Shalom Portugal"""
-    # Eventos em destaque (marcados como em_destaque)
-    eventos_destaque = Evento.objects.filter(
-        status='publicado',
-        em_destaque=True,
-        data_inicio__gte=timezone.now()
-    ).order_by('data_inicio')[:5]
-    
-    # Se não houver eventos em destaque, buscar os próximos eventos
-    if not eventos_destaque:
-        eventos_destaque = Evento.objects.filter(
-            status='publicado',
-            data_inicio__gte=timezone.now()
-        ).order_by('data_inicio')[:5]
-    
-    # Eventos recentes
-    eventos_recentes = Evento.objects.filter(
-        status='publicado'
-    ).order_by('-criado_em')[:6]
-    
-    # Notícias em destaque
-    noticias_destaque = Noticia.objects.filter(
-        status='publicado',
-        em_destaque=True
-    ).order_by('-data_publicacao')[:3]
-    
-    # Notícias recentes
-    noticias_recentes = Noticia.objects.filter(
-        status='publicado'
-    ).order_by('-data_publicacao')[:6]
-    
-    # Combinar eventos e notícias em destaque para o carrossel
-    carousel_items = []
-    
-    # Adicionar eventos em destaque
-    for evento in eventos_destaque:
-        carousel_items.append({
-            'id': evento.id,
-            'titulo': evento.titulo,
-            'imagem': evento.imagem,
-            'categoria': evento.categoria,
-            'data_inicio': evento.data_inicio,
-            'local': evento.local,
-            'preco': evento.preco,
-            'tipo': 'evento'
-        })
-    
-    # Adicionar notícias em destaque
-    for noticia in noticias_destaque:
-        carousel_items.append({
-            'id': noticia.id,
-            'titulo': noticia.titulo,
-            'imagem': noticia.imagem,
-            'categoria': noticia.categoria,
-            'data_publicacao': noticia.data_publicacao,
-            'autor': noticia.autor,
-            'visualizacoes': noticia.visualizacoes,
-            'tipo': 'noticia'
-        })
-    
-    # Ordenar por data (mais recentes primeiro)
-    carousel_items.sort(key=lambda x: x.get('data_publicacao', x.get('data_inicio')), reverse=True)
-    
-    # Limitar a 5 itens no carrossel
-    carousel_items = carousel_items[:5]
-    
-    # Categorias populares
-    categorias = Categoria.objects.all()[:6]
-    
-    context = {
-        'eventos_destaque': eventos_destaque,
-        'eventos_recentes': eventos_recentes,
-        'noticias_destaque': noticias_destaque,
-        'noticias_recentes': noticias_recentes,
-        'carousel_items': carousel_items,
-        'categorias': categorias,
-    }
+    # Feed e carrossel vêm do cache, invalidado por sinais de Evento/Noticia/Categoria
+    context = obter_feed_home()
     return render(request, 'eventos/home_shalom.html', context)
 
 
@@ -135,23 +69,24 @@ def registro_usuario(request):
         form = RegistroUsuarioForm(request.POST)
         
         if form.is_valid():
-            user = form.save(commit=False)
-            user.is_active = False  # Usuário inativo até verificar email
-            user.save()
-            
-            # Criar perfil do usuário
-            perfil = PerfilUsuario.objects.create(usuario=user)
-            
-            # Gerar código de verificação
-            codigo = CodigoVerificacao.objects.create(
-                usuario=user,
-                email=user.email,
-                expira_em=timezone.now() + timedelta(hours=24)
-            )
-            codigo.gerar_codigo()
-            
-            # Enviar email de verificação
-            enviar_email_verificacao(user, codigo)
+            with transaction.atomic():
+                user = form.save(commit=False)
+                user.is_active = False  # Usuário inativo até verificar email
+                user.save()
+                
+                # Criar perfil do usuário
+                perfil = PerfilUsuario.objects.create(usuario=user)
+                
+                # Gerar código de verificação
+                codigo = CodigoVerificacao.objects.create(
+                    usuario=user,
+                    email=user.email,
+                    expira_em=timezone.now() + timedelta(hours=24)
+                )
+                codigo.gerar_codigo()
+                
+                # Enfileirar email de verificação (enviado pelo run_mail_worker)
+                enviar_email_verificacao(user, codigo)
             
             messages.success(request, 'Conta criada com sucesso! Verifique seu email para ativar sua conta.')
             return redirect('eventos:verificar_email', user_id=user.id)
@@ -191,7 +126,7 @@ def verificar_email(request, user_id):
             codigo.usar()
             
             # Fazer login do usuário
-            login(request, user)
+            login(request, user, backend=settings.AUTHENTICATION_BACKENDS[0])
             
             messages.success(request, 'Email verificado com sucesso! Sua conta foi ativada.')
             return redirect('eventos:home')
@@ -205,26 +140,27 @@ def reenviar_codigo(request, user_id):
     """Reenviar código de verificação"""
     user = get_object_or_404(User, id=user_id)
     
-    # Invalidar códigos anteriores
-    CodigoVerificacao.objects.filter(usuario=user, usado=False).update(usado=True)
-    
-    # Criar novo código
-    codigo = CodigoVerificacao.objects.create(
-        usuario=user,
-        email=user.email,
-        expira_em=timezone.now() + timedelta(hours=24)
-    )
-    codigo.gerar_codigo()
-    
-    # Enviar email
-    enviar_email_verificacao(user, codigo)
+    with transaction.atomic():
+        # Invalidar códigos anteriores
+        CodigoVerificacao.objects.filter(usuario=user, usado=False).update(usado=True)
+        
+        # Criar novo código
+        codigo = CodigoVerificacao.objects.create(
+            usuario=user,
+            email=user.email,
+            expira_em=timezone.now() + timedelta(hours=24)
+        )
+        codigo.gerar_codigo()
+        
+        # Enfileirar email
+        enviar_email_verificacao(user, codigo)
     
     messages.success(request, 'Novo código enviado para seu email!')
     return redirect('eventos:verificar_email', user_id=user.id)
 
 
 def enviar_email_verificacao(user, codigo):
-    """Enviar email de verificação"""
+    """Enfileirar email de verificação"""
     subject = 'Verifique seu email - Comunidade Shalom Portugal'
     
     # Template HTML do email
@@ -237,14 +173,13 @@ def enviar_email_verificacao(user, codigo):
     # Versão texto simples
     plain_message = strip_tags(html_message)
     
-    # Enviar email
-    send_mail(
-        subject=subject,
-        message=plain_message,
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[user.email],
-        html_message=html_message,
-        fail_silently=False,
+    # Enfileirar email; o envio SMTP acontece fora do pedido
+    enfileirar_email(
+        assunto=subject,
+        corpo=plain_message,
+        destinatarios=[user.email],
+        corpo_html=html_message,
+        remetente=settings.DEFAULT_FROM_EMAIL,
     )
 
 
@@ -282,17 +217,15 @@ def lista_eventos(request):
         eventos = eventos.filter(categoria_id=categoria_id)
     
     busca = request.GET.get('busca')
+    ordenacao = ['-data_inicio', '-id']
     if busca:
-        eventos = eventos.filter(
-            Q(titulo__icontains=busca) |
-            Q(descricao__icontains=busca) |
-            Q(local__icontains=busca)
-        )
+        eventos = pesquisar_eventos(eventos, busca)
+        if suporta_pesquisa(eventos):
+            ordenacao = ['-relevancia', '-data_inicio', '-id']
     
-    # Paginação
-    paginator = Paginator(eventos, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Paginação por cursor
+    paginador = PaginadorCursor(eventos.select_related('categoria'), ordenacao, 12)
+    page_obj = paginador.pagina(request.GET.get('cursor'))
     
     categorias = Categoria.objects.all()
     
@@ -301,6 +234,7 @@ def lista_eventos(request):
         'categorias': categorias,
         'busca': busca,
         'categoria_selecionada': categoria_id,
+        'parametros': parametros_sem_cursor(request),
     }
     return render(request, 'eventos/lista_eventos.html', context)
 
@@ -333,28 +267,25 @@ def inscrever_evento(request, evento_id):
         messages.error(request, 'Você precisa verificar seu email antes de se inscrever em eventos.')
         return redirect('eventos:perfil_usuario')
     
-    # Verificar se já está inscrito
-    inscricao_existente = Inscricao.objects.filter(
-        evento=evento, 
-        participante=request.user
-    ).first()
-    
-    if inscricao_existente:
+    # Reserva atómica: nunca ultrapassa a capacidade, nem com envios simultâneos
+    resultado, inscricao = reservar_lugar(evento, request.user)
+
+    if resultado == JA_INSCRITO:
         messages.warning(request, 'Você já está inscrito neste evento.')
         return redirect('eventos:detalhe_evento', evento_id=evento_id)
-    
-    # Verificar se o evento está cheio
-    if evento.esta_cheio:
+
+    if resultado == LOTADO:
         messages.error(request, 'Este evento está lotado.')
         return redirect('eventos:detalhe_evento', evento_id=evento_id)
-    
-    # Criar inscrição
-    inscricao = Inscricao.objects.create(
-        evento=evento,
-        participante=request.user,
-        status='pendente'
-    )
-    
+
+    if resultado == EM_ESPERA:
+        messages.info(
+            request,
+            f'Este evento está lotado. Você está na lista de espera (posição {inscricao.posicao_espera()}) '
+            'e será avisado por email se vagar um lugar.'
+        )
+        return redirect('eventos:detalhe_evento', evento_id=evento_id)
+
     messages.success(request, 'Inscrição realizada com sucesso!')
     return redirect('eventos:detalhe_evento', evento_id=evento_id)
 
@@ -368,6 +299,7 @@ def cancelar_inscricao(request, evento_id):
         participante=request.user
     )
     
+    # O lugar libertado passa logo à próxima pessoa na lista de espera
     inscricao.cancelar()
     messages.success(request, 'Inscrição cancelada com sucesso!')
     return redirect('eventos:detalhe_evento', evento_id=evento_id)
@@ -376,7 +308,13 @@ def cancelar_inscricao(request, evento_id):
 @login_required
 def meus_eventos(request):
     """Lista eventos do usuário logado"""
-    inscricoes = Inscricao.objects.filter(participante=request.user).order_by('-data_inscricao')
+    inscricoes = list(
+        Inscricao.objects.filter(participante=request.user).select_related('evento__categoria').order_by('-data_inscricao')
+    )
+    for inscricao in inscricoes:
+        # Bilhete para o check-in à porta (QR code; ver checkin.py)
+        if inscricao.status in STATUS_CHECKIN:
+            inscricao.token_checkin = token_inscricao(inscricao)
     
     context = {
         'inscricoes': inscricoes,
@@ -387,7 +325,11 @@ def meus_eventos(request):
 @login_required
 def perfil_usuario(request):
     """Perfil do usuário logado"""
-    perfil, created = PerfilUsuario.objects.get_or_create(usuario=request.user)
+    # O perfil já vem com o utilizador (BackendUsuarioCache)
+    try:
+        perfil = request.user.perfil
+    except PerfilUsuario.DoesNotExist:
+        perfil, created = PerfilUsuario.objects.get_or_create(usuario=request.user)
     
     if request.method == 'POST':
         # Atualizar dados do usuário
@@ -415,52 +357,88 @@ def perfil_usuario(request):
         return redirect('eventos:perfil_usuario')
     
     # Estatísticas do usuário
-    inscricoes_count = Inscricao.objects.filter(participante=request.user).count()
-    eventos_presente = Inscricao.objects.filter(participante=request.user, status='presente').count()
+    estatisticas = Inscricao.objects.filter(participante=request.user).aggregate(
+        inscricoes_count=Count('id'),
+        eventos_presente=Count('id', filter=Q(status='presente')),
+    )
     
     context = {
         'perfil': perfil,
-        'inscricoes_count': inscricoes_count,
-        'eventos_presente': eventos_presente,
+        'inscricoes_count': estatisticas['inscricoes_count'],
+        'eventos_presente': estatisticas['eventos_presente'],
     }
     return render(request, 'eventos/perfil_usuario.html', context)
 
 
-def api_eventos(request):
-    """API para listar eventos (JSON)"""
-    eventos = Evento.objects.filter(status='publicado').values(
-        'id', 'titulo', 'descricao', 'data_inicio', 'data_fim', 
-        'local', 'preco', 'capacidade_maxima'
-    )
-    
-    return JsonResponse({'eventos': list(eventos)})
-
-
 def lista_noticias(request):
     """Lista todas as notícias publicadas"""
-    noticias = Noticia.objects.filter(status='publicado').order_by('-data_publicacao')
+    noticias = Noticia.objects.filter(status='publicado').select_related('autor', 'categoria')
     
     # Notícias em destaque (primeiras 3 notícias)
-    noticias_destaque = noticias[:3]
+    noticias_destaque = noticias.order_by('-data_publicacao', '-id')[:3]
+    
+    busca = request.GET.get('busca')
+    ordenacao = ['-data_publicacao', '-id']
+    if busca:
+        noticias = pesquisar_noticias(noticias, busca)
+        if suporta_pesquisa(noticias):
+            ordenacao = ['-relevancia', '-data_publicacao', '-id']
     
-    # Paginação
-    paginator = Paginator(noticias, 9)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Paginação por cursor
+    paginador = PaginadorCursor(noticias, ordenacao, 9)
+    page_obj = paginador.pagina(request.GET.get('cursor'))
     
     context = {
         'page_obj': page_obj,
         'noticias_destaque': noticias_destaque,
+        'busca': busca,
+        'parametros': parametros_sem_cursor(request),
     }
     return render(request, 'eventos/lista_noticias.html', context)
 
 
+def pesquisa(request):
+    """Pesquisa de texto completo em eventos e notícias"""
+    termo = request.GET.get('q', '').strip()
+    eventos = []
+    noticias = []
+    
+    if termo:
+        eventos = pesquisar_eventos(
+            Evento.objects.filter(status='publicado').select_related('categoria'), termo
+        )
+        eventos = com_destaque(eventos, termo, 'descricao')
+        noticias = pesquisar_noticias(
+            Noticia.objects.filter(status='publicado').select_related('categoria'), termo
+        )
+        noticias = com_destaque(noticias, termo, 'conteudo')
+        
+        if suporta_pesquisa(eventos):
+            eventos = eventos.order_by('-relevancia', '-data_inicio')
+            noticias = noticias.order_by('-relevancia', '-data_publicacao')
+        
+        eventos = list(eventos[:RESULTADOS_PESQUISA])
+        noticias = list(noticias[:RESULTADOS_PESQUISA])
+        for resultado in eventos + noticias:
+            resultado.trecho = trecho_html(resultado.trecho)
+    
+    context = {
+        'termo': termo,
+        'eventos': eventos,
+        'noticias': noticias,
+    }
+    return render(request, 'eventos/pesquisa.html', context)
+
+
 def detalhe_noticia(request, noticia_id):
     """Detalhes de uma notícia específica"""
-    noticia = get_object_or_404(Noticia, id=noticia_id, status='publicado')
+    noticia = get_object_or_404(
+        Noticia.objects.select_related('autor', 'categoria'), id=noticia_id, status='publicado'
+    )
     
-    # Incrementar visualizações
-    noticia.incrementar_visualizacao()
+    # Visualizações acumuladas no cache e gravadas em lote (sem escrita no pedido)
+    registrar_visualizacao(request, noticia)
+    noticia.visualizacoes += visualizacoes_pendentes(noticia.id)
     
     # Notícias relacionadas
     noticias_relacionadas = Noticia.objects.filter(
@@ -0,0 +1,139 @@
+"""
+Versões assíncronas das páginas de leitura, usadas quando o projeto corre em
+ASGI (settings.ASGI, worker uvicorn)
+
+Um processo serve muitos clientes lentos sem uma thread por ligação. As
+consultas independentes de cada página correm em simultâneo (``em_paralelo``)
+e o template é renderizado fora do event loop, já que o contexto de
+autenticação e a sessão ainda fazem consultas síncronas.
+"""
+from asgiref.sync import sync_to_async
+from django.shortcuts import aget_object_or_404, render
+
+from .assincrono import em_paralelo
+from .cache import aobter_feed_home
+from .models import Categoria, Evento, Inscricao, Noticia
+from .paginacao import PaginadorCursor, parametros_sem_cursor
+from .pesquisa import pesquisar_eventos, pesquisar_noticias, suporta_pesquisa
+from .visualizacoes import registrar_visualizacao, visualizacoes_pendentes
+
+
+arender = sync_to_async(render)
+
+
+async def home_page(request):
+    """Página inicial inspirada no site da Comunidade Shalom Portugal"""
+    context = await aobter_feed_home()
+    return await arender(request, 'eventos/home_shalom.html', context)
+
+
+async def lista_eventos(request):
+    """Lista todos os eventos publicados"""
+    eventos = Evento.objects.filter(status='publicado').order_by('-data_inicio')
+
+    # Filtros
+    categoria_id = request.GET.get('categoria')
+    if categoria_id:
+        eventos = eventos.filter(categoria_id=categoria_id)
+
+    busca = request.GET.get('busca')
+    ordenacao = ['-data_inicio', '-id']
+    if busca:
+        eventos = pesquisar_eventos(eventos, busca)
+        if suporta_pesquisa(eventos):
+            ordenacao = ['-relevancia', '-data_inicio', '-id']
+
+    # Página, contagem e categorias são independentes
+    paginador = PaginadorCursor(eventos.select_related('categoria'), ordenacao, 12)
+    cursor = request.GET.get('cursor')
+    page_obj, _, categorias = await em_paralelo(
+        lambda: paginador.pagina(cursor),
+        lambda: paginador.count,
+        lambda: list(Categoria.objects.all()),
+    )
+
+    context = {
+        'page_obj': page_obj,
+        'categorias': categorias,
+        'busca': busca,
+        'categoria_selecionada': categoria_id,
+        'parametros': parametros_sem_cursor(request),
+    }
+    return await arender(request, 'eventos/lista_eventos.html', context)
+
+
+async def detalhe_evento(request, evento_id):
+    """Detalhes de um evento específico"""
+    usuario = await request.auser()
+    evento = await aget_object_or_404(
+        Evento.objects.select_related('categoria', 'organizador'), id=evento_id, status='publicado'
+    )
+    inscricao_usuario = None
+
+    if usuario.is_authenticated:
+        inscricao_usuario = await Inscricao.objects.filter(
+            evento=evento,
+            participante=usuario
+        ).afirst()
+
+    context = {
+        'evento': evento,
+        'inscricao_usuario': inscricao_usuario,
+    }
+    return await arender(request, 'eventos/detalhe_evento.html', context)
+
+
+async def lista_noticias(request):
+    """Lista todas as notícias publicadas"""
+    noticias = Noticia.objects.filter(status='publicado').select_related('autor', 'categoria')
+
+    # Notícias em destaque (primeiras 3 notícias)
+    destaque = noticias.order_by('-data_publicacao', '-id')[:3]
+
+    busca = request.GET.get('busca')
+    ordenacao = ['-data_publicacao', '-id']
+    if busca:
+        noticias = pesquisar_noticias(noticias, busca)
+        if suporta_pesquisa(noticias):
+            ordenacao = ['-relevancia', '-data_publicacao', '-id']
+
+    paginador = PaginadorCursor(noticias, ordenacao, 9)
+    cursor = request.GET.get('cursor')
+    page_obj, _, noticias_destaque = await em_paralelo(
+        lambda: paginador.pagina(cursor),
+        lambda: paginador.count,
+        lambda: list(destaque),
+    )
+
+    context = {
+        'page_obj': page_obj,
+        'noticias_destaque': noticias_destaque,
+        'busca': busca,
+        'parametros': parametros_sem_cursor(request),
+    }
+    return await arender(request, 'eventos/lista_noticias.html', context)
+
+
+async def detalhe_noticia(request, noticia_id):
+    """Detalhes de uma notícia específica"""
+    noticia = await aget_object_or_404(
+        Noticia.objects.select_related('autor', 'categoria'), id=noticia_id, status='publicado'
+    )
+
+    # Visualizações acumuladas no cache e gravadas em lote (a sessão é síncrona)
+    await sync_to_async(registrar_visualizacao)(request, noticia)
+    noticia.visualizacoes += await sync_to_async(visualizacoes_pendentes)(noticia.id)
+
+    # Notícias relacionadas
+    noticias_relacionadas = [
+        relacionada async for relacionada in Noticia.objects.filter(
+            status='publicado',
+            categoria=noticia.categoria_id
+        ).exclude(id=noticia.id).order_by('-data_publicacao')[:3]
+    ]
+
+    context = {
+        'noticia': noticia,
+        'noticias_relacionadas': noticias_relacionadas,
+    }
+    return await arender(request, 'eventos/detalhe_noticia.html', context)
@@ -0,0 +1,180 @@
+"""
+Contagem de visualizações de notícias com escrita adiada
+
+Cada visualização incrementa um contador no cache em vez de fazer um UPDATE
+no pedido. ``gravar_visualizacoes`` transfere os contadores acumulados para a
+base de dados em lote com ``F('visualizacoes') + n``, chamado por uma thread
+em segundo plano (VISUALIZACOES_INTERVALO) ou pelo comando
+``gravar_visualizacoes``. Cada processo guarda os ids das notícias que viu
+desde a última gravação e a thread só consulta esses. Os contadores vivem só
+no cache partilhado (sem a camada local de ``shalom_project.cache``) e um
+bloqueio garante que apenas um processo grava de cada vez.
+"""
+import atexit
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+
+from shalom_project.cache import bloqueio, partilhado
+
+from .models import Noticia
+
+
+logger = logging.getLogger(__name__)
+
+PREFIXO_CONTADOR = 'noticias:visualizacoes:'
+PREFIXO_VISTA = 'noticias:vista:'
+
+# Notícias consultadas por get_many em cada passagem da gravação
+LOTE_GRAVACAO = 500
+
+_thread_gravacao = None
+_lock_thread = threading.Lock()
+
+# Notícias com visualizações registadas por este processo e ainda não gravadas
+_pendentes = set()
+_lock_pendentes = threading.Lock()
+
+
+def _chave(noticia_id):
+    return f'{PREFIXO_CONTADOR}{noticia_id}'
+
+
+def _identificador_visitante(request):
+    """Sessão, se existir; senão um hash de IP e user agent (sem criar sessão)"""
+    sessao = getattr(request, 'session', None)
+    if sessao is not None and sessao.session_key:
+        return sessao.session_key
+    origem = f"{request.META.get('REMOTE_ADDR', '')}|{request.META.get('HTTP_USER_AGENT', '')}"
+    return hashlib.sha1(origem.encode()).hexdigest()
+
+
+def registrar_visualizacao(request, noticia):
+    """Conta uma visualização no cache; nenhuma escrita na base de dados"""
+    if settings.VISUALIZACOES_DEDUP_SESSAO:
+        chave_vista = f'{PREFIXO_VISTA}{_identificador_visitante(request)}:{noticia.pk}'
+        if not partilhado().add(chave_vista, 1, timeout=settings.VISUALIZACOES_DEDUP_TTL):
+            return False
+
+    chave = _chave(noticia.pk)
+    cache = partilhado()
+    try:
+        cache.incr(chave)
+    except ValueError:
+        # Primeiro acesso desde a última gravação; add() evita perder uma corrida
+        if not cache.add(chave, 1, timeout=None):
+            cache.incr(chave)
+
+    with _lock_pendentes:
+        _pendentes.add(noticia.pk)
+    _iniciar_thread_gravacao()
+    return True
+
+
+def visualizacoes_pendentes(noticia_id):
+    """Visualizações ainda não gravadas na base de dados"""
+    return partilhado().get(_chave(noticia_id), 0)
+
+
+def gravar_visualizacoes(todas=False):
+    """
+    Transfere os contadores pendentes para a base de dados
+
+    Por omissão, só as notícias vistas neste processo desde a última
+    gravação. Com ``todas``, percorre a tabela inteira e apanha também os
+    contadores de processos que já terminaram (comando gravar_visualizacoes).
+
+    Agrupa as notícias pelo incremento, fazendo um UPDATE por valor distinto.
+    O contador no cache é decrementado (não apagado) depois do commit, para
+    não perder visualizações registadas durante a gravação. Se outro processo
+    já estiver a gravar, não faz nada e as notícias pendentes ficam para a
+    próxima vez.
+    """
+    global _pendentes
+    with bloqueio('gravar_visualizacoes', timeout=300) as obtido:
+        if not obtido:
+            return 0
+        if todas:
+            return _gravar(partilhado(), list(Noticia.objects.values_list('id', flat=True)))
+
+        with _lock_pendentes:
+            ids, _pendentes = _pendentes, set()
+        try:
+            return _gravar(partilhado(), sorted(ids))
+        except Exception:
+            with _lock_pendentes:
+                _pendentes |= ids
+            raise
+
+
+def _gravar(cache, ids):
+    total = 0
+
+    for inicio in range(0, len(ids), LOTE_GRAVACAO):
+        lote = ids[inicio:inicio + LOTE_GRAVACAO]
+        pendentes = cache.get_many([_chave(noticia_id) for noticia_id in lote])
+
+        por_incremento = {}
+        for chave, quantidade in pendentes.items():
+            if quantidade:
+                noticia_id = int(chave[len(PREFIXO_CONTADOR):])
+                por_incremento.setdefault(quantidade, []).append(noticia_id)
+        if not por_incremento:
+            continue
+
+        with transaction.atomic():
+            for quantidade, noticias_ids in por_incremento.items():
+                Noticia.objects.filter(pk__in=noticias_ids).update(
+                    visualizacoes=F('visualizacoes') + quantidade
+                )
+                total += quantidade * len(noticias_ids)
+            # Só depois do commit: com CACHE_URL db://, um decr feito dentro da
+            # transação seria desfeito com ela
+            transaction.on_commit(lambda incrementos=por_incremento: _descontar(cache, incrementos))
+
+    return total
+
+
+def _descontar(cache, por_incremento):
+    """Retira dos contadores o que já foi gravado na base de dados"""
+    for quantidade, noticias_ids in por_incremento.items():
+        for noticia_id in noticias_ids:
+            cache.decr(_chave(noticia_id), quantidade)
+
+
+def _ciclo_gravacao(intervalo):
+    while True:
+        time.sleep(intervalo)
+        try:
+            gravar_visualizacoes()
+        except Exception:
+            logger.exception('Falha ao gravar visualizações de notícias')
+        finally:
+            close_old_connections()
+
+
+def _gravar_ao_sair():
+    try:
+        gravar_visualizacoes()
+    except Exception:
+        logger.exception('Falha ao gravar visualizações de notícias ao encerrar')
+
+
+def _iniciar_thread_gravacao():
+    """Inicia (uma vez por processo, já depois do fork) a thread de gravação"""
+    global _thread_gravacao
+    intervalo = settings.VISUALIZACOES_INTERVALO
+    if not intervalo or _thread_gravacao is not None:
+        return
+    with _lock_thread:
+        if _thread_gravacao is None:
+            _thread_gravacao = threading.Thread(
+                target=_ciclo_gravacao, args=(intervalo,), name='gravar-visualizacoes', daemon=True
+            )
+            _thread_gravacao.start()
+            atexit.register(_gravar_ao_sair)
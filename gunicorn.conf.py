@@ -0,0 +1,121 @@
+"""
+Configuração do gunicorn (lida automaticamente a partir da raiz do projeto)
+
+Todas as opções vêm de variáveis de ambiente, com valores por omissão para um
+container pequeno:
+
+    GUNICORN_WORKERS        processos (omissão: 2 x CPUs + 1, até GUNICORN_MAX_WORKERS)
+    GUNICORN_WORKER_CLASS   gthread (omissão), sync ou uvicorn.workers.UvicornWorker
+    GUNICORN_THREADS        threads por processo com gthread (omissão: 4)
+    GUNICORN_PRELOAD        carregar o Django antes do fork (omissão: true)
+    GUNICORN_MAX_REQUESTS   reciclar cada worker após N pedidos, com jitter
+
+Com gthread, um envio SMTP ou uma consulta lenta ocupa uma thread e não o
+processo inteiro. O preload partilha a memória do código entre workers
+(copy-on-write) e faz o arranque falhar cedo se a aplicação não importar.
+
+Comparação de modos de worker: arrancar o gunicorn com cada
+GUNICORN_WORKER_CLASS e, noutro terminal, correr
+
+    python manage.py benchmark_http --url / --url /eventos/ --url /api/eventos/ --url /api/v1/eventos/
+
+com a mesma concorrência. O comando mostra pedidos/s e latências p50/p95/p99
+por URL; correr contra a base de dados de produção (ou uma cópia), já que os
+resultados dependem sobretudo das consultas.
+
+Medição de referência (1 CPU, 2 workers, 16 clientes durante 10 s por URL,
+PostgreSQL local por socket Unix, cache db://, DEBUG=False,
+GUNICORN_MAX_REQUESTS=0; pedidos/s e p50/p99 em ms):
+
+    URL                 sync (1 thread)      gthread (4 threads)  uvicorn (ASGI=true)
+    /                   600   26 / 58        677   23 / 74        287   77 / 151
+    /eventos/           596   26 / 53        680   22 / 45        289   72 / 152
+    /api/eventos/       398   40 / 46        491   38 / 50        139  126 / 257
+    /api/v1/eventos/    322   49 / 63        352   45 / 71        122  142 / 264
+
+Sem DB_POOL (o pool exige psycopg 3), o ASGI abre uma ligação nova à base de
+dados em cada pedido (DB_CONN_MAX_AGE=0) e passa cada consulta por
+sync_to_async, o que explica o débito a menos de metade. Só compensa com o
+pool ativo e quando os pedidos esperam por I/O externo; o padrão continua a
+ser gthread.
+"""
+import multiprocessing
+import os
+import time
+
+
+def _inteiro(nome, omissao):
+    return int(os.getenv(nome, omissao))
+
+
+def _booleano(nome, omissao):
+    return os.getenv(nome, omissao).lower() == 'true'
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+workers = _inteiro(
+    'GUNICORN_WORKERS',
+    min(multiprocessing.cpu_count() * 2 + 1, _inteiro('GUNICORN_MAX_WORKERS', '8')),
+)
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = _inteiro('GUNICORN_THREADS', '4')
+preload_app = _booleano('GUNICORN_PRELOAD', 'true')
+
+# Reciclagem: limita fugas de memória; o jitter evita que todos reiniciem juntos
+max_requests = _inteiro('GUNICORN_MAX_REQUESTS', '1000')
+max_requests_jitter = _inteiro('GUNICORN_MAX_REQUESTS_JITTER', '100')
+
+timeout = _inteiro('GUNICORN_TIMEOUT', '30')
+graceful_timeout = _inteiro('GUNICORN_GRACEFUL_TIMEOUT', '30')
+# Atrás do proxy do Railway as ligações são reutilizadas
+keepalive = _inteiro('GUNICORN_KEEPALIVE', '5')
+
+accesslog = os.getenv('GUNICORN_ACCESSLOG', '-')
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOGLEVEL', 'info')
+
+
+def when_ready(server):
+    inicio = os.getenv('SHALOM_BOOT_INICIO')
+    if inicio:
+        decorrido = (time.time_ns() - int(inicio)) / 1e6
+        server.log.info('Arranque completo em %.0f ms (%s workers %s)', decorrido, workers, worker_class)
+
+
+def pre_fork(server, worker):
+    # Ligações abertas durante o preload não podem ser partilhadas pelos workers
+    if not server.cfg.preload_app:
+        return
+    from django.db import connections
+    connections.close_all()
+    # As threads do pool de ligações (DB_POOL) não atravessam o fork
+    for conexao in connections.all(initialized_only=True):
+        if conexao.settings_dict.get('OPTIONS', {}).get('pool'):
+            conexao.close_pool()
+
+
+def post_fork(server, worker):
+    # Garantia: nenhum worker começa com uma ligação herdada do master. Só
+    # descarta a referência: fechar enviaria o término pelo socket partilhado
+    if not server.cfg.preload_app:
+        return
+    from django.db import connections
+    for conexao in connections.all(initialized_only=True):
+        conexao.connection = None
+        conexao.close_at = None
+
+
+def worker_exit(server, worker):
+    from shalom_project.cache import estatisticas
+    server.log.info('Cache do worker %s: %s', worker.pid, estatisticas())
+
+    # Os contadores estão no cache partilhado e sobrevivem a este processo;
+    # aqui só se gravam já os ids de notícias que este worker marcou como
+    # pendentes (_pendentes), que de outro modo esperariam por
+    # gravar_visualizacoes(todas=True)
+    try:
+        from eventos.visualizacoes import gravar_visualizacoes
+        gravar_visualizacoes()
+    except Exception as erro:
+        server.log.warning('Não foi possível gravar visualizações ao sair: %s', erro)
@@ -0,0 +1,13 @@
+#!/bin/bash
+set -e
+
+# Passo de release para Railway (preDeployCommand em railway.json; release no
+# Procfile): corre uma vez por deploy, antes de os containers novos arrancarem
+echo "🗄️ Aplicando migrações..."
+python manage.py migrate --noinput
+
+# Tabela do cache partilhado (CACHE_URL db://, o padrão); não faz nada se já existir
+echo "🗃️ Criando tabela de cache..."
+python manage.py createcachetable
+
+echo "✅ Release concluído com sucesso!"
@@ -0,0 +1,465 @@
+"""
+Cache em duas camadas: LRU por processo à frente de um cache partilhado
+
+``CacheDuasCamadas`` é o backend ``default``. Cada leitura tenta primeiro a
+camada local (dicionário em memória, sem rede) e só depois o cache
+partilhado entre workers e réplicas (Redis, Memcached ou a base de dados com
+``CacheBaseDados``, ver CACHE_URL). A camada local guarda cada entrada no máximo
+LOCAL_TIMEOUT segundos: uma alteração feita noutro processo é vista com esse
+atraso. Dados que precisam de ser exatos entre processos (contadores,
+bloqueios) usam ``partilhado()`` diretamente.
+
+Com CACHE_URL db:// (o padrão sem Redis), o cache partilhado é uma tabela da
+base de dados: correto, mas cada falha da camada local é uma consulta. Os
+ganhos das sessões cached_db e do BackendUsuarioCache só existem com Redis
+ou Memcached.
+
+API para views e modelos:
+
+    obter_ou_calcular(chave, calcular, timeout)   leitura com proteção contra stampede
+    versao_namespace(nome) / invalidar_namespace(nome)   chaves versionadas por geração
+    bloqueio(nome, timeout)   exclusão mútua entre processos
+    estatisticas()   acertos e falhas deste processo
+"""
+import asyncio
+import base64
+import math
+import pickle
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.db import DatabaseCache
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+
+# Tempo (fração do cálculo) com que o recálculo antecipado é favorecido; 1 é
+# o valor sugerido pelo algoritmo XFetch
+BETA = 1.0
+ESPERA_BLOQUEIO = 0.05
+
+_metricas = {
+    'local': 0,
+    'partilhado': 0,
+    'falhas': 0,
+    'recalculos': 0,
+    'recalculos_antecipados': 0,
+    'esperas': 0,
+}
+_lock_metricas = threading.Lock()
+_medicao = ContextVar('medicao_cache', default=None)
+
+
+def _contar(nome, quantidade=1):
+    with _lock_metricas:
+        _metricas[nome] += quantidade
+    medicao = _medicao.get()
+    if medicao is not None:
+        medicao[nome] = medicao.get(nome, 0) + quantidade
+
+
+def estatisticas():
+    """Contadores deste processo desde o arranque, com a taxa de acerto"""
+    with _lock_metricas:
+        dados = dict(_metricas)
+    leituras = dados['local'] + dados['partilhado'] + dados['falhas']
+    dados['taxa_acerto'] = round((dados['local'] + dados['partilhado']) / leituras, 3) if leituras else None
+    return dados
+
+
+def iniciar_medicao():
+    """Começa a contagem de acessos ao cache do pedido atual e retorna-a"""
+    medicao = {}
+    _medicao.set(medicao)
+    return medicao
+
+
+class _LRU:
+    """Dicionário limitado em número de entradas, com expiração por entrada"""
+
+    def __init__(self, maximo):
+        self.maximo = maximo
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chave):
+        with self._lock:
+            entrada = self._dados.get(chave)
+            if entrada is None:
+                return None
+            expira, valor = entrada
+            if expira <= time.monotonic():
+                del self._dados[chave]
+                return None
+            self._dados.move_to_end(chave)
+            return valor
+
+    def set(self, chave, valor, segundos):
+        with self._lock:
+            self._dados[chave] = (time.monotonic() + segundos, valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.maximo:
+                self._dados.popitem(last=False)
+
+    def delete(self, chave):
+        with self._lock:
+            self._dados.pop(chave, None)
+
+    def clear(self):
+        with self._lock:
+            self._dados.clear()
+
+
+# O Django cria uma instância do backend por thread (e por pedido em ASGI); a
+# camada local é partilhada pelo processo, como o LocMemCache faz
+_camadas_locais = {}
+_lock_camadas = threading.Lock()
+
+
+class CacheDuasCamadas(BaseCache):
+    """
+    Backend de cache: camada local (LRU) à frente do alias OPTIONS['PARTILHADO']
+
+    OPTIONS:
+        PARTILHADO       alias do cache partilhado (omissão: 'partilhado')
+        LOCAL_ENTRADAS   máximo de entradas na camada local
+        LOCAL_TIMEOUT    segundos máximos de uma entrada na camada local (0 desativa)
+
+    Chaves e versões são passadas ao cache partilhado sem alteração; a camada
+    local usa a chave final (com prefixo e versão).
+    """
+
+    def __init__(self, location, params):
+        opcoes = dict(params.get('OPTIONS') or {})
+        self._alias = opcoes.pop('PARTILHADO', 'partilhado')
+        self._local_timeout = opcoes.pop('LOCAL_TIMEOUT', 5)
+        entradas = opcoes.pop('LOCAL_ENTRADAS', 1000)
+        with _lock_camadas:
+            self._local = _camadas_locais.setdefault(location or self._alias, _LRU(entradas))
+        super().__init__({**params, 'OPTIONS': opcoes})
+
+    @property
+    def partilhado(self):
+        return caches[self._alias]
+
+    def _guardar_local(self, chave, valor, timeout=DEFAULT_TIMEOUT):
+        segundos = self._local_timeout
+        if timeout is not DEFAULT_TIMEOUT and timeout is not None:
+            segundos = min(segundos, timeout)
+        if segundos > 0:
+            # Serializado, como no LocMemCache: quem lê não altera o valor guardado
+            self._local.set(chave, pickle.dumps(valor, pickle.HIGHEST_PROTOCOL), segundos)
+        else:
+            self._local.delete(chave)
+
+    def get(self, key, default=None, version=None):
+        chave = self.make_and_validate_key(key, version=version)
+        serializado = self._local.get(chave)
+        if serializado is not None:
+            _contar('local')
+            return pickle.loads(serializado)
+
+        ausente = object()
+        valor = self.partilhado.get(key, ausente, version=version)
+        if valor is ausente:
+            _contar('falhas')
+            return default
+        _contar('partilhado')
+        self._guardar_local(chave, valor)
+        return valor
+
+    def get_many(self, keys, version=None):
+        resultado = {}
+        restantes = []
+        for key in keys:
+            serializado = self._local.get(self.make_and_validate_key(key, version=version))
+            if serializado is None:
+                restantes.append(key)
+            else:
+                resultado[key] = pickle.loads(serializado)
+        _contar('local', len(resultado))
+
+        if restantes:
+            encontrados = self.partilhado.get_many(restantes, version=version)
+            _contar('partilhado', len(encontrados))
+            _contar('falhas', len(restantes) - len(encontrados))
+            for key, valor in encontrados.items():
+                self._guardar_local(self.make_key(key, version=version), valor)
+            resultado.update(encontrados)
+        return resultado
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        chave = self.make_and_validate_key(key, version=version)
+        self.partilhado.set(key, value, timeout, version=version)
+        self._guardar_local(chave, value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        chave = self.make_and_validate_key(key, version=version)
+        adicionado = self.partilhado.add(key, value, timeout, version=version)
+        if adicionado:
+            self._guardar_local(chave, value, timeout)
+        else:
+            self._local.delete(chave)
+        return adicionado
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        falhas = self.partilhado.set_many(data, timeout, version=version)
+        for key, value in data.items():
+            if key not in falhas:
+                self._guardar_local(self.make_key(key, version=version), value, timeout)
+        return falhas
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._local.delete(self.make_and_validate_key(key, version=version))
+        return self.partilhado.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._local.delete(self.make_and_validate_key(key, version=version))
+        return self.partilhado.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._local.delete(self.make_and_validate_key(key, version=version))
+        self.partilhado.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        if self._local.get(self.make_and_validate_key(key, version=version)) is not None:
+            return True
+        return self.partilhado.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        # Contadores vivem só no cache partilhado: a cópia local ficaria desatualizada
+        self._local.delete(self.make_and_validate_key(key, version=version))
+        return self.partilhado.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        return self.incr(key, -delta, version=version)
+
+    def clear(self):
+        self._local.clear()
+        self.partilhado.clear()
+
+    def close(self, **kwargs):
+        self.partilhado.close(**kwargs)
+
+
+class CacheBaseDados(DatabaseCache):
+    """
+    DatabaseCache com add e incr atómicos entre processos
+
+    No DatabaseCache, incr é get + set e add sobre uma entrada expirada é um
+    UPDATE sem bloqueio: dois processos podem ambos ganhar. Aqui, add apaga
+    primeiro a entrada expirada, ficando a exclusão a cargo da chave primária
+    no INSERT, e incr altera o valor com a linha bloqueada (SELECT ... FOR
+    UPDATE). Os bloqueios e contadores de ``partilhado()`` dependem disto.
+
+    Acima de MAX_ENTRIES só as entradas expiradas são apagadas: o
+    DatabaseCache apagaria também um terço das vivas, por ordem de chave,
+    levando bloqueios, contadores, gerações e sessões.
+    """
+
+    def _cull(self, db, cursor, now, num):
+        connection = connections[db]
+        cursor.execute(
+            f'DELETE FROM {connection.ops.quote_name(self._table)} '
+            f'WHERE {connection.ops.quote_name("expires")} < %s',
+            [connection.ops.adapt_datetimefield_value(now)],
+        )
+
+    def _sql(self):
+        db = router.db_for_write(self.cache_model_class)
+        connection = connections[db]
+        return db, connection, connection.ops.quote_name, connection.ops.quote_name(self._table)
+
+    def _agora(self, connection):
+        return connection.ops.adapt_datetimefield_value(timezone.now().replace(microsecond=0))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        db, connection, quote_name, tabela = self._sql()
+        chave = self.make_and_validate_key(key, version=version)
+        with transaction.atomic(using=db), connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {tabela} WHERE {quote_name("cache_key")} = %s AND {quote_name("expires")} < %s',
+                [chave, self._agora(connection)],
+            )
+        return super().add(key, value, timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        db, connection, quote_name, tabela = self._sql()
+        chave = self.make_and_validate_key(key, version=version)
+        bloquear = ' FOR UPDATE' if connection.features.has_select_for_update else ''
+        with transaction.atomic(using=db), connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT {quote_name("value")} FROM {tabela} '
+                f'WHERE {quote_name("cache_key")} = %s AND {quote_name("expires")} >= %s{bloquear}',
+                [chave, self._agora(connection)],
+            )
+            linha = cursor.fetchone()
+            if linha is None:
+                raise ValueError(f"Key '{key}' not found.")
+            valor = pickle.loads(base64.b64decode(linha[0].encode())) + delta
+            cursor.execute(
+                f'UPDATE {tabela} SET {quote_name("value")} = %s WHERE {quote_name("cache_key")} = %s',
+                [base64.b64encode(pickle.dumps(valor, self.pickle_protocol)).decode('latin1'), chave],
+            )
+        return valor
+
+
+def partilhado():
+    """O cache partilhado entre processos (sem a camada local)"""
+    return getattr(cache, 'partilhado', cache)
+
+
+def _chave_namespace(nome):
+    return f'namespace:{nome}'
+
+
+def versao_namespace(nome):
+    """
+    Versão atual de um grupo de chaves; incluí-la nas chaves permite
+    invalidar o grupo inteiro com ``invalidar_namespace``
+
+    Lida através da camada local, como as chaves que versiona: uma
+    invalidação vale logo no processo que a fez e nos outros em até
+    LOCAL_TIMEOUT segundos, sem ir ao cache partilhado em cada pedido.
+    """
+    chave = _chave_namespace(nome)
+    versao = cache.get(chave)
+    if versao is None:
+        # add() não sobrescreve uma versão criada em paralelo por outro worker
+        partilhado().add(chave, 1, timeout=None)
+        versao = cache.get(chave, 1)
+    return versao
+
+
+def invalidar_namespace(nome):
+    """Avança a versão do grupo; as chaves antigas expiram sozinhas"""
+    chave = _chave_namespace(nome)
+    try:
+        # O incr do CacheDuasCamadas descarta também a cópia local
+        cache.incr(chave)
+    except ValueError:
+        # Chave ausente (cache reiniciado): qualquer valor novo já invalida
+        cache.set(chave, int(timezone.now().timestamp()), timeout=None)
+
+
+@contextmanager
+def bloqueio(nome, timeout=60):
+    """
+    Tenta obter um bloqueio partilhado entre processos; produz True se o
+    obteve. Expira após ``timeout`` segundos se o dono morrer
+    """
+    alvo = partilhado()
+    chave = f'bloqueio:{nome}'
+    obtido = alvo.add(chave, 1, timeout=timeout)
+    try:
+        yield obtido
+    finally:
+        if obtido:
+            alvo.delete(chave)
+
+
+def _timeout(timeout, valor):
+    return timeout(valor) if callable(timeout) else timeout
+
+
+def _envelope(valor, timeout, duracao):
+    _contar('recalculos')
+    return {'valor': valor, 'expira': time.time() + timeout, 'duracao': duracao}
+
+
+def _avaliar(envelope):
+    """
+    Retorna 'valido', 'antecipar' ou 'ausente'
+
+    Recálculo antecipado probabilístico (XFetch): perto do fim do TTL, e tanto
+    mais cedo quanto mais caro o cálculo, um pedido recalcula antes de a
+    entrada expirar para todos. Uma entrada já expirada (vinda da camada
+    local) conta como ausente.
+    """
+    if envelope is None:
+        return 'ausente'
+    agora = time.time()
+    if agora >= envelope['expira']:
+        return 'ausente'
+    antecipacao = -envelope['duracao'] * BETA * math.log(1 - random.random())
+    return 'antecipar' if agora + antecipacao >= envelope['expira'] else 'valido'
+
+
+def obter_ou_calcular(chave, calcular, timeout, espera=5):
+    """
+    Retorna o valor de ``chave``, chamando ``calcular()`` e guardando o
+    resultado quando não existe ou está prestes a expirar
+
+    ``timeout`` pode ser uma função que recebe o valor calculado. Numa falha,
+    só um processo calcula; os outros aguardam até ``espera`` segundos pelo
+    resultado antes de calcular também.
+    """
+    envelope = cache.get(chave)
+    estado = _avaliar(envelope)
+    if estado == 'valido':
+        return envelope['valor']
+    if estado == 'antecipar':
+        _contar('recalculos_antecipados')
+        return _calcular_e_guardar(chave, calcular, timeout)
+
+    with bloqueio(f'calcular:{chave}', timeout=espera) as obtido:
+        if not obtido:
+            _contar('esperas')
+            limite = time.monotonic() + espera
+            while time.monotonic() < limite:
+                time.sleep(ESPERA_BLOQUEIO)
+                envelope = partilhado().get(chave)
+                if _avaliar(envelope) != 'ausente':
+                    return envelope['valor']
+        return _calcular_e_guardar(chave, calcular, timeout)
+
+
+def _calcular_e_guardar(chave, calcular, timeout):
+    inicio = time.perf_counter()
+    valor = calcular()
+    segundos = _timeout(timeout, valor)
+    cache.set(chave, _envelope(valor, segundos, time.perf_counter() - inicio), segundos)
+    return valor
+
+
+async def aobter_ou_calcular(chave, acalcular, timeout, espera=5):
+    """Versão assíncrona de ``obter_ou_calcular``; ``acalcular`` é uma corrotina"""
+    envelope = await cache.aget(chave)
+    estado = _avaliar(envelope)
+    if estado == 'valido':
+        return envelope['valor']
+    if estado == 'antecipar':
+        _contar('recalculos_antecipados')
+        return await _acalcular_e_guardar(chave, acalcular, timeout)
+
+    alvo = partilhado()
+    chave_bloqueio = f'bloqueio:calcular:{chave}'
+    obtido = await alvo.aadd(chave_bloqueio, 1, timeout=espera)
+    try:
+        if not obtido:
+            _contar('esperas')
+            limite = time.monotonic() + espera
+            while time.monotonic() < limite:
+                await asyncio.sleep(ESPERA_BLOQUEIO)
+                envelope = await alvo.aget(chave)
+                if _avaliar(envelope) != 'ausente':
+                    return envelope['valor']
+        return await _acalcular_e_guardar(chave, acalcular, timeout)
+    finally:
+        if obtido:
+            await alvo.adelete(chave_bloqueio)
+
+
+async def _acalcular_e_guardar(chave, acalcular, timeout):
+    inicio = time.perf_counter()
+    valor = await acalcular()
+    segundos = _timeout(timeout, valor)
+    await cache.aset(chave, _envelope(valor, segundos, time.perf_counter() - inicio), segundos)
+    return valor
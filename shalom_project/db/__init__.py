@@ -0,0 +1,54 @@
+"""
+Backend PostgreSQL com medição do custo de ligação (ENGINE = 'shalom_project.db')
+
+Cada abertura de ligação (TCP + TLS + autenticação, ou a retirada do pool) e
+cada verificação de saúde feita durante um pedido é somada numa medição por
+pedido; ``shalom_project.middleware.tempo_conexao`` devolve o total no
+cabeçalho ``Server-Timing``.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+# Propagada às threads de sync_to_async, então as consultas em paralelo das
+# views assíncronas também contam
+_medicao = ContextVar('medicao_conexoes', default=None)
+
+
+class MedicaoConexoes:
+    """Tempo gasto a abrir e a verificar ligações durante um pedido"""
+
+    def __init__(self):
+        self.aberturas = 0
+        self.abertura = 0.0
+        self.verificacoes = 0
+        self.verificacao = 0.0
+
+    def registrar(self, tipo, segundos):
+        if tipo == 'abertura':
+            self.aberturas += 1
+            self.abertura += segundos
+        else:
+            self.verificacoes += 1
+            self.verificacao += segundos
+
+
+def iniciar_medicao():
+    """Começa uma medição para o pedido atual e retorna-a"""
+    medicao = MedicaoConexoes()
+    _medicao.set(medicao)
+    return medicao
+
+
+@contextmanager
+def medir(tipo):
+    medicao = _medicao.get()
+    if medicao is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        medicao.registrar(tipo, time.perf_counter() - inicio)
@@ -0,0 +1,15 @@
+from django.db.backends.postgresql.base import DatabaseWrapper as PostgresDatabaseWrapper
+
+from . import medir
+
+
+class DatabaseWrapper(PostgresDatabaseWrapper):
+    def connect(self):
+        with medir('abertura'):
+            super().connect()
+
+    def close_if_health_check_failed(self):
+        if self.connection is None or not self.health_check_enabled or self.health_check_done:
+            return
+        with medir('verificacao'):
+            super().close_if_health_check_failed()
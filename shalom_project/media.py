@@ -0,0 +1,152 @@
+"""
+Serviço de ficheiros de media em produção
+
+Equivalente, para os uploads, ao que o WhiteNoise faz para os estáticos:
+``ETag``/``Last-Modified`` com respostas 304, pedidos ``Range`` (206/416) e
+``Cache-Control: immutable`` para nomes com hash do conteúdo (ver
+``shalom_project.storage``). Com MEDIA_OFFLOAD o Django só valida o pedido e
+delega a transferência ao servidor web (``X-Accel-Redirect`` no nginx,
+``X-Sendfile`` no Apache/lighttpd).
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+from .storage import tem_hash
+
+
+CHUNK_SIZE = 64 * 1024
+INTERVALO = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _caminho(caminho):
+    try:
+        absoluto = safe_join(settings.MEDIA_ROOT, caminho)
+    except SuspiciousFileOperation:
+        raise Http404('Ficheiro não encontrado')
+    if not os.path.isfile(absoluto):
+        raise Http404('Ficheiro não encontrado')
+    return absoluto
+
+
+def _intervalo(cabecalho, tamanho):
+    """
+    Interpreta um cabeçalho Range de um único intervalo
+
+    Retorna (inicio, fim) inclusivo, None para ignorar o cabeçalho (servir o
+    ficheiro todo) ou False se o intervalo não for satisfazível.
+    """
+    correspondencia = INTERVALO.match(cabecalho.strip())
+    if not correspondencia:
+        # Vários intervalos ou unidade desconhecida: responder com o ficheiro inteiro é válido
+        return None
+    inicio, fim = correspondencia.groups()
+    if not inicio and not fim:
+        return None
+    if not inicio:
+        # bytes=-500: os últimos 500 bytes
+        sufixo = int(fim)
+        if sufixo == 0:
+            return False
+        return max(0, tamanho - sufixo), tamanho - 1
+    inicio = int(inicio)
+    fim = min(int(fim), tamanho - 1) if fim else tamanho - 1
+    if inicio >= tamanho or fim < inicio:
+        return False
+    return inicio, fim
+
+
+def _ler(caminho, inicio, quantidade):
+    with open(caminho, 'rb') as arquivo:
+        arquivo.seek(inicio)
+        while quantidade > 0:
+            bloco = arquivo.read(min(CHUNK_SIZE, quantidade))
+            if not bloco:
+                return
+            quantidade -= len(bloco)
+            yield bloco
+
+
+def _cache_control(caminho):
+    if tem_hash(caminho):
+        return f'public, max-age={settings.MEDIA_CACHE_MAX_AGE_HASH}, immutable'
+    return f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}'
+
+
+def _offload(caminho, absoluto):
+    resposta = HttpResponse()
+    # O servidor web define o Content-Type e trata do Range
+    del resposta['Content-Type']
+    if settings.MEDIA_OFFLOAD == 'x-accel-redirect':
+        resposta['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIXO + caminho
+    else:
+        resposta['X-Sendfile'] = absoluto
+    return resposta
+
+
+@require_safe
+def servir_media(request, caminho):
+    """Serve um ficheiro de MEDIA_ROOT com cabeçalhos de cache e suporte a Range"""
+    absoluto = _caminho(caminho)
+    estado = os.stat(absoluto)
+    etag = quote_etag(f'{int(estado.st_mtime):x}-{estado.st_size:x}')
+    ultima_modificacao = int(estado.st_mtime)
+
+    cabecalhos = {
+        'ETag': etag,
+        'Last-Modified': http_date(ultima_modificacao),
+        'Cache-Control': _cache_control(caminho),
+        'Accept-Ranges': 'bytes',
+    }
+
+    condicional = get_conditional_response(request, etag=etag, last_modified=ultima_modificacao)
+    if condicional is not None:
+        for nome, valor in cabecalhos.items():
+            condicional[nome] = valor
+        return condicional
+
+    if settings.MEDIA_OFFLOAD:
+        resposta = _offload(caminho, absoluto)
+        for nome, valor in cabecalhos.items():
+            resposta[nome] = valor
+        return resposta
+
+    tipo, codificacao = mimetypes.guess_type(absoluto)
+    # .gz/.br são ficheiros comprimidos a descarregar, não Content-Encoding
+    if not tipo or codificacao:
+        tipo = 'application/octet-stream'
+    tamanho = estado.st_size
+
+    intervalo = None
+    cabecalho_range = request.headers.get('Range')
+    # If-Range: só honra o Range se o cliente ainda tiver a mesma versão
+    if cabecalho_range and request.headers.get('If-Range', etag) == etag:
+        intervalo = _intervalo(cabecalho_range, tamanho)
+
+    if intervalo is False:
+        resposta = HttpResponse(status=416)
+        resposta['Content-Range'] = f'bytes */{tamanho}'
+    elif intervalo:
+        inicio, fim = intervalo
+        corpo = _ler(absoluto, inicio, fim - inicio + 1) if request.method == 'GET' else []
+        resposta = StreamingHttpResponse(corpo, status=206, content_type=tipo)
+        resposta['Content-Range'] = f'bytes {inicio}-{fim}/{tamanho}'
+        resposta['Content-Length'] = str(fim - inicio + 1)
+    elif request.method == 'HEAD':
+        resposta = HttpResponse(content_type=tipo)
+        resposta['Content-Length'] = str(tamanho)
+    else:
+        # FileResponse usa wsgi.file_wrapper (sendfile no gunicorn)
+        resposta = FileResponse(open(absoluto, 'rb'), content_type=tipo)
+
+    for nome, valor in cabecalhos.items():
+        resposta[nome] = valor
+    return resposta
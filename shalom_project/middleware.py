@@ -0,0 +1,61 @@
+"""
+Middleware do projeto
+"""
+import logging
+
+from asgiref.sync import iscoroutinefunction
+from django.utils.decorators import sync_and_async_middleware
+
+from . import cache
+from .db import iniciar_medicao
+
+
+logger = logging.getLogger(__name__)
+
+
+def _server_timing(resposta, medicao):
+    resposta['Server-Timing'] = ', '.join(filter(None, [
+        resposta.get('Server-Timing'),
+        f'db-conexao;dur={medicao.abertura * 1000:.1f};desc="{medicao.aberturas} aberta(s)"',
+        f'db-verificacao;dur={medicao.verificacao * 1000:.1f}',
+    ]))
+    if medicao.aberturas:
+        logger.debug('%d ligação(ões) aberta(s) em %.1f ms', medicao.aberturas, medicao.abertura * 1000)
+    return resposta
+
+
+@sync_and_async_middleware
+def tempo_conexao(get_response):
+    """Expõe no cabeçalho Server-Timing o tempo gasto a abrir ligações à base de dados"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            medicao = iniciar_medicao()
+            return _server_timing(await get_response(request), medicao)
+    else:
+        def middleware(request):
+            medicao = iniciar_medicao()
+            return _server_timing(get_response(request), medicao)
+    return middleware
+
+
+def _metricas_cache(resposta, medicao):
+    if medicao:
+        descricao = ' '.join(f'{nome}={quantidade}' for nome, quantidade in sorted(medicao.items()))
+        resposta['Server-Timing'] = ', '.join(filter(None, [
+            resposta.get('Server-Timing'), f'cache;desc="{descricao}"',
+        ]))
+    return resposta
+
+
+@sync_and_async_middleware
+def metricas_cache(get_response):
+    """Expõe no cabeçalho Server-Timing os acertos e falhas de cache do pedido"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            medicao = cache.iniciar_medicao()
+            return _metricas_cache(await get_response(request), medicao)
+    else:
+        def middleware(request):
+            medicao = cache.iniciar_medicao()
+            return _metricas_cache(get_response(request), medicao)
+    return middleware
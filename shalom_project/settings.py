@@ -11,6 +11,8 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
 from pathlib import Path
+from urllib.parse import urlsplit
+from django.core.exceptions import ImproperlyConfigured
 import os
 from dotenv import load_dotenv
 import dj_database_url
@@ -53,11 +55,14 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'eventos',
 ]
 
 MIDDLEWARE = [
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Para servir arquivos estáticos
+    'shalom_project.middleware.tempo_conexao',  # Server-Timing: abertura de ligações à BD
+    'shalom_project.middleware.metricas_cache',  # Server-Timing: acertos do cache
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -90,6 +95,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'shalom_project.wsgi.application'
 
+# Servidor ASGI (worker uvicorn, ver start.sh): as páginas de leitura e a API
+# antiga passam a usar as views assíncronas de eventos/views_async.py
+ASGI = os.getenv('ASGI', 'False').lower() == 'true'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
@@ -112,6 +121,136 @@ else:
         }
     }
 
+# Ligações persistentes: cada thread reutiliza a sua ligação durante
+# DB_CONN_MAX_AGE segundos (0 fecha no fim de cada pedido; vazio mantém sem
+# limite), verificada com um SELECT 1 no primeiro uso de cada pedido. Em ASGI
+# as threads não são reaproveitadas entre pedidos, então o padrão é 0 e a
+# reutilização fica a cargo do pool.
+DB_CONN_MAX_AGE = os.getenv('DB_CONN_MAX_AGE', '0' if ASGI else '60')
+DATABASES['default']['CONN_MAX_AGE'] = int(DB_CONN_MAX_AGE) if DB_CONN_MAX_AGE else None
+DATABASES['default']['CONN_HEALTH_CHECKS'] = os.getenv('DB_CONN_HEALTH_CHECKS', 'True').lower() == 'true'
+
+# Pool de ligações no processo (psycopg 3: pip install "psycopg[binary,pool]"),
+# partilhado pelas threads do worker; substitui as ligações persistentes
+if os.getenv('DB_POOL', 'False').lower() == 'true':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+        'min_size': int(os.getenv('DB_POOL_MIN', '1')),
+        'max_size': int(os.getenv('DB_POOL_MAX', os.getenv('GUNICORN_THREADS', '4'))),
+        'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+    }
+
+# PgBouncer em modo transaction: cursores do lado do servidor (.iterator())
+# não sobrevivem à troca de ligação entre transações. O psycopg 3 já vem sem
+# prepared statements no Django e o psycopg2 não os usa.
+if os.getenv('DB_PGBOUNCER', 'False').lower() == 'true':
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+# Backend com medição do tempo de abertura das ligações (cabeçalho
+# Server-Timing, ver shalom_project/db)
+if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['default']['ENGINE'] = 'shalom_project.db'
+
+
+# Cache em duas camadas (shalom_project/cache.py): um LRU por processo à
+# frente do cache partilhado definido por CACHE_URL (ou REDIS_URL no Railway):
+#   redis://host:6379/0, memcached://host:11211 ou db://tabela (createcachetable).
+# Sem URL, a tabela shalom_cache na base de dados. O cache partilhado guarda
+# bloqueios e contadores (add/incr), que têm de ser atómicos entre processos
+# e réplicas: file:// e locmem:// não o são e só se aceitam com DEBUG. A
+# tabela é correta mas cada acesso ao cache partilhado é uma consulta; em
+# produção com tráfego, use Redis ou Memcached.
+CACHE_URL = os.getenv('CACHE_URL') or os.getenv('REDIS_URL') or 'db://shalom_cache'
+_cache_url = urlsplit(CACHE_URL)
+_CACHE_BACKENDS = {
+    'redis': ('django.core.cache.backends.redis.RedisCache', CACHE_URL),
+    'rediss': ('django.core.cache.backends.redis.RedisCache', CACHE_URL),
+    'memcached': ('django.core.cache.backends.memcached.PyMemcacheCache', _cache_url.netloc),
+    'db': ('shalom_project.cache.CacheBaseDados', _cache_url.netloc or _cache_url.path.lstrip('/')),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', _cache_url.path),
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', _cache_url.netloc),
+}
+if _cache_url.scheme not in _CACHE_BACKENDS:
+    raise ImproperlyConfigured(
+        f'CACHE_URL com esquema desconhecido: {_cache_url.scheme!r} '
+        f'(use {", ".join(sorted(_CACHE_BACKENDS))})'
+    )
+if _cache_url.scheme in ('file', 'locmem') and not DEBUG:
+    raise ImproperlyConfigured(
+        f'CACHE_URL={_cache_url.scheme}:// não tem add/incr atómicos entre processos; '
+        'use redis://, memcached:// ou db://tabela em produção'
+    )
+CACHES = {
+    'default': {
+        'BACKEND': 'shalom_project.cache.CacheDuasCamadas',
+        'OPTIONS': {
+            'PARTILHADO': 'partilhado',
+            'LOCAL_ENTRADAS': int(os.getenv('CACHE_LOCAL_ENTRADAS', '1000')),
+            # Atraso máximo com que um processo vê alterações feitas noutro
+            'LOCAL_TIMEOUT': int(os.getenv('CACHE_LOCAL_TIMEOUT', '5')),
+        },
+    },
+    'partilhado': {
+        'BACKEND': _CACHE_BACKENDS[_cache_url.scheme][0],
+        'LOCATION': _CACHE_BACKENDS[_cache_url.scheme][1],
+        'KEY_PREFIX': os.getenv('CACHE_PREFIXO', 'shalom'),
+        # Incrementar invalida todas as chaves de uma vez (por exemplo, após
+        # mudar o formato dos valores guardados)
+        'VERSION': int(os.getenv('CACHE_VERSAO', '1')),
+    },
+}
+if _cache_url.scheme == 'db':
+    # Acima deste número de linhas, cada escrita apaga as entradas expiradas
+    # (sessões, chaves de deduplicação de visualizações); as vivas ficam
+    CACHES['partilhado']['OPTIONS'] = {'MAX_ENTRIES': int(os.getenv('CACHE_BD_ENTRADAS', '10000'))}
+
+# Sessões: cached_db lê do cache partilhado e só vai à base de dados numa
+# falha; signed_cookies guarda a sessão no próprio cookie (sem estado no
+# servidor, mas não permite terminar sessões no servidor). Usa o cache
+# partilhado direto: com a camada local, um logout demoraria a valer nos
+# outros processos. Com CACHE_URL db:// o cache partilhado é outra tabela da
+# mesma base de dados e cached_db só somaria escritas: o padrão passa a db.
+# O mesmo vale para o BackendUsuarioCache: os ganhos exigem Redis ou Memcached.
+SESSION_ENGINE = 'django.contrib.sessions.backends.' + os.getenv(
+    'SESSION_MODO', 'db' if _cache_url.scheme == 'db' else 'cached_db'
+)
+SESSION_CACHE_ALIAS = 'partilhado'
+
+# O utilizador autenticado (com o perfil) vem do cache; ModelBackend continua
+# listado para as sessões iniciadas antes da troca
+AUTHENTICATION_BACKENDS = [
+    'eventos.autenticacao.BackendUsuarioCache',
+    'django.contrib.auth.backends.ModelBackend',
+]
+AUTH_USUARIO_CACHE_TIMEOUT = int(os.getenv('AUTH_USUARIO_CACHE_TIMEOUT', '3600'))
+
+# Uma inscrição pendente reserva o lugar durante INSCRICAO_RESERVA_HORAS (0 =
+# sem prazo); depois a reserva é libertada pelo comando libertar_reservas ou
+# quando alguém tenta inscrever-se num evento lotado
+INSCRICAO_RESERVA_HORAS = int(os.getenv('INSCRICAO_RESERVA_HORAS', '48'))
+
+# Validade (segundos) da credencial dos leitores de QR code mostrada no admin
+# do evento; a ação "Renovar credencial dos leitores" revoga-as antes disso
+CHECKIN_LEITOR_VALIDADE = int(os.getenv('CHECKIN_LEITOR_VALIDADE', '86400'))
+
+# Cache da página inicial (segundos); encurtado automaticamente até o
+# início do próximo evento em destaque
+HOME_CACHE_TIMEOUT = int(os.getenv('HOME_CACHE_TIMEOUT', '300'))
+
+
+# Visualizações de notícias: acumuladas no cache e gravadas em lote a cada
+# VISUALIZACOES_INTERVALO segundos (0 desativa a thread; use o comando
+# gravar_visualizacoes). Com VISUALIZACOES_DEDUP_SESSAO, cada visitante conta
+# uma vez por notícia dentro de VISUALIZACOES_DEDUP_TTL segundos.
+VISUALIZACOES_INTERVALO = int(os.getenv('VISUALIZACOES_INTERVALO', '60'))
+VISUALIZACOES_DEDUP_SESSAO = os.getenv('VISUALIZACOES_DEDUP_SESSAO', 'False').lower() == 'true'
+VISUALIZACOES_DEDUP_TTL = int(os.getenv('VISUALIZACOES_DEDUP_TTL', '1800'))
+
+# Derivados responsivos de Evento.imagem e Noticia.imagem (eventos/imagens.py)
+IMAGENS_LARGURAS = [int(largura) for largura in os.getenv('IMAGENS_LARGURAS', '320,640,1024,1600').split(',')]
+IMAGENS_THREADS = int(os.getenv('IMAGENS_THREADS', '2'))
+IMAGENS_DERIVADOS_ASSINCRONO = os.getenv('IMAGENS_DERIVADOS_ASSINCRONO', 'True').lower() == 'true'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -153,16 +292,31 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
 
-# Configuração do WhiteNoise para servir arquivos estáticos
-if not DEBUG:
-    STATICFILES_STORAGE = 'whitenoise.storage.CompressedStaticFilesStorage'
-else:
-    STATICFILES_STORAGE = 'whitenoise.storage.CompressedStaticFilesStorage'
+# Storages: media e estáticos com hash do conteúdo no nome. Os estáticos são
+# processados no build (build.sh) e o WhiteNoise serve os nomes com hash com
+# Cache-Control immutable
+STORAGES = {
+    'default': {
+        'BACKEND': 'shalom_project.storage.ArmazenamentoMediaHash',
+    },
+    'staticfiles': {
+        'BACKEND': 'shalom_project.storage.EstaticosManifesto',
+    },
+}
 
 # Media files (Uploaded files)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Media em produção (shalom_project/media.py)
+MEDIA_SERVIR = os.getenv('MEDIA_SERVIR', 'True').lower() == 'true'
+MEDIA_CACHE_MAX_AGE = int(os.getenv('MEDIA_CACHE_MAX_AGE', '3600'))  # nomes sem hash
+MEDIA_CACHE_MAX_AGE_HASH = int(os.getenv('MEDIA_CACHE_MAX_AGE_HASH', '31536000'))
+# '' (o Django envia o ficheiro), 'x-accel-redirect' (nginx) ou 'x-sendfile' (Apache/lighttpd)
+MEDIA_OFFLOAD = os.getenv('MEDIA_OFFLOAD', '').lower()
+# Location interna do nginx que aponta para MEDIA_ROOT
+MEDIA_ACCEL_PREFIXO = os.getenv('MEDIA_ACCEL_PREFIXO', '/media-interno/')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -207,6 +361,20 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL')
 
+# Pool de ligações SMTP do configAUX.UnsafeTLSBackend (0 desativa o pool)
+SMTP_POOL_TAMANHO = int(os.getenv('SMTP_POOL_TAMANHO', '4'))
+SMTP_POOL_MAX_MENSAGENS = int(os.getenv('SMTP_POOL_MAX_MENSAGENS', '100'))
+SMTP_POOL_IDADE_MAXIMA = int(os.getenv('SMTP_POOL_IDADE_MAXIMA', '300'))  # segundos
+SMTP_POOL_NOOP_APOS = int(os.getenv('SMTP_POOL_NOOP_APOS', '5'))  # segundos ociosa antes do NOOP
+
+# Fila de emails (EmailOutbox) processada pelo comando run_mail_worker. No
+# Railway o start.sh arranca-o ao lado do gunicorn; com MAIL_WORKER_SEPARADO=true
+# corre antes num serviço próprio (processo worker do Procfile)
+EMAIL_OUTBOX_LOTE = int(os.getenv('EMAIL_OUTBOX_LOTE', '50'))
+EMAIL_OUTBOX_MAX_TENTATIVAS = int(os.getenv('EMAIL_OUTBOX_MAX_TENTATIVAS', '6'))
+EMAIL_OUTBOX_BACKOFF = int(os.getenv('EMAIL_OUTBOX_BACKOFF', '60'))  # segundos
+EMAIL_OUTBOX_BACKOFF_MAXIMO = int(os.getenv('EMAIL_OUTBOX_BACKOFF_MAXIMO', '3600'))
+
 # Logging configuration
 LOGGING = {
     'version': 1,
@@ -301,6 +469,7 @@ JAZZMIN_SETTINGS = {
         "eventos.Avaliacao": "fas fa-star",
         "eventos.Certificado": "fas fa-certificate",
         "eventos.CodigoVerificacao": "fas fa-key",
+        "eventos.EmailOutbox": "fas fa-envelope",
     },
     
     # Icons that are used when one is not manually specified
@@ -0,0 +1,100 @@
+"""
+Storages do projeto: media e estáticos com o hash do conteúdo no nome
+"""
+import hashlib
+import os
+import posixpath
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from whitenoise.compress import brotli_installed
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+TAMANHO_HASH = 12
+
+# foto.3f2a9c1b2d4e.jpg
+NOME_COM_HASH = re.compile(r'\.[0-9a-f]{%d}(\.[^./]+)?$' % TAMANHO_HASH)
+
+
+def tem_hash(nome):
+    """Se o nome inclui o hash do conteúdo (e pode ser guardado em cache para sempre)"""
+    return bool(NOME_COM_HASH.search(nome))
+
+
+class ArmazenamentoMediaHash(FileSystemStorage):
+    """
+    Grava ``eventos/foto.jpg`` como ``eventos/foto.<hash>.jpg``
+
+    O mesmo conteúdo gera sempre o mesmo nome e um conteúdo diferente nunca
+    reutiliza um nome, então a media pode ser servida com
+    ``Cache-Control: immutable``. Reenviar um ficheiro idêntico reaproveita o
+    que já está gravado.
+    """
+
+    def _hash(self, content):
+        md5 = hashlib.md5(usedforsecurity=False)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks():
+            md5.update(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        return md5.hexdigest()[:TAMANHO_HASH]
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        if tem_hash(name):
+            return super().save(name, content, max_length)
+
+        raiz, extensao = posixpath.splitext(name)
+        sufixo = f'.{self._hash(content)}{extensao}'
+        if max_length and len(raiz) + len(sufixo) > max_length:
+            raiz = raiz[:max_length - len(sufixo)]
+        nome_hash = raiz + sufixo
+
+        if self.exists(nome_hash):
+            return nome_hash
+        return super().save(nome_hash, content, max_length)
+
+
+class EstaticosManifesto(CompressedManifestStaticFilesStorage):
+    """
+    Estáticos com hash no nome (staticfiles.json), comprimidos em gzip e
+    Brotli no collectstatic
+
+    Um ficheiro em falta no manifesto gera o URL sem hash em vez de derrubar a
+    página com ValueError. A compressão é incremental: ficheiros cujas versões
+    comprimidas (.gz e, com o brotli instalado, .br) já existem todas e não são
+    mais antigas que o original são saltados.
+    """
+
+    manifest_strict = False
+
+    def _comprimido_atual(self, name):
+        caminho = self.path(name)
+        try:
+            modificado = os.stat(caminho).st_mtime
+        except OSError:
+            return False
+        # Todas as versões que o compressor grava: com uma só atual, a outra
+        # (ex.: .br depois de instalar o brotli) nunca seria gerada
+        for sufixo in ('.br', '.gz') if brotli_installed else ('.gz',):
+            try:
+                modificado_comprimido = os.stat(caminho + sufixo).st_mtime
+            except OSError:
+                return False
+            # Nome com hash: o conteúdo não muda (o Django regrava CSS/JS a cada
+            # execução, o que altera o mtime). Sem hash: o WhiteNoise copia o
+            # mtime do original para as versões comprimidas
+            if not (tem_hash(name) or modificado_comprimido >= modificado):
+                return False
+        return True
+
+    def compress_files(self, names):
+        pendentes = [name for name in names if not self._comprimido_atual(name)]
+        yield from super().compress_files(pendentes)
@@ -14,11 +14,15 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from .media import servir_media
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('eventos/', include('eventos.urls')),
@@ -28,3 +32,8 @@ urlpatterns = [
 # Servir arquivos de mídia em desenvolvimento
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+elif settings.MEDIA_SERVIR:
+    # Em produção, com cabeçalhos de cache, Range e offload opcional para o servidor web
+    urlpatterns += [
+        re_path(r'^%s(?P<caminho>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')), servir_media),
+    ]
@@ -1,23 +1,44 @@
 #!/bin/bash
 
 # Script de inicialização para Railway
+# Só verifica o build e arranca o gunicorn; collectstatic e migrate correm no
+# build e no release (ver build.sh e release.sh)
+export SHALOM_BOOT_INICIO=${SHALOM_BOOT_INICIO:-$(date +%s%N)}
 echo "🚀 Iniciando aplicação..."
 
-# Criar diretório staticfiles se não existir
-echo "📁 Criando diretório staticfiles..."
-mkdir -p staticfiles
+# Verificar o manifesto dos estáticos gerado no build
+if [ ! -f staticfiles/staticfiles.json ]; then
+    echo "⚠️ staticfiles/staticfiles.json não encontrado; a coletar estáticos (arranque lento)..."
+    python manage.py collectstatic --noinput
+fi
 
-# Coletar arquivos estáticos
-echo "📦 Coletando arquivos estáticos..."
-python manage.py collectstatic --noinput --clear
+# Definir porta padrão se não estiver definida (lida pelo gunicorn.conf.py)
+export PORT=${PORT:-8000}
 
-# Executar migrações
-echo "🗄️ Executando migrações..."
-python manage.py migrate
+echo "⏱️ Arranque até ao gunicorn: $(( ($(date +%s%N) - SHALOM_BOOT_INICIO) / 1000000 )) ms"
 
-# Definir porta padrão se não estiver definida
-PORT=${PORT:-8000}
+# Worker da fila de emails (EmailOutbox): no Railway corre no mesmo serviço, em
+# segundo plano, e é reiniciado se terminar. Com MAIL_WORKER_SEPARADO=true não
+# arranca aqui: o worker é um segundo serviço Railway com o comando de arranque
+# "python manage.py run_mail_worker" (processo worker do Procfile)
+if [ "${MAIL_WORKER_SEPARADO:-false}" != "true" ]; then
+    echo "📧 Iniciando worker da fila de emails..."
+    (
+        while true; do
+            python manage.py run_mail_worker
+            echo "⚠️ Worker de emails terminou (código $?); a reiniciar em 5 s..."
+            sleep 5
+        done
+    ) &
+fi
 
-# Iniciar o servidor
-echo "🌐 Iniciando servidor na porta $PORT..."
-exec gunicorn shalom_project.wsgi:application --bind 0.0.0.0:$PORT 
\ No newline at end of file
+# ASGI=true: workers uvicorn (um event loop por processo) com as views assíncronas
+APP=shalom_project.wsgi:application
+if [ "${ASGI:-false}" = "true" ]; then
+    APP=shalom_project.asgi:application
+    export GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker
+fi
+
+# Iniciar o servidor (workers, threads e hooks em gunicorn.conf.py)
+echo "🌐 Iniciando servidor na porta $PORT ($APP)..."
+exec gunicorn $APP -c gunicorn.conf.py